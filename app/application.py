@@ -0,0 +1,60 @@
+import os
+from flask import Flask
+from models import db
+import projections  # registers the projections kept up to date on commit
+import changes  # logs every change for mirrors
+from health import init_health
+
+
+def create_app(env_config):
+    """ Returns a configured application without any routes, enough for
+        management commands. Web workers add the API with
+        `web.register_api`.
+    """
+
+    #crate the flask app and configure it
+    app = Flask(__name__, template_folder="templates")
+    app.config.update(env_config)
+
+    #configure database
+    db.init_app(app)
+
+    #health checks for load balancers, and /debug/stats when DEBUG_ROUTES is set
+    init_health(app)
+
+    return app
+
+
+def get_config_from_env(overloads={}):
+
+    # Get our environment
+    full_env = dict(os.environ)
+    full_env.update(overloads)
+
+    # Empty config
+    config = {}
+
+    # Keys for config dictionary.  We'll only pull out
+    # things that are specified here.
+    keys = (
+        "DATABASE_URL",
+        "DEBUG",
+        "DEBUG_ROUTES",
+        "WARM_SEASONS",
+        "WARM_WORKERS",
+        "CACHE_TYPE",
+        "CACHE_LOCATION",
+        "CACHE_TIMEOUT",
+        "CACHE_MAX_ENTRIES",
+        "DOCUMENT_STORE"
+    )
+
+    for key in keys:
+        if key in full_env:
+            value = full_env[key]
+            if value.lower() == 'true':
+                value = True
+            config[key] = value
+
+    config['SQLALCHEMY_DATABASE_URI'] = config['DATABASE_URL']
+    return config
@@ -0,0 +1,240 @@
+import bisect
+import logging
+import random
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from sqlalchemy import select, func, or_
+from changes import format_token
+from models import db, Person, Team, RaceTrack, ChangeLog
+from sql import in_array
+from tracking import after_commit
+
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# Seconds between checks of the change log for people, teams and tracks
+# changed by other processes, such as ingest commands and other workers,
+# whose commits don't reach the commit hooks of this one.
+CHECK_INTERVAL = 30
+
+
+def fold(value):
+    """ Lower cases a name and strips its accents. Keys are kept as UTF-8
+        byte strings, which take a quarter of the memory of unicode ones
+        and sort in the same order.
+    """
+    value = unicodedata.normalize('NFKD', unicode(value))
+    value = u''.join(c for c in value if not unicodedata.combining(c))
+    return value.lower().strip().encode('utf-8')
+
+
+def word_starts(key):
+    """ Offsets of every word after the first one in a folded name.
+    """
+    return [i for i in range(1, len(key)) if key[i - 1] == ' ' and key[i] != ' ']
+
+
+class PrefixIndex(object):
+    """ Immutable prefix index over (type, id, name) entries.
+
+        Folded names live in one sorted array and the suffixes starting
+        at each later word in another, so a lookup is a binary search
+        followed by a short scan. Whole-name matches are returned first.
+    """
+
+    def __init__(self, entries):
+        self.entries = []
+        names = []
+        words = []
+
+        for entry in entries:
+            position = len(self.entries)
+            self.entries.append(entry[:3])
+            for text in entry[3]:
+                key = fold(text)
+                names.append((key, position))
+                for start in word_starts(key):
+                    words.append((key[start:], position))
+
+        names.sort()
+        words.sort()
+        self.name_keys = [k for k, _ in names]
+        self.name_refs = array('i', [p for _, p in names])
+        self.word_keys = [k for k, _ in words]
+        self.word_refs = array('i', [p for _, p in words])
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _scan(self, keys, refs, prefix, found, limit):
+        i = bisect.bisect_left(keys, prefix)
+        while i < len(keys) and len(found) < limit and keys[i].startswith(prefix):
+            if refs[i] not in found:
+                found.append(refs[i])
+            i += 1
+
+    def lookup(self, prefix, limit=DEFAULT_LIMIT):
+        prefix = fold(prefix)
+        if not prefix:
+            return []
+
+        found = []
+        self._scan(self.name_keys, self.name_refs, prefix, found, limit)
+        self._scan(self.word_keys, self.word_refs, prefix, found, limit)
+        return [self.entries[p] for p in found]
+
+    def memory_usage(self):
+        """ Approximate size of the index in bytes.
+        """
+        size = sum(sys.getsizeof(c) for c in (self.entries, self.name_keys, self.name_refs,
+                                               self.word_keys, self.word_refs))
+        size += sum(sys.getsizeof(k) for k in self.name_keys)
+        size += sum(sys.getsizeof(k) for k in self.word_keys)
+        for entry in self.entries:
+            size += sys.getsizeof(entry) + sum(sys.getsizeof(v) for v in entry)
+        return size
+
+
+def load_entries():
+    """ Yields (type, id, name, searchable texts) for every person,
+        team and race track.
+    """
+    for person in Person.query.values(Person.id, Person.name):
+        yield ('person', person.id, person.name, (person.name,))
+
+    for team in Team.query.values(Team.id, Team.name, Team.alias):
+        yield ('team', team.id, team.name, (team.name, team.alias))
+
+    for track in RaceTrack.query.values(RaceTrack.id, RaceTrack.site,
+                                        RaceTrack.circuit_name, RaceTrack.city):
+        yield ('track', track.id, track.circuit_name,
+               (track.site, track.circuit_name, track.city))
+
+
+def latest_change(tables):
+    """ (transaction id, id) of the latest change logged for any of
+        `tables` by a finished transaction, or the current one, or
+        (0, 0).
+
+        Like changes.changes_since, transactions still running are left
+        out. Ids are assigned at flush rather than commit, so the latest
+        id alone would miss a change committed after a later one; a
+        transaction running now can only end up after the change
+        returned.
+    """
+    log = ChangeLog.__table__
+    finished = or_(log.c.transaction_id < func.txid_snapshot_xmin(func.txid_current_snapshot()),
+                   log.c.transaction_id == func.txid_current_if_assigned())
+    row = db.session.execute(select([log.c.transaction_id, log.c.id]).
+                             where(in_array(log.c.entity, tables)).
+                             where(finished).
+                             order_by(log.c.transaction_id.desc(), log.c.id.desc()).
+                             limit(1)).first()
+    return tuple(row) if row is not None else (0, 0)
+
+
+class Autocomplete(object):
+    """ Holds the prefix index of an application and rebuilds it on the
+        first lookup after people, teams or tracks change, in this
+        process or, checked every CHECK_INTERVAL seconds, in another.
+    """
+
+    tables = ('people', 'teams', 'race_tracks')
+
+    def __init__(self, app=None):
+        self.index = None
+        self.stale = True
+        self.built_at = None
+        self.build_seconds = None
+        self.version = None
+        self.checked_at = None
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['autocomplete'] = self
+        app.before_first_request(self.build)
+
+    def invalidate(self):
+        self.stale = True
+
+    def build(self):
+        with self.lock:
+            # Threads that waited for another one building find the
+            # index it built.
+            if self.index is not None and not self.stale:
+                return self.index
+            started = time.time()
+            # Cleared before loading so that changes committed while the
+            # index is being built mark it stale again.
+            self.stale = False
+            self.version = latest_change(self.tables)
+            self.checked_at = started
+            index = PrefixIndex(load_entries())
+            self.index = index
+            self.built_at = time.time()
+            self.build_seconds = self.built_at - started
+        logging.info('autocomplete index built: %d entries, %d bytes in %.3fs',
+                     len(index), index.memory_usage(), self.build_seconds)
+        return index
+
+    def changed_elsewhere(self):
+        """ Whether, if CHECK_INTERVAL seconds have passed since the last
+            check, changes were logged since the index was built.
+        """
+        if time.time() - self.checked_at < CHECK_INTERVAL:
+            return False
+        self.checked_at = time.time()
+        return latest_change(self.tables) != self.version
+
+    def get_index(self):
+        index = self.index
+        if index is not None and not self.stale and self.changed_elsewhere():
+            self.invalidate()
+        if index is None or self.stale:
+            # Only one thread rebuilds; the others keep serving the
+            # previous index if there is one.
+            if index is None or not self.lock.locked():
+                index = self.build()
+        return index
+
+    def lookup(self, prefix, limit=DEFAULT_LIMIT):
+        return self.get_index().lookup(prefix, limit)
+
+    def stats(self):
+        index = self.index
+        return {
+            'entries': len(index) if index is not None else 0,
+            'memory_bytes': index.memory_usage() if index is not None else 0,
+            'stale': self.stale,
+            'version': format_token(*self.version) if self.version else None,
+            'built_at': self.built_at,
+            'build_seconds': self.build_seconds
+        }
+
+
+def invalidate_autocomplete(session, tables):
+    app = getattr(session, 'app', None)
+    if app is not None and 'autocomplete' in app.extensions:
+        app.extensions['autocomplete'].invalidate()
+
+after_commit(Autocomplete.tables, invalidate_autocomplete)
+
+
+def benchmark(index, lookups=100000, prefix_length=3, limit=DEFAULT_LIMIT):
+    """ Runs lookups for prefixes taken from the indexed names and
+        returns the number of lookups per second.
+    """
+    keys = [k[:prefix_length] for k in index.name_keys + index.word_keys] or ['a']
+    prefixes = [random.choice(keys) for _ in xrange(lookups)]
+
+    started = time.time()
+    for prefix in prefixes:
+        index.lookup(prefix, limit)
+    elapsed = time.time() - started
+    return lookups / elapsed if elapsed else float('inf')
@@ -0,0 +1,331 @@
+import hashlib
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from urllib import urlencode
+from flask import request, current_app
+from models import db
+from tracking import after_commit
+
+
+DEFAULT_TIMEOUT = 300
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_DIRECTORY = os.path.join(tempfile.gettempdir(), 'motorsports-api-cache')
+DEFAULT_MEMCACHED = 'localhost:11211'
+
+# Seconds between sweeps of the expired files of the file backend.
+SWEEP_INTERVAL = 60
+
+# Prefix of the files values are written to before being renamed into
+# place, which lookups never ask for.
+TEMPORARY_PREFIX = '.tmp'
+
+# Seconds to wait for memcached before treating a lookup as a miss.
+SOCKET_TIMEOUT = 0.5
+
+# Tables whose changes alone don't change any response: jobs, logged
+# changes and stored documents only change along with the tables they
+# describe.
+INTERNAL_TABLES = ('jobs', 'change_log', 'rendered_documents')
+
+# Key of the generation every response key includes. A commit replaces
+# it, which makes every cached response unreachable in all workers.
+GENERATION_KEY = 'generation'
+
+
+class NullCache(object):
+    """ Caches nothing, the default.
+    """
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+
+class LRUCache(object):
+    """ Keeps the `max_entries` most recently used values in the memory
+        of the process.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.time():
+                return None
+            self.entries[key] = entry
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires = time.time() + timeout if timeout else None
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (expires, value)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class FileCache(object):
+    """ Keeps values in files of a directory, shared by every worker of a
+        host. Values are written to a temporary file renamed into place,
+        so readers never see half of one.
+
+        Every `sweep_interval` seconds, a write also removes the files of
+        expired values, which includes those a new generation left
+        unreachable once they time out.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, sweep_interval=SWEEP_INTERVAL):
+        self.directory = directory
+        self.sweep_interval = sweep_interval
+        self.swept = time.time()
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def read(self, path):
+        """ The expiry time and value of a file, raising IOError or
+            ValueError if it's gone or not a complete value.
+        """
+        with open(path, 'rb') as f:
+            expires = float(f.readline())
+            return expires, f.read()
+
+    def get(self, key):
+        try:
+            expires, value = self.read(self.path(key))
+        except (IOError, ValueError):
+            return None
+        if expires and expires < time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, timeout=None):
+        expires = time.time() + timeout if timeout else 0
+        fd, temporary = tempfile.mkstemp(prefix=TEMPORARY_PREFIX, dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write('{0!r}\n'.format(expires))
+            f.write(value)
+        os.rename(temporary, self.path(key))
+        if time.time() - self.swept >= self.sweep_interval:
+            self.sweep()
+
+    def sweep(self):
+        """ Removes the files of expired values, and temporary files left
+            by writers that died before renaming them.
+        """
+        now = self.swept = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.startswith(TEMPORARY_PREFIX):
+                    stale = os.path.getmtime(path) < now - self.sweep_interval
+                else:
+                    expires = self.read(path)[0]
+                    stale = expires and expires < now
+                if stale:
+                    os.remove(path)
+            except (OSError, IOError, ValueError):
+                # Removed or replaced by another worker meanwhile.
+                pass
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+
+class MemcachedCache(object):
+    """ Client of the memcached text protocol, for a cache shared by every
+        host. Each thread keeps its own connection. A server that can't
+        be reached makes every lookup a miss rather than an error.
+    """
+
+    def __init__(self, address=DEFAULT_MEMCACHED):
+        host, sep, port = address.rpartition(':')
+        self.address = (host, int(port)) if sep else (address, 11211)
+        self.local = threading.local()
+
+    def connection(self):
+        if getattr(self.local, 'socket', None) is None:
+            sock = socket.create_connection(self.address, SOCKET_TIMEOUT)
+            self.local.socket = sock
+            self.local.file = sock.makefile('rb')
+        return self.local.socket, self.local.file
+
+    def disconnect(self):
+        sock = getattr(self.local, 'socket', None)
+        if sock is not None:
+            self.local.file.close()
+            sock.close()
+        self.local.socket = self.local.file = None
+
+    def command(self, command, read):
+        """ Sends a command and returns what `read(file)` reads of the
+            reply, or None if the server couldn't be reached.
+        """
+        try:
+            sock, f = self.connection()
+            sock.sendall(command)
+            return read(f)
+        except (socket.error, ValueError) as e:
+            logging.warning('memcached %s:%s failed: %s', self.address[0], self.address[1], e)
+            self.disconnect()
+            return None
+
+    def get(self, key):
+        def read(f):
+            header = f.readline()
+            if header == 'END\r\n':
+                return None
+            parts = header.split()
+            if len(parts) != 4 or parts[0] != 'VALUE':
+                raise ValueError('unexpected reply {0!r}'.format(header))
+            value = f.read(int(parts[3]) + 2)[:-2]
+            if f.readline() != 'END\r\n':
+                raise ValueError('unterminated value')
+            return value
+        return self.command('get {0}\r\n'.format(key), read)
+
+    def set(self, key, value, timeout=None):
+        self.command('set {0} 0 {1} {2}\r\n{3}\r\n'.format(key, int(timeout or 0), len(value), value),
+                     lambda f: f.readline())
+
+    def delete(self, key):
+        self.command('delete {0}\r\n'.format(key), lambda f: f.readline())
+
+
+def create_backend(config):
+    """ Returns the backend named by CACHE_TYPE: null, lru, file or
+        memcached. CACHE_LOCATION is the directory of the file backend
+        and the host:port of memcached.
+    """
+    cache_type = config.get('CACHE_TYPE') or 'null'
+    if cache_type == 'null':
+        return NullCache()
+    if cache_type == 'lru':
+        return LRUCache(int(config.get('CACHE_MAX_ENTRIES') or DEFAULT_MAX_ENTRIES))
+    if cache_type == 'file':
+        return FileCache(config.get('CACHE_LOCATION') or DEFAULT_DIRECTORY)
+    if cache_type == 'memcached':
+        return MemcachedCache(config.get('CACHE_LOCATION') or DEFAULT_MEMCACHED)
+    raise ValueError('unknown CACHE_TYPE {0!r}'.format(cache_type))
+
+
+def request_key():
+    """ The path and sorted query string of the current request.
+    """
+    return request.path + '?' + urlencode(sorted(request.args.items(multi=True)))
+
+
+class Cache(object):
+    """ Caches the responses of the API in the configured backend until
+        they time out or the next commit.
+    """
+
+    def __init__(self, app=None):
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = create_backend(app.config)
+        self.timeout = int(app.config.get('CACHE_TIMEOUT') or DEFAULT_TIMEOUT)
+        app.extensions['cache'] = self
+
+    def generation(self):
+        generation = self.backend.get(GENERATION_KEY)
+        if generation is None:
+            # Lost or never set: start a new one rather than reach what
+            # was cached before the previous one.
+            generation = self.invalidate()
+        return generation
+
+    def invalidate(self):
+        generation = uuid.uuid4().hex
+        self.backend.set(GENERATION_KEY, generation)
+        return generation
+
+    def response(self, render):
+        """ Returns the cached response to the current request, or caches
+            what `render()` returns. Only dictionaries are cached; errors
+            and other responses are rendered every time.
+        """
+        if isinstance(self.backend, NullCache):
+            return render()
+
+        key = hashlib.sha1(self.generation() + request_key()).hexdigest()
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return json.loads(value, object_pairs_hook=OrderedDict)
+
+        self.misses += 1
+        data = render()
+        if isinstance(data, dict):
+            self.backend.set(key, json.dumps(data, separators=(',', ':')), self.timeout)
+        return data
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        entries = getattr(self.backend, 'entries', None)
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(float(self.hits) / lookups, 3) if lookups else None,
+            # Only known for the in-process backend.
+            'entries': len(entries) if entries is not None else None
+        }
+
+
+def cached(get):
+    """ Decorates the `get` method of a resource to cache its responses.
+    """
+    @wraps(get)
+    def cached_get(*args, **kwargs):
+        return current_app.extensions['cache'].response(lambda: get(*args, **kwargs))
+    return cached_get
+
+
+def invalidate_cache(session, tables):
+    app = getattr(session, 'app', None)
+    if app is not None and 'cache' in app.extensions:
+        app.extensions['cache'].invalidate()
+
+after_commit(set(db.metadata.tables.keys()) - set(INTERNAL_TABLES), invalidate_cache)
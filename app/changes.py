@@ -0,0 +1,163 @@
+import datetime
+import decimal
+from sqlalchemy import event, inspect, select, func, or_, tuple_
+from sqlalchemy.orm import Session
+from models import db, ChangeLog
+from sql import in_array
+
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+
+def models_by_table():
+    """ Maps table names to the model classes mapped to them.
+    """
+    return dict((cls.__table__.name, cls) for cls in db.Model._decl_class_registry.values()
+                if hasattr(cls, '__table__'))
+
+
+_table_order = None
+
+
+def table_order():
+    """ Position of every table in foreign key dependency order.
+    """
+    global _table_order
+    if _table_order is None:
+        _table_order = dict((table.name, i) for i, table in enumerate(db.metadata.sorted_tables))
+    return _table_order
+
+
+@event.listens_for(Session, 'after_flush')
+def record_changes(session, flush_context):
+    """ Adds a change_log row for every instance the flush inserted,
+        updated or deleted. Inserts and updates are logged parents
+        first and deletes children first, so that mirrors can apply
+        them in order.
+
+        Like projections, this only sees changes made through the
+        session; bulk Query.update() and delete() aren't logged.
+    """
+    order = table_order()
+    saves = []
+    deletes = []
+
+    for obj in session.new:
+        saves.append(('insert', obj))
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            saves.append(('update', obj))
+    for obj in session.deleted:
+        deletes.append(('delete', obj))
+
+    rows = []
+    for changes, reverse in ((saves, False), (deletes, True)):
+        changes.sort(key=lambda change: order.get(change[1].__table__.name), reverse=reverse)
+        for operation, obj in changes:
+            key = inspect(obj).mapper.primary_key_from_instance(obj)
+            rows.append({'entity': obj.__table__.name,
+                         'key': [unicode(value) for value in key],
+                         'operation': operation})
+
+    if rows:
+        session.execute(ChangeLog.__table__.insert(), rows)
+
+
+def format_token(transaction_id, change_id):
+    return '{0}-{1}'.format(transaction_id, change_id)
+
+
+def parse_token(token):
+    """ Returns the (transaction id, change id) of a token, raising
+        ValueError if it isn't one.
+    """
+    transaction_id, sep, change_id = token.partition('-')
+    if not sep:
+        raise ValueError('not a change token: {0!r}'.format(token))
+    return int(transaction_id), int(change_id)
+
+
+def json_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+def typed_key(model, key):
+    """ Converts the text primary key values of a change to the types of
+        the primary key columns of its model.
+    """
+    columns = inspect(model).primary_key
+    return tuple(int(value) if isinstance(column.type, db.Integer) else value
+                 for column, value in zip(columns, key))
+
+
+def load_entities(model, keys):
+    """ Current column values of the instances of `model` with the given
+        primary keys, by primary key. Deleted ones are missing.
+    """
+    mapper = inspect(model)
+    columns = mapper.primary_key
+    if len(columns) == 1:
+        query = model.query.filter(in_array(columns[0], [key[0] for key in keys]))
+    else:
+        query = model.query.filter(tuple_(*columns).in_(keys))
+
+    entities = {}
+    for obj in query:
+        data = dict((attr.key, json_value(getattr(obj, attr.key))) for attr in mapper.column_attrs)
+        entities[tuple(mapper.primary_key_from_instance(obj))] = data
+    return entities
+
+
+def changes_since(token=None, limit=DEFAULT_LIMIT):
+    """ Returns up to `limit` changes logged after `token`, in order, and
+        the token to ask for the next ones with.
+
+        Changes are ordered by transaction, and only transactions older
+        than every running one are returned (as well as those of the
+        current transaction). A transaction still running can't commit
+        changes ordered before ones already returned, so none are
+        skipped. Each change holds the current values of its entity, or
+        None once the entity has been deleted.
+    """
+    log = ChangeLog.__table__
+    finished = or_(log.c.transaction_id < func.txid_snapshot_xmin(func.txid_current_snapshot()),
+                   log.c.transaction_id == func.txid_current_if_assigned())
+
+    query = select([log]).\
+        where(finished).\
+        order_by(log.c.transaction_id, log.c.id).\
+        limit(limit)
+
+    if token is not None:
+        query = query.where(tuple_(log.c.transaction_id, log.c.id) > tuple_(*parse_token(token)))
+
+    rows = db.session.execute(query).fetchall()
+
+    models = models_by_table()
+    keys = {}
+    for row in rows:
+        keys.setdefault(row.entity, set()).add(typed_key(models[row.entity], row.key))
+    entities = dict((entity, load_entities(models[entity], list(entity_keys)))
+                    for entity, entity_keys in keys.items())
+
+    changes = []
+    for row in rows:
+        key = typed_key(models[row.entity], row.key)
+        changes.append({
+            'token': format_token(row.transaction_id, row.id),
+            'entity': row.entity,
+            'key': list(key),
+            'operation': row.operation,
+            'changed_at': row.changed_at.isoformat(),
+            'data': entities[row.entity].get(key)
+        })
+
+    next_token = changes[-1]['token'] if changes else token
+    return changes, next_token
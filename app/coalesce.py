@@ -0,0 +1,85 @@
+import sys
+import threading
+import time
+
+
+class Call(object):
+    """ A computation in flight and the result its waiters share.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exc_info = None
+
+
+class SingleFlight(object):
+    """ Coalesces concurrent calls for the same key: the first one runs
+        the computation while the others wait for it and share its
+        result, or its exception. Results are only shared by calls in
+        flight together; nothing is kept once they return, so callers
+        must not change the results they get.
+    """
+
+    def __init__(self, app=None):
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.computations = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.waiting = 0
+        self.wait_seconds = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['single_flight'] = self
+
+    def do(self, key, compute):
+        """ Returns `compute()`, or the result of the call for `key`
+            already in flight.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Call()
+                self.computations += 1
+            else:
+                self.coalesced += 1
+                self.waiting += 1
+
+        if leader:
+            try:
+                call.result = compute()
+            except:
+                call.exc_info = sys.exc_info()
+                with self.lock:
+                    self.errors += 1
+                raise
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                call.done.set()
+            return call.result
+
+        started = time.time()
+        call.done.wait()
+        with self.lock:
+            self.waiting -= 1
+            self.wait_seconds += time.time() - started
+
+        if call.exc_info is not None:
+            raise call.exc_info[0], call.exc_info[1], call.exc_info[2]
+        return call.result
+
+    def stats(self):
+        with self.lock:
+            return {
+                'in_flight': len(self.calls),
+                'computations': self.computations,
+                'coalesced': self.coalesced,
+                'errors': self.errors,
+                'waiting': self.waiting,
+                'wait_seconds': round(self.wait_seconds, 6)
+            }
@@ -1,40 +1,326 @@
-from flask import request
-from flask.ext.restful import Resource, fields, marshal
-from models import Team, Vehicle, DriverStanding, Race, \
+import itertools
+import json
+from collections import OrderedDict
+from operator import attrgetter
+from flask import request, Response, current_app, stream_with_context
+from flask.ext.restful import Resource, fields, marshal, abort
+from sqlalchemy.orm import joinedload, subqueryload
+from export import DATASETS, FILE_EXTENSION, render_partition
+from search import name_search, DEFAULT_LIMIT, MAX_LIMIT
+import autocomplete
+import changes
+from progression import season_progression
+from points import points_systems, points_system_in_force, rescored_standings
+from sql import in_array
+from cache import cached, request_key
+from documents import stored
+from included import Included
+from models import Person, Team, Vehicle, DriverStanding, Race, \
     TeamStanding, RaceStanding, RaceEntry, RaceEntryType, RaceResult, \
-    QualifyingResult, PracticeResult, RaceResultPerson, PersonType, \
-    OwnerStanding
+    QualifyingResult, PracticeResult, RaceResultPerson, OwnerStanding, \
+    RaceTrack, RaceSummary, PersonRole, TeamSeason, TrackRecord, db
+
+
+def vehicle_metadata_args():
+    """ Returns the vehicle metadata pairs requested with one or more
+        ?metadata=key:value arguments.
+    """
+    metadata = {}
+    for arg in request.args.getlist('metadata'):
+        key, sep, value = arg.partition(':')
+        if not sep or not key:
+            abort(400, message='metadata filters must look like key:value')
+        metadata[key] = value
+    return metadata
+
+
+def filter_vehicle_metadata(query, vehicle=None):
+    """ Restricts a query to vehicles whose metadata contains every
+        requested pair. `vehicle` is the relationship to join through
+        when the query isn't over vehicles.
+    """
+    metadata = vehicle_metadata_args()
+    if metadata:
+        if vehicle is not None:
+            query = query.join(vehicle)
+        query = query.filter(Vehicle.vehicle_metadata.contains(metadata))
+    return query
+
+
+# Most ids one ?ids= argument may hold.
+MAX_IDS = 5000
+
+
+def id_list_arg(convert=unicode):
+    """ Returns the ids requested with ?ids=a,b,c converted with
+        `convert`, in order and without duplicates, or None if the
+        argument is missing.
+    """
+    arg = request.args.get('ids')
+    if arg is None:
+        return None
+
+    values = [value.strip() for value in arg.split(',') if value.strip()]
+    if len(values) > MAX_IDS:
+        abort(400, message='at most {0} ids can be requested at once'.format(MAX_IDS))
+
+    ids = []
+    seen = set()
+    for value in values:
+        try:
+            value = convert(value)
+        except ValueError:
+            abort(400, message='ids must be a comma separated list of ids')
+        if value not in seen:
+            seen.add(value)
+            ids.append(value)
+    return ids
+
+
+def integer_id(value):
+    """ Converts an id of an integer column, raising ValueError if it
+        isn't one or is out of its range.
+    """
+    value = int(value)
+    if not 0 < value < 2 ** 31:
+        raise ValueError('id out of range: {0}'.format(value))
+    return value
+
+
+def filter_ids(query, column, ids):
+    """ Runs a query restricted to rows whose `column` is one of `ids`,
+        with a single array parameter, and returns the rows in the order
+        of `ids`.
+    """
+    if not ids:
+        return []
+    position = dict((value, i) for i, value in enumerate(ids))
+    rows = query.filter(in_array(column, ids)).all()
+    return sorted(rows, key=lambda row: position[getattr(row, column.key)])
+
+
+def coalesced(compute):
+    """ Returns `compute()`, running it once for concurrent requests
+        with the same path and query string, which all get its result.
+    """
+    return current_app.extensions['single_flight'].do(request_key(), compute)
+
+
+# Most series a list of series may name.
+MAX_SERIES = 10
+
+# Most seasons a range or list of seasons may cover.
+MAX_SEASONS = 100
+
+# Responses covering more seasons than this are streamed, fetching
+# rows STREAM_BATCH at a time.
+STREAM_SEASONS = 10
+STREAM_BATCH = 500
+
+
+def series_list(series):
+    """ Returns the series a series path segment names when it is a
+        list like w,b,c, None when it names a single series.
+    """
+    if series is None or ',' not in series:
+        return None
+    values = sorted(set(value.strip() for value in series.split(',') if value.strip()))
+    if not values:
+        abort(400, message='series must look like w or w,b,c')
+    if len(values) > MAX_SERIES:
+        abort(400, message='at most {0} series can be requested at once'.format(MAX_SERIES))
+    return values
+
+
+def filter_series(query, column, series):
+    """ Restricts a query to a series, or to a list of series with a
+        single = ANY(array) predicate.
+    """
+    values = series_list(series)
+    if values is None:
+        return query.filter(column == series)
+    return query.filter(in_array(column, values))
+
+
+def season_list(season):
+    """ Returns the seasons a season path segment names when it is a
+        range like 1990-1999 or a list like 2001,2005, None when it
+        names a single season.
+    """
+    if season is None or ('-' not in season and ',' not in season):
+        return None
+    try:
+        if '-' in season:
+            first, last = [int(value) for value in season.split('-', 1)]
+            if first > last:
+                raise ValueError('empty range')
+            seasons = range(first, last + 1)
+        else:
+            seasons = sorted(set(int(value) for value in season.split(',') if value.strip()))
+            if not seasons:
+                raise ValueError('empty list')
+    except ValueError:
+        abort(400, message='seasons must look like 1990-1999 or 2001,2005')
+    if len(seasons) > MAX_SEASONS:
+        abort(400, message='at most {0} seasons can be requested at once'.format(MAX_SEASONS))
+    return seasons
+
+
+def filter_seasons(query, column, season):
+    """ Restricts a query to a season, or to a range or list of seasons
+        with a single BETWEEN or = ANY(array) predicate.
+    """
+    seasons = season_list(season)
+    if seasons is None:
+        return query.filter(column == season)
+    if '-' in season:
+        return query.filter(column.between(seasons[0], seasons[-1]))
+    return query.filter(in_array(column, seasons))
+
+
+def group_rows(rows, attributes, render):
+    """ Yields (value, group) for rows ordered by `attributes`, where
+        value is the first attribute of the rows of the group and group
+        their rendering, grouped again by the remaining attributes.
+    """
+    for value, group in itertools.groupby(rows, key=attrgetter(attributes[0])):
+        if len(attributes) > 1:
+            yield str(value), OrderedDict(group_rows(group, attributes[1:], render))
+        else:
+            yield str(value), [render(row) for row in group]
+
+
+def grouped_response(key, query, render, attributes, stream=False, included=None):
+    """ Response holding the rows of a query ordered by `attributes`,
+        grouped by them. Streamed responses send one group at a time,
+        as rows are fetched.
+    """
+    if not stream:
+        response = {key: OrderedDict(group_rows(query, attributes, render))}
+        if included:
+            response['included'] = included.render()
+        return response
+
+    def generate():
+        yield '{{{0}: {{'.format(json.dumps(key))
+        groups = group_rows(query.yield_per(STREAM_BATCH), attributes, render)
+        for i, (value, group) in enumerate(groups):
+            yield '{0}{1}: {2}'.format(', ' if i else '', json.dumps(value), json.dumps(group))
+        yield '}'
+        if included:
+            yield ', "included": {0}'.format(json.dumps(included.render()))
+        yield '}\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def grouped(series, season=None):
+    """ Whether a request names a list of series or a range or list of
+        seasons, and gets its rows grouped by them.
+    """
+    return series_list(series) is not None or season_list(season) is not None
+
+
+def grouped_by_series(key, query, series, season, render, included=None):
+    """ Response for a list of series or a range or list of seasons,
+        grouped by series, then by season, and streamed when it covers
+        many seasons. The query must be ordered by series and season
+        first, and its rows must have the ones grouped by as attributes.
+    """
+    attributes = []
+    if series_list(series) is not None:
+        attributes.append('series')
+    seasons = season_list(season)
+    if seasons is not None:
+        attributes.append('season')
+    return grouped_response(key, query, render, attributes,
+                            stream=seasons is not None and len(seasons) > STREAM_SEASONS,
+                            included=included)
 
 
 class PeopleList(Resource):
 
+    # Route name -> PersonType of the people it lists. Drivers have
+    # their own resource.
+    roles = {
+        'teamowners': 'team-owner',
+        'crewchiefs': 'crew-chief',
+        'vehicleowners': 'vehicle-owner',
+        'teamprincipals': 'team-principal',
+        'technicalchiefs': 'technical-chief',
+        'raceengineers': 'race-engineer'
+    }
+
     person_fields = {
-        'id': fields.String(attribute='person.id'),
-        'name': fields.String(attribute='person.name'),
-        'country': fields.String(attribute='person.country')
+        'id': fields.Integer,
+        'name': fields.String,
+        'country': fields.String
     }
 
-    def get(self, version, series=None, season=None):
+    @cached
+    def get(self, version, role, series=None, season=None):
+        '''
+        Handles routes
+        /api/role                   All people with a role
+        /api/series/role            People with a role in a series
+        /api/series/season/role     People with a role in a series and season
+        /api/w,b,c/season/role      People with a role in each of a list of series
+
+        where role is one of teamowners, crewchiefs, vehicleowners,
+        teamprincipals, technicalchiefs or raceengineers.
+        '''
+
         if version == 'v1.0':
 
-            path = request.path.split("/")
-            person_type = (path[-1])[:-1]
+            # /api/w,b,c/season/role
+            if grouped(series):
+                people = Person.query.\
+                    join(PersonRole, PersonRole.person_id == Person.id).\
+                    filter(PersonRole.type == self.roles[role]).\
+                    add_columns(PersonRole.series)
+                people = filter_series(people, PersonRole.series, series)
+                if season:
+                    people = people.filter(PersonRole.season == season)
+                people = people.distinct().order_by(PersonRole.series, Person.id)
+                return grouped_by_series(role, people, series, None,
+                                         lambda row: marshal(row[0], self.person_fields))
 
-            if person_type in PersonType.enums:
-                people = RaceResultPerson.query.\
-                    filter(RaceResultPerson.type == person_type)
+            person_ids = db.session.query(PersonRole.person_id).\
+                filter(PersonRole.type == self.roles[role])
 
-                if series:
-                    people = people.join(RaceResultPerson.race_result).\
-                        join(RaceResult.race).\
-                        filter(Race.series == series)
+            if series:
+                person_ids = person_ids.filter(PersonRole.series == series)
 
-                if season:
-                    people = people.filter(Race.season == season)
+            if season:
+                person_ids = person_ids.filter(PersonRole.season == season)
+
+            people = Person.query.\
+                filter(Person.id.in_(person_ids.subquery())).\
+                order_by(Person.id)
+
+            return {role: marshal(people.all(), self.person_fields)}
+
+        return {role: []}
 
-                return {path[-1]: marshal(people.all(), self.person_fields)}
 
-        return {path[-1]: []}
+class PersonList(Resource):
+
+    @cached
+    def get(self, version):
+        '''
+        Handles routes
+        /api/people?ids=1,2,3       People with the given ids, in that order
+        '''
+
+        if version == 'v1.0':
+            ids = id_list_arg(integer_id)
+            if ids is None:
+                abort(400, message='ids is required')
+
+            people = filter_ids(Person.query, Person.id, ids)
+            return {'people': marshal(people, PeopleList.person_fields)}
+
+        return {'people': []}
 
 
 class DriverList(Resource):
@@ -45,12 +331,14 @@ class DriverList(Resource):
         'country': fields.String(attribute='person.country')
     }
 
+    @cached
     def get(self, version, series=None, season=None):
         '''
         Handles routes
         /api/drivers                All drivers
         /api/series/drivers         Drivers from a series
         /api/series/season/drivers  Drivers from a series and season
+        /api/w,b,c/season/drivers   Drivers from each of a list of series
         '''
 
         if version == 'v1.0':
@@ -60,12 +348,17 @@ class DriverList(Resource):
 
             if series:
                 drivers = drivers.join(RaceResultPerson.race_result).\
-                    join(RaceResult.race).\
-                    filter(Race.series == series)
+                    join(RaceResult.race)
+                drivers = filter_series(drivers, Race.series, series)
 
             if season:
                 drivers = drivers.filter(Race.season == season)
 
+            if grouped(series):
+                drivers = drivers.add_columns(Race.series).order_by(Race.series)
+                return grouped_by_series('drivers', drivers, series, None,
+                                         lambda row: marshal(row[0], self.driver_fields))
+
             return {'drivers': marshal(drivers.all(), self.driver_fields)}
 
         return {'drivers': []}
@@ -86,12 +379,15 @@ class TeamList(Resource):
         'owner': fields.Nested(owner_fields)
     }
 
+    @cached
     def get(self, version, series=None, season=None):
         '''
         Handles routes
         /api/teams                  All teams
         /api/series/teams           Teams from a series
         /api/series/season/teams    Teams from a series and season
+        /api/w,b,c/season/teams     Teams from each of a list of series
+        /api/teams?ids=t1,t2        Teams with the given ids, in that order
         '''
 
         if version == 'v1.0':
@@ -101,18 +397,89 @@ class TeamList(Resource):
 
             # /api/series/drivers
             if series:
-                teams = teams.join(Team.races).\
-                    filter(Race.series == series)
+                teams = teams.join(Team.races)
+                teams = filter_series(teams, Race.series, series)
 
             # /api/series/season/drivers
             if season:
                 teams = teams.filter(Race.season == season)
 
+            # /api/teams?ids=t1,t2
+            ids = id_list_arg()
+            if ids is not None:
+                teams = filter_ids(teams.options(joinedload(Team.owner)), Team.id, ids)
+                return {'teams': marshal(teams, self.teams_fields)}
+
+            # /api/w,b,c/season/teams
+            if grouped(series):
+                teams = teams.add_columns(Race.series).order_by(Race.series, Team.id)
+                return grouped_by_series('teams', teams, series, None,
+                                         lambda row: marshal(row[0], self.teams_fields))
+
             return {'teams': marshal(teams.all(), self.teams_fields)}
 
         return {'teams': []}
 
 
+class TeamHistory(Resource):
+
+    team_fields = {
+        'id': fields.String,
+        'name': fields.String,
+        'alias': fields.String
+    }
+
+    season_fields = {
+        'series': fields.String,
+        'season': fields.Integer,
+        'races': fields.Integer,
+        'starts': fields.Integer,
+        'wins': fields.Integer,
+        'top5': fields.Integer,
+        'top10': fields.Integer,
+        'laps_led': fields.Integer,
+        'best_finish': fields.Integer,
+        'vehicle_numbers': fields.List(fields.Integer)
+    }
+
+    @cached
+    def get(self, version, team_id):
+        '''
+        Handles routes
+        /api/teams/team_id/history  Seasons of a team with its results, vehicles,
+                                    drivers, vehicle owners and standing
+        '''
+
+        if version == 'v1.0':
+
+            rows = db.session.query(Team, TeamSeason).\
+                outerjoin(TeamSeason, TeamSeason.team_id == Team.id).\
+                filter(Team.id == team_id).\
+                order_by(TeamSeason.series, TeamSeason.season).\
+                all()
+
+            if not rows:
+                abort(404, message='no team {0}'.format(team_id))
+
+            history = [self.marshal_season(s) for t, s in rows if s is not None]
+            return {'team': marshal(rows[0][0], self.team_fields), 'history': history}
+
+        return {'history': []}
+
+    def marshal_season(self, season):
+        rslt = marshal(season, self.season_fields)
+        rslt['drivers'] = [{'id': i, 'name': n}
+                           for i, n in zip(season.driver_ids, season.driver_names)]
+        rslt['owners'] = [{'id': i, 'name': n}
+                          for i, n in zip(season.owner_ids, season.owner_names)]
+        rslt['standing'] = None
+
+        if season.standing_position is not None:
+            rslt['standing'] = {'position': season.standing_position,
+                                'points': season.standing_points}
+        return rslt
+
+
 class VehicleList(Resource):
 
     owner_fields = {
@@ -128,12 +495,15 @@ class VehicleList(Resource):
         'vehicle_metadata': fields.Raw
     }
 
+    @cached
     def get(self, version, series=None, season=None):
         '''
         Handles routes
         /api/version/vehicles               All vehicles
         /api/version/series/vehicles        Vehicles from a series
         /api/version/series/season/vehicles Vehicles from a series and season
+        /api/version/w,b,c/season/vehicles  Vehicles from each of a list of series
+        /api/version/vehicles?ids=1,2,3     Vehicles with the given ids, in that order
         '''
 
         if version == 'v1.0':
@@ -143,13 +513,28 @@ class VehicleList(Resource):
 
             # /api/version/series/vehicles
             if series:
-                vehicles = vehicles.join(Vehicle.races).\
-                    filter(Race.series == series)
+                vehicles = vehicles.join(Vehicle.races)
+                vehicles = filter_series(vehicles, Race.series, series)
 
             # /api/version/series/season/vehicles
             if season:
                 vehicles = vehicles.filter(Race.season == season)
 
+            vehicles = filter_vehicle_metadata(vehicles)
+
+            # /api/version/vehicles?ids=1,2,3
+            ids = id_list_arg(integer_id)
+            if ids is not None:
+                vehicles = filter_ids(vehicles.options(joinedload(Vehicle.owner)),
+                                      Vehicle.id, ids)
+                return {'vehicles': marshal(vehicles, self.vehicle_fields)}
+
+            # /api/version/w,b,c/season/vehicles
+            if grouped(series):
+                vehicles = vehicles.add_columns(Race.series).order_by(Race.series, Vehicle.id)
+                return grouped_by_series('vehicles', vehicles, series, None,
+                                         lambda row: marshal(row[0], self.vehicle_fields))
+
             return {'vehicles': marshal(vehicles.all(), self.vehicle_fields)}
 
         return {'vehicles': []}
@@ -186,23 +571,149 @@ class DriverStandingsList(Resource):
         'top10': fields.Integer
     }
 
+    references = {'driver': 'people', 'vehicle': 'vehicles'}
+
+    rescored_fields = {
+        'driver': fields.Nested(person_fields),
+        'series': fields.String,
+        'season': fields.Integer,
+        'points_system': fields.String,
+        'position': fields.Integer,
+        'points': fields.Integer,
+        'wins': fields.Integer,
+        'starts': fields.Integer,
+        'dnfs': fields.Integer,
+        'top5': fields.Integer,
+        'top10': fields.Integer,
+        'laps_led': fields.Integer
+    }
+
+    @stored
+    @cached
     def get(self, version, series=None, season=None):
         '''
         Handles routes
-        /api/series/season/driverstandings Driver standings from a series and season
+        /api/series/season/driverstandings                       Driver standings from a series and season
+        /api/series/season/driverstandings?points_system=name    Driver standings with every result rescored
+        /api/series/1990-1999/driverstandings                    Driver standings of a range or list of seasons
+        /api/w,b,c/season/driverstandings                        Driver standings of each of a list of series
         '''
 
+        included = Included()
+
         if version == 'v1.0':
 
+            # /api/series/season/driverstandings?points_system=name
+            if series is not None and season is not None and 'points_system' in request.args:
+                if grouped(series, season):
+                    abort(400, message='standings can only be rescored one series '
+                                       'and season at a time')
+                return {'driverstandings': self.rescored(series, season,
+                                                         request.args['points_system'])}
+
             # /api/series/season/driverstandings
             if series is not None and season is not None:
-                driverstandings = DriverStanding.query.\
-                    filter(DriverStanding.series == series).\
-                    filter(DriverStanding.season == season)
-                return {'driverstandings': marshal(driverstandings.all(), self.driver_standings_fields)}
+                driverstandings = filter_series(DriverStanding.query, DriverStanding.series, series)
+                driverstandings = filter_seasons(driverstandings, DriverStanding.season, season)
+                driverstandings = filter_vehicle_metadata(driverstandings, DriverStanding.vehicle)
+                if grouped(series, season):
+                    driverstandings = driverstandings.order_by(DriverStanding.series, DriverStanding.season)
+                    return grouped_by_series(
+                        'driverstandings', driverstandings, series, season,
+                        lambda row: included.marshal(row, self.driver_standings_fields, self.references),
+                        included)
+                driverstandings = included.marshal(driverstandings.all(),
+                                                   self.driver_standings_fields, self.references)
+                if included:
+                    return {'driverstandings': driverstandings, 'included': included.render()}
+                return {'driverstandings': driverstandings}
 
         return {'driverstandings': []}
 
+    def rescored(self, series, season, name):
+        """ Standings of a season under the points system `name`, or the
+            one in force that season for `era`.
+        """
+        if name == 'era':
+            system = points_system_in_force(series, season)
+            if system is None:
+                abort(400, message='no points system known for {0} {1}'.format(series, season))
+        elif name in points_systems:
+            system = points_systems[name]
+        else:
+            abort(400, message='points_system must be era or one of {0}'.format(
+                ', '.join(points_systems)))
+
+        standings = []
+        for row in rescored_standings(system, series, season):
+            standing = dict(row.items(), series=series, season=season, points_system=system.name)
+            standing['driver'] = {'id': row.id, 'name': row.name, 'country': row.country}
+            standings.append(standing)
+        return marshal(standings, self.rescored_fields)
+
+
+class DriverProgression(Resource):
+
+    person_fields = {
+        'id': fields.Integer,
+        'name': fields.String,
+        'country': fields.String
+    }
+
+    round_fields = {
+        'round': fields.Integer,
+        'points': fields.Integer,
+        'total': fields.Integer,
+        'position': fields.Integer
+    }
+
+    driver_fields = {
+        'driver': fields.Nested(person_fields),
+        'rounds': fields.List(fields.Nested(round_fields))
+    }
+
+    def progressions(self, series, seasons):
+        """ Rounds and progression of a season, or of every season of a
+            list by season. Progressions are kept per series and season,
+            so most of these don't query.
+        """
+        if not isinstance(seasons, list):
+            progression = season_progression(series, seasons)
+            return progression['rounds'], marshal(progression['drivers'], self.driver_fields)
+        rounds, progression = OrderedDict(), OrderedDict()
+        for season in seasons:
+            rounds[str(season)], progression[str(season)] = self.progressions(series, season)
+        return rounds, progression
+
+    @cached
+    def get(self, version, series=None, season=None):
+        '''
+        Handles routes
+        /api/series/season/driverstandings/progression     Points and position of every driver after every round
+        /api/series/1990-1999/driverstandings/progression  The same for each of a range or list of seasons
+        /api/w,b,c/season/driverstandings/progression      The same for each of a list of series
+        '''
+
+        if version == 'v1.0' and series is not None and season is not None:
+            seasons = season_list(season)
+            if seasons is None:
+                try:
+                    seasons = int(season)
+                except ValueError:
+                    abort(400, message='seasons must look like 1990-1999 or 2001,2005')
+
+            # /api/w,b,c/season/driverstandings/progression
+            if series_list(series) is not None:
+                rounds, progression = OrderedDict(), OrderedDict()
+                for value in series_list(series):
+                    rounds[value], progression[value] = self.progressions(value, seasons)
+                return {'rounds': rounds, 'progression': progression}
+
+            rounds, progression = self.progressions(series, seasons)
+            return {'rounds': rounds, 'progression': progression}
+
+        return {'rounds': [], 'progression': []}
+
 
 class TeamStandingsList(Resource):
 
@@ -237,20 +748,38 @@ class TeamStandingsList(Resource):
         'poles': fields.Integer
     }
 
+    references = {'team': 'teams', 'vehicle': 'vehicles'}
+
+    @stored
+    @cached
     def get(self, version, series=None, season=None):
         '''
         Handles routes
-        /api/series/season/teamstandings  Team standings from a series and season
+        /api/series/season/teamstandings     Team standings from a series and season
+        /api/series/1990-1999/teamstandings  Team standings of a range or list of seasons
+        /api/w,b,c/season/teamstandings      Team standings of each of a list of series
         '''
 
+        included = Included()
+
         if version == 'v1.0':
 
             # /api/series/season/teamstandings
             if series is not None and season is not None:
-                teamstandings = TeamStanding.query.\
-                    filter(TeamStanding.series == series).\
-                    filter(TeamStanding.season == season)
-                return {'teamstandings': marshal(teamstandings.all(), self.team_standings_fields)}
+                teamstandings = filter_series(TeamStanding.query, TeamStanding.series, series)
+                teamstandings = filter_seasons(teamstandings, TeamStanding.season, season)
+                teamstandings = filter_vehicle_metadata(teamstandings, TeamStanding.vehicle)
+                if grouped(series, season):
+                    teamstandings = teamstandings.order_by(TeamStanding.series, TeamStanding.season)
+                    return grouped_by_series(
+                        'teamstandings', teamstandings, series, season,
+                        lambda row: included.marshal(row, self.team_standings_fields, self.references),
+                        included)
+                teamstandings = included.marshal(teamstandings.all(),
+                                                 self.team_standings_fields, self.references)
+                if included:
+                    return {'teamstandings': teamstandings, 'included': included.render()}
+                return {'teamstandings': teamstandings}
 
         return {'teamstandings': []}
 
@@ -279,19 +808,28 @@ class OwnerStandingsList(Resource):
         'points': fields.Integer
     }
 
+    @stored
+    @cached
     def get(self, version, series=None, season=None):
         '''
         Handles routes
-        /api/version/series/season/ownerstandings  Owner standings from a series and season
+        /api/version/series/season/ownerstandings     Owner standings from a series and season
+        /api/version/series/1990-1999/ownerstandings  Owner standings of a range or list of seasons
+        /api/version/w,b,c/season/ownerstandings      Owner standings of each of a list of series
         '''
 
         if version == 'v1.0':
 
             # /api/series/season/teamstandings
             if series is not None and season is not None:
-                ownerstandings = OwnerStanding.query.\
-                    filter(OwnerStanding.series == series).\
-                    filter(OwnerStanding.season == season)
+                ownerstandings = filter_series(OwnerStanding.query, OwnerStanding.series, series)
+                ownerstandings = filter_seasons(ownerstandings, OwnerStanding.season, season)
+                ownerstandings = filter_vehicle_metadata(ownerstandings, OwnerStanding.vehicle)
+                if grouped(series, season):
+                    ownerstandings = ownerstandings.order_by(OwnerStanding.series, OwnerStanding.season)
+                    return grouped_by_series(
+                        'ownerstandings', ownerstandings, series, season,
+                        lambda row: marshal(row, self.owner_standings_fields))
                 return {'ownerstandings': marshal(ownerstandings.all(), self.owner_standings_fields)}
 
         return {'ownerstandings': []}
@@ -319,24 +857,202 @@ class RaceList(Resource):
         'series': fields.String
     }
 
+    race_summary_fields = {
+        'id': fields.String(attribute='race_id'),
+        'name': fields.String,
+        'season': fields.Integer,
+        'round': fields.Integer,
+        'date': fields.String,
+        'laps': fields.Integer,
+        'length': fields.Arbitrary,
+        'distance': fields.Arbitrary,
+        'series': fields.String,
+        'race_types': fields.List(fields.String)
+    }
+
+    race_standing_fields = {
+        'race_time': fields.String,
+        'caution_flags': fields.Integer,
+        'caution_flag_laps': fields.Integer,
+        'lead_changes': fields.Integer,
+        'pole_speed': fields.Arbitrary,
+        'avg_speed': fields.Arbitrary,
+        'victory_margin': fields.Arbitrary
+    }
+
+    winner_fields = {
+        'id': fields.Integer(attribute='winner_id'),
+        'name': fields.String(attribute='winner_name'),
+        'team_id': fields.String(attribute='winner_team_id'),
+        'vehicle_number': fields.Integer(attribute='winner_vehicle_number')
+    }
+
+    pole_fields = {
+        'id': fields.Integer(attribute='pole_id'),
+        'name': fields.String(attribute='pole_name'),
+        'lap_time': fields.Arbitrary(attribute='pole_lap_time')
+    }
+
+    @stored
+    @cached
     def get(self, version, series=None, season=None):
         '''
         Handles routes
-        /api/series/season/races  Races from a series and season
+        /api/series/season/races                 Races from a series and season
+        /api/series/season/races?expand=summary  Races with their track, standing, winner and pole
+        /api/series/2001,2005/races              Races of a range or list of seasons
+        /api/w,b,c/season/races                  Races of each of a list of series
+        /api/races?ids=r1,r2                     Races with the given ids, in that order
         '''
 
         if version == 'v1.0':
 
+            # /api/races?ids=r1,r2
+            ids = id_list_arg()
+            if ids is not None:
+                races = Race.query.options(joinedload(Race.race_track))
+                if series is not None:
+                    races = filter_series(races, Race.series, series)
+                if season is not None:
+                    races = filter_seasons(races, Race.season, season)
+                races = filter_ids(races, Race.id, ids)
+                return {'races': marshal(races, self.race_fields)}
+
+            # /api/series/season/races?expand=summary
+            if series is not None and season is not None and \
+                    request.args.get('expand') == 'summary':
+                summaries = filter_series(RaceSummary.query, RaceSummary.series, series)
+                summaries = filter_seasons(summaries, RaceSummary.season, season)
+                if grouped(series, season):
+                    summaries = summaries.order_by(RaceSummary.series, RaceSummary.season,
+                                                   RaceSummary.date.asc())
+                    return grouped_by_series('races', summaries, series, season,
+                                             self.marshal_summary)
+                summaries = summaries.order_by(RaceSummary.date.asc())
+                return {'races': [self.marshal_summary(s) for s in summaries.all()]}
+
             # /api/series/season/races
             if series is not None and season is not None:
-                races = Race.query.\
-                    filter(Race.series == series).\
-                    filter(Race.season == season).\
-                    order_by(Race.date.asc())
+                races = filter_series(Race.query, Race.series, series)
+                races = filter_seasons(races, Race.season, season)
+                if grouped(series, season):
+                    races = races.order_by(Race.series, Race.season, Race.date.asc())
+                    return grouped_by_series('races', races, series, season,
+                                             lambda row: marshal(row, self.race_fields))
+                races = races.order_by(Race.date.asc())
                 return {'races': marshal(races.all(), self.race_fields)}
 
         return {'races': []}
 
+    def marshal_summary(self, summary):
+        rslt = marshal(summary, self.race_summary_fields)
+        rslt['race_track'] = marshal(summary, self.race_track_list)
+        rslt['race_standing'] = None
+        rslt['winner'] = None
+        rslt['pole'] = None
+
+        if summary.race_time is not None:
+            rslt['race_standing'] = marshal(summary, self.race_standing_fields)
+        if summary.winner_team_id is not None:
+            rslt['winner'] = marshal(summary, self.winner_fields)
+        if summary.pole_lap_time is not None:
+            rslt['pole'] = marshal(summary, self.pole_fields)
+        return rslt
+
+
+class TrackList(Resource):
+
+    track_fields = {
+        'id': fields.Integer,
+        'site': fields.String,
+        'circuit_name': fields.String,
+        'city': fields.String,
+        'state': fields.String,
+        'country': fields.String
+    }
+
+    held_fields = {
+        'races': fields.Integer,
+        'first_season': fields.Integer,
+        'last_season': fields.Integer
+    }
+
+    lap_record_fields = {
+        'lap_time': fields.Arbitrary(attribute='lap_record'),
+        'race_id': fields.String(attribute='lap_record_race_id'),
+        'driver_id': fields.Integer(attribute='lap_record_person_id'),
+        'driver_name': fields.String(attribute='lap_record_person_name')
+    }
+
+    avg_speed_record_fields = {
+        'avg_speed': fields.Arbitrary(attribute='avg_speed_record'),
+        'race_id': fields.String(attribute='avg_speed_race_id')
+    }
+
+    most_wins_fields = {
+        'wins': fields.Integer(attribute='most_wins'),
+        'driver_id': fields.Integer(attribute='most_wins_person_id'),
+        'driver_name': fields.String(attribute='most_wins_person_name')
+    }
+
+    @cached
+    def get(self, version, track_id=None):
+        '''
+        Handles routes
+        /api/tracks             All tracks with their records
+        /api/tracks/track_id    A track with its records and every race held there
+        '''
+
+        if version == 'v1.0':
+
+            # /api/tracks
+            tracks = db.session.query(RaceTrack, TrackRecord).\
+                outerjoin(TrackRecord, TrackRecord.race_track_id == RaceTrack.id).\
+                order_by(RaceTrack.id)
+
+            if track_id is None:
+                return {'tracks': [self.marshal_track(t, r) for t, r in tracks.all()]}
+
+            # /api/tracks/track_id
+            row = tracks.filter(RaceTrack.id == track_id).first()
+            if row is None:
+                abort(404, message='no track {0}'.format(track_id))
+
+            races = RaceSummary.query.\
+                filter(RaceSummary.race_track_id == track_id).\
+                order_by(RaceSummary.date.asc())
+
+            rslt = self.marshal_track(*row)
+            rslt['race_list'] = [self.marshal_race(s) for s in races.all()]
+            return {'tracks': [rslt]}
+
+        return {'tracks': []}
+
+    def marshal_track(self, track, record):
+        rslt = marshal(track, self.track_fields)
+        rslt['records'] = {'lap': None, 'avg_speed': None, 'most_wins': None}
+
+        # Tracks that never held a race have no record row.
+        if record is None:
+            rslt.update({'races': 0, 'first_season': None, 'last_season': None})
+            return rslt
+
+        rslt.update(marshal(record, self.held_fields))
+        if record.lap_record is not None:
+            rslt['records']['lap'] = marshal(record, self.lap_record_fields)
+        if record.avg_speed_record is not None:
+            rslt['records']['avg_speed'] = marshal(record, self.avg_speed_record_fields)
+        if record.most_wins is not None:
+            rslt['records']['most_wins'] = marshal(record, self.most_wins_fields)
+        return rslt
+
+    def marshal_race(self, summary):
+        rslt = marshal(summary, RaceList.race_summary_fields)
+        rslt['winner'] = None
+        if summary.winner_team_id is not None:
+            rslt['winner'] = marshal(summary, RaceList.winner_fields)
+        return rslt
+
 
 class RaceStandingList(Resource):
 
@@ -351,6 +1067,7 @@ class RaceStandingList(Resource):
         'victory_margin': fields.Arbitrary
     }
 
+    @cached
     def get(self, version, race_id=None):
         '''
         Handles routes
@@ -401,38 +1118,57 @@ class RaceEntryList(Resource):
         'vehicle': fields.Nested(vehicle_fields)
     }
 
+    references = {'team': 'teams', 'vehicle': 'vehicles'}
+
+    @stored
+    @cached
     def get(self, version, series=None, season=None, entry_type=None, round=None):
         '''
         Handles routes
         /api/series/season/raceentry/entry_type/race_id      Race entry list
+        /api/w,b,c/season/raceentry/entry_type/race_id       Race entry lists of a list of series
         '''
 
+        # Everyone asks for the entry list at once when it comes out.
+        return coalesced(lambda: self.entries(version, series, season, entry_type, round))
+
+    def entries(self, version, series, season, entry_type, round):
         results = []
+        included = Included()
 
         if version == 'v1.0':
 
             if series and season and entry_type and round:
                 raceentry = RaceEntry.query.\
                     join(RaceEntry.race).\
-                    join(RaceEntry.entry_type).\
-                    filter(Race.series == series).\
+                    join(RaceEntry.entry_type)
+                raceentry = filter_series(raceentry, Race.series, series).\
                     filter(Race.season == season).\
                     filter(Race.round == round).\
                     filter(RaceEntryType.entry_type == entry_type)
+                raceentry = filter_vehicle_metadata(raceentry, RaceEntry.vehicle)
+                if included:
+                    raceentry = raceentry.options(subqueryload(RaceEntry.people))
 
-                raceentry = raceentry.all()
+                # /api/w,b,c/season/raceentry/entry_type/race_id
+                if grouped(series):
+                    raceentry = raceentry.add_columns(Race.series).order_by(Race.series)
+                    return grouped_by_series('raceentry', raceentry, series, None,
+                                             lambda row: self.marshal_entry(row[0], included),
+                                             included)
 
-                for result in raceentry:
-                    rslt = marshal(result, self.race_entry_fields)
-
-                    for p in result.people:
-                        prsn = marshal(p.person, self.person_fields)
-                        rslt[p.type] = prsn
-
-                    results.append(rslt)
+                results = [self.marshal_entry(result, included) for result in raceentry.all()]
 
+        if included:
+            return {'raceentry': results, 'included': included.render()}
         return {'raceentry': results}
 
+    def marshal_entry(self, entry, included):
+        rslt = included.marshal(entry, self.race_entry_fields, self.references)
+        for p in entry.people:
+            rslt[p.type] = included.related(p, 'person', 'people', self.person_fields)
+        return rslt
+
 
 class RaceResultList(Resource):
 
@@ -473,36 +1209,51 @@ class RaceResultList(Resource):
         'money': fields.Arbitrary
     }
 
+    references = {'team': 'teams', 'vehicle': 'vehicles'}
+
+    @stored
+    @cached
     def get(self, version, series=None, season=None, round=None):
         '''
         Handles routes
         /api/series/season/raceresults/round      Race results list
+        /api/w,b,c/season/raceresults/round       Race results lists of a list of series
         '''
 
         results = []
+        included = Included()
 
         if version == 'v1.0':
 
             if series and season and round:
                 raceresults = RaceResult.query.\
-                    join(RaceResult.race).\
-                    filter(Race.series == series).\
+                    join(RaceResult.race)
+                raceresults = filter_series(raceresults, Race.series, series).\
                     filter(Race.season == season).\
                     filter(Race.round == round)
+                raceresults = filter_vehicle_metadata(raceresults, RaceResult.vehicle)
+                if included:
+                    raceresults = raceresults.options(subqueryload(RaceResult.people))
 
-                raceresults = raceresults.all()
+                # /api/w,b,c/season/raceresults/round
+                if grouped(series):
+                    raceresults = raceresults.add_columns(Race.series).order_by(Race.series)
+                    return grouped_by_series('raceresults', raceresults, series, None,
+                                             lambda row: self.marshal_result(row[0], included),
+                                             included)
 
-                for result in raceresults:
-                    rslt = marshal(result, self.race_result_fields)
-
-                    for p in result.people:
-                        prsn = marshal(p.person, self.person_fields)
-                        rslt[p.type] = prsn
-
-                    results.append(rslt)
+                results = [self.marshal_result(result, included) for result in raceresults.all()]
 
+        if included:
+            return {'raceresults': results, 'included': included.render()}
         return {'raceresults': results}
 
+    def marshal_result(self, result, included):
+        rslt = included.marshal(result, self.race_result_fields, self.references)
+        for p in result.people:
+            rslt[p.type] = included.related(p, 'person', 'people', self.person_fields)
+        return rslt
+
 
 class QualifyingResultList(Resource):
 
@@ -539,40 +1290,51 @@ class QualifyingResultList(Resource):
         'lap_time': fields.Arbitrary
     }
 
+    @stored
+    @cached
     def get(self, version, series=None, season=None, round=None, session=None):
         '''
         Handles routes
         /api/series/season/qualifyingresults/round          Qualifying results list
         /api/series/season/qualifyingresults/round/session  Qualifying results list on a given session
+        /api/w,b,c/season/qualifyingresults/round           Qualifying results lists of a list of series
         '''
 
+        # Everyone asks for qualifying results at once when they come out.
+        return coalesced(lambda: self.results(version, series, season, round, session))
+
+    def results(self, version, series, season, round, session):
         results = []
 
         if version == 'v1.0':
 
             if series and season and round:
                 qualifyingresults = QualifyingResult.query.\
-                    join(QualifyingResult.race).\
-                    filter(Race.series == series).\
+                    join(QualifyingResult.race)
+                qualifyingresults = filter_series(qualifyingresults, Race.series, series).\
                     filter(Race.season == season).\
                     filter(Race.round == round)
 
             if session:
                 qualifyingresults = qualifyingresults.filter(QualifyingResult.session == session)
 
-            qualifyingresults = qualifyingresults.all()
+            qualifyingresults = filter_vehicle_metadata(qualifyingresults, QualifyingResult.vehicle)
 
-            for result in qualifyingresults:
-                rslt = marshal(result, self.qualifying_result_fields)
+            if grouped(series):
+                qualifyingresults = qualifyingresults.add_columns(Race.series).order_by(Race.series)
+                return grouped_by_series('qualifyingresults', qualifyingresults, series, None,
+                                         lambda row: self.marshal_result(row[0]))
 
-                for p in result.people:
-                    prsn = marshal(p.person, self.person_fields)
-                    rslt[p.type] = prsn
-
-                results.append(rslt)
+            results = [self.marshal_result(result) for result in qualifyingresults.all()]
 
         return {'qualifyingresults': results}
 
+    def marshal_result(self, result):
+        rslt = marshal(result, self.qualifying_result_fields)
+        for p in result.people:
+            rslt[p.type] = marshal(p.person, self.person_fields)
+        return rslt
+
 
 class PracticeResultList(Resource):
 
@@ -609,11 +1371,14 @@ class PracticeResultList(Resource):
         'lap_time': fields.Arbitrary
     }
 
+    @stored
+    @cached
     def get(self, version, series=None, season=None, round=None, session=None):
         '''
         Handles routes
         /api/series/season/practiceresults/round              Practice results list
         /api/series/season/practiceresults/round/session      Practice results list for a given session
+        /api/w,b,c/season/practiceresults/round               Practice results lists of a list of series
         '''
 
         results = []
@@ -622,23 +1387,163 @@ class PracticeResultList(Resource):
 
             if series and season and round:
                 practiceresults = PracticeResult.query.\
-                    join(PracticeResult.race).\
-                    filter(Race.series == series).\
+                    join(PracticeResult.race)
+                practiceresults = filter_series(practiceresults, Race.series, series).\
                     filter(Race.season == season).\
                     filter(Race.round == round)
 
             if session:
                 practiceresults = practiceresults.filter(PracticeResult.session == session)
 
-            practiceresults = practiceresults.all()
+            practiceresults = filter_vehicle_metadata(practiceresults, PracticeResult.vehicle)
 
-            for result in practiceresults:
-                rslt = marshal(result, self.practice_result_fields)
+            if grouped(series):
+                practiceresults = practiceresults.add_columns(Race.series).order_by(Race.series)
+                return grouped_by_series('practiceresults', practiceresults, series, None,
+                                         lambda row: self.marshal_result(row[0]))
 
-                for p in result.people:
-                    prsn = marshal(p.person, self.person_fields)
-                    rslt[p.type] = prsn
-
-                results.append(rslt)
+            results = [self.marshal_result(result) for result in practiceresults.all()]
 
         return {'practiceresults': results}
+
+    def marshal_result(self, result):
+        rslt = marshal(result, self.practice_result_fields)
+        for p in result.people:
+            rslt[p.type] = marshal(p.person, self.person_fields)
+        return rslt
+
+
+class ColumnarExport(Resource):
+
+    def get(self, version, series=None, season=None, dataset=None):
+        '''
+        Handles routes
+        /api/series/season/export/dataset   Columnar download of a dataset for a series and season
+        '''
+
+        # One partition per series and season; lists of series aren't exported.
+        if version == 'v1.0' and dataset in DATASETS and season.isdigit() and \
+                series_list(series) is None:
+            filename = '{0}-{1}-{2}{3}'.format(dataset, series, season, FILE_EXTENSION)
+            return Response(render_partition(dataset, series, season),
+                            mimetype='application/gzip',
+                            headers={'Content-Disposition': 'attachment; filename=' + filename})
+
+        abort(404)
+
+
+class Search(Resource):
+
+    person_fields = {
+        'id': fields.Integer,
+        'name': fields.String,
+        'country': fields.String
+    }
+
+    team_fields = {
+        'id': fields.String,
+        'name': fields.String,
+        'alias': fields.String
+    }
+
+    def get(self, version):
+        '''
+        Handles routes
+        /api/version/search?q=query         People and teams matching a name
+        /api/version/search?q=query&limit=n At most n (up to 50) of each
+        '''
+
+        if version == 'v1.0':
+
+            q = request.args.get('q', '').strip()
+            limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+            limit = max(1, min(limit, MAX_LIMIT))
+
+            if q:
+                people = name_search(Person, [Person.name], q, limit)
+                teams = name_search(Team, [Team.name, Team.alias], q, limit)
+                return {'people': marshal(people, self.person_fields),
+                        'teams': marshal(teams, self.team_fields)}
+
+        return {'people': [], 'teams': []}
+
+
+class AutocompleteList(Resource):
+
+    suggestion_fields = {
+        'type': fields.String,
+        'id': fields.Raw,
+        'name': fields.String
+    }
+
+    def get(self, version):
+        '''
+        Handles routes
+        /api/version/autocomplete?q=prefix          People, teams and tracks with a word starting with prefix
+        /api/version/autocomplete?q=prefix&limit=n  At most n (up to 50) suggestions
+        '''
+
+        if version == 'v1.0':
+
+            q = request.args.get('q', '')
+            limit = request.args.get('limit', autocomplete.DEFAULT_LIMIT, type=int)
+            limit = max(1, min(limit, autocomplete.MAX_LIMIT))
+
+            suggestions = current_app.extensions['autocomplete'].lookup(q, limit)
+            suggestions = [dict(zip(('type', 'id', 'name'), s)) for s in suggestions]
+            return {'autocomplete': marshal(suggestions, self.suggestion_fields)}
+
+        return {'autocomplete': []}
+
+
+class ChangeList(Resource):
+
+    def get(self, version):
+        '''
+        Handles routes
+        /api/version/changes                Every change, oldest first
+        /api/version/changes?since=token    Changes after the one a token was returned for
+        /api/version/changes?limit=n        At most n (up to 5000) changes
+        '''
+
+        if version == 'v1.0':
+            since = request.args.get('since') or None
+            limit = request.args.get('limit', changes.DEFAULT_LIMIT, type=int)
+            limit = max(1, min(limit, changes.MAX_LIMIT))
+
+            try:
+                rslt, next_token = changes.changes_since(since, limit)
+            except ValueError:
+                abort(400, message='since must be a token returned by a previous request')
+
+            return {'changes': rslt, 'next': next_token}
+
+        return {'changes': []}
+
+
+class CoalescingStats(Resource):
+
+    def get(self, version):
+        '''
+        Handles routes
+        /api/version/debug/coalescing   Computations and coalesced waits of single-flight requests
+        '''
+
+        if version == 'v1.0':
+            return {'coalescing': current_app.extensions['single_flight'].stats()}
+
+        return {'coalescing': {}}
+
+
+class CacheStats(Resource):
+
+    def get(self, version):
+        '''
+        Handles routes
+        /api/version/debug/cache   Backend, hits and misses of the response cache
+        '''
+
+        if version == 'v1.0':
+            return {'cache': current_app.extensions['cache'].stats()}
+
+        return {'cache': {}}
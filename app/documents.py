@@ -0,0 +1,111 @@
+import json
+from functools import wraps
+from flask import request, Response, current_app
+from sqlalchemy import select, func, cast, text
+from sqlalchemy.engine import Engine
+from models import db, RenderedDocument
+from projections import DOCUMENTS_LOCK
+
+
+# Stores a document unless a request rendering the same path stored it
+# first. SQLAlchemy 0.8 can't express ON CONFLICT.
+INSERT_DOCUMENT = text(
+    "INSERT INTO rendered_documents (path, series, season, round, document) "
+    "VALUES (:path, :series, :season, :round, CAST(:document AS jsonb)) "
+    "ON CONFLICT (path) DO NOTHING")
+
+
+def storable(kwargs):
+    """ Whether the route arguments of a request name a single race or
+        season, without a session, and the request has no arguments
+        changing what is rendered.
+    """
+    series = kwargs.get('series')
+    season = kwargs.get('season')
+    round = kwargs.get('round')
+    return kwargs.get('version') == 'v1.0' and not request.args and \
+        series is not None and ',' not in series and \
+        season is not None and season.isdigit() and \
+        (round is None or round.isdigit()) and kwargs.get('session') is None
+
+
+class DocumentStore(object):
+    """ Keeps the rendered JSON of race and season endpoints in
+        rendered_documents when DOCUMENT_STORE is set, and serves it
+        from there with one primary key lookup. Documents whose rows
+        change are deleted by projections.RenderedDocuments.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = bool(app.config.get('DOCUMENT_STORE'))
+        app.extensions['documents'] = self
+
+    def response(self, kwargs, render):
+        """ Returns the stored document of the current request, or stores
+            what `render()` returns. Only dictionaries are stored.
+        """
+        documents = RenderedDocument.__table__
+        row = db.session.execute(select([cast(documents.c.document, db.Text)]).
+                                 where(documents.c.path == request.path)).first()
+        if row is not None:
+            self.hits += 1
+            return Response(row[0], mimetype='application/json')
+
+        self.misses += 1
+        # Keeps changes to the rows about to be rendered from committing
+        # before the document is stored.
+        db.session.execute(select([func.pg_advisory_xact_lock_shared(DOCUMENTS_LOCK)]))
+        data = render()
+        if isinstance(data, dict):
+            round = kwargs.get('round')
+            self.store({
+                'path': request.path,
+                'series': kwargs['series'],
+                'season': int(kwargs['season']),
+                'round': int(round) if round is not None else None,
+                'document': json.dumps(data, separators=(',', ':'))
+            })
+        return data
+
+    def store(self, values):
+        """ Inserts a document on a connection of its own, committed
+            without committing, or running the commit hooks of, anything
+            else of the request. The request keeps holding the lock until
+            it ends.
+        """
+        bind = db.session.get_bind(RenderedDocument.__mapper__)
+        if not isinstance(bind, Engine):
+            # Sessions bound to a connection, like those of the tests,
+            # store it in the transaction of that connection instead.
+            with bind.begin():
+                bind.execute(INSERT_DOCUMENT, values)
+            return
+        with bind.begin() as conn:
+            conn.execute(INSERT_DOCUMENT, values)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+def stored(get):
+    """ Decorates the `get` method of a race or season resource to serve
+        stored documents.
+    """
+    @wraps(get)
+    def stored_get(*args, **kwargs):
+        store = current_app.extensions['documents']
+        if not store.enabled or not storable(kwargs):
+            return get(*args, **kwargs)
+        return store.response(kwargs, lambda: get(*args, **kwargs))
+    return stored_get
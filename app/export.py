@@ -0,0 +1,188 @@
+import datetime
+import decimal
+import gzip
+import json
+import os
+from StringIO import StringIO
+from sqlalchemy import Integer, Numeric, Date, DateTime, Time, select, and_
+from models import db, Race, RaceResult, RaceResultPerson, QualifyingResult, \
+    QualifyingResultPerson, DriverStanding, TeamStanding, OwnerStanding
+
+
+# Number of rows pulled from the server side cursor at a time.
+BATCH_SIZE = 1000
+
+FILE_EXTENSION = '.cols.json.gz'
+
+
+def race_results_select():
+    """ Race results with the round, date and driver of each result.
+    """
+    races = Race.__table__
+    results = RaceResult.__table__
+    people = RaceResultPerson.__table__
+
+    return select([results.c.id, results.c.race_id, races.c.round,
+                   races.c.date, results.c.team_id, results.c.vehicle_id,
+                   people.c.person_id.label('driver_id'), results.c.sponsor,
+                   results.c.grid, results.c.position, results.c.laps,
+                   results.c.status, results.c.laps_led, results.c.points,
+                   results.c.money],
+                  from_obj=results.join(races).outerjoin(
+                      people, and_(people.c.race_result_id == results.c.id,
+                                   people.c.type == 'driver'))).\
+        order_by(races.c.round, results.c.position)
+
+
+def qualifying_results_select():
+    """ Qualifying results with the round, date and driver of each result.
+    """
+    races = Race.__table__
+    results = QualifyingResult.__table__
+    people = QualifyingResultPerson.__table__
+
+    return select([results.c.id, results.c.race_id, races.c.round,
+                   races.c.date, results.c.team_id, results.c.vehicle_id,
+                   people.c.person_id.label('driver_id'), results.c.session,
+                   results.c.position, results.c.lap_time],
+                  from_obj=results.join(races).outerjoin(
+                      people, and_(people.c.qualifying_result_id == results.c.id,
+                                   people.c.type == 'driver'))).\
+        order_by(races.c.round, results.c.session, results.c.position)
+
+
+def standings_select(model):
+    """ Returns a function selecting every column of a standings table.
+    """
+    def standings():
+        table = model.__table__
+        return select([table]).order_by(table.c.position)
+    return standings
+
+
+# Each dataset maps to the select producing its rows and the
+# table whose series and season columns partition it.
+DATASETS = {
+    'race_results': (race_results_select, Race.__table__),
+    'qualifying_results': (qualifying_results_select, Race.__table__),
+    'driver_standings': (standings_select(DriverStanding), DriverStanding.__table__),
+    'team_standings': (standings_select(TeamStanding), TeamStanding.__table__),
+    'owner_standings': (standings_select(OwnerStanding), OwnerStanding.__table__)
+}
+
+
+def column_type(column):
+    """ Name of the type stored in an exported column.
+    """
+    if isinstance(column.type, Integer):
+        return 'int'
+    if isinstance(column.type, Numeric):
+        return 'float'
+    if isinstance(column.type, (Date, DateTime, Time)):
+        return 'timestamp'
+    return 'string'
+
+
+def column_value(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def partitions(dataset, series=None):
+    """ Returns the (series, season) pairs holding rows of a dataset.
+    """
+    table = DATASETS[dataset][1]
+    query = select([table.c.series, table.c.season]).distinct().\
+        order_by(table.c.series, table.c.season)
+    if series:
+        query = query.where(table.c.series == series)
+    return [(row.series, row.season) for row in db.session.execute(query)]
+
+
+def build_columns(dataset, series, season):
+    """ Reads one partition of a dataset into a list of columns.
+
+        Rows are streamed from a server side cursor and appended to the
+        per column value lists, so memory is bounded by the size of a
+        single series/season rather than the whole table.
+    """
+    selectable, partition_table = DATASETS[dataset]
+    query = selectable().\
+        where(partition_table.c.series == series).\
+        where(partition_table.c.season == season)
+
+    columns = [{'name': c.name, 'type': column_type(c), 'values': []}
+               for c in query.columns]
+
+    connection = db.session.connection().execution_options(stream_results=True)
+    result = connection.execute(query)
+    num_rows = 0
+    try:
+        while True:
+            rows = result.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                for column, value in zip(columns, row):
+                    column['values'].append(column_value(value))
+            num_rows += len(rows)
+    finally:
+        result.close()
+
+    return {
+        'format': 'columnar-json',
+        'version': 1,
+        'dataset': dataset,
+        'series': series,
+        'season': int(season),
+        'num_rows': num_rows,
+        'columns': columns
+    }
+
+
+def write_columns(columns, fileobj):
+    """ Writes a partition as gzipped JSON to a file object.
+    """
+    archive = gzip.GzipFile(fileobj=fileobj, mode='wb')
+    try:
+        json.dump(columns, archive, separators=(',', ':'))
+    finally:
+        archive.close()
+
+
+def render_partition(dataset, series, season):
+    """ Returns one partition of a dataset as bytes.
+    """
+    buf = StringIO()
+    write_columns(build_columns(dataset, series, season), buf)
+    return buf.getvalue()
+
+
+def partition_path(output, dataset, series, season):
+    return os.path.join(output, dataset, 'series={0}'.format(series),
+                        'season={0}'.format(season), 'part-0' + FILE_EXTENSION)
+
+
+def export_columnar(output, datasets=None, series=None):
+    """ Writes every partition of the given datasets below `output`,
+        laid out as <dataset>/series=<series>/season=<season>/part-0.
+        Returns the list of written paths.
+    """
+    paths = []
+    for dataset in datasets or sorted(DATASETS):
+        for part_series, part_season in partitions(dataset, series):
+            path = partition_path(output, dataset, part_series, part_season)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+
+            # Write next to the final path and rename, so readers never
+            # see a partially written partition.
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                write_columns(build_columns(dataset, part_series, part_season), f)
+            os.rename(tmp_path, path)
+            paths.append(path)
+    return paths
@@ -0,0 +1,190 @@
+import collections
+import threading
+import time
+from flask import Blueprint, current_app, g, jsonify, request
+from sqlalchemy.exc import SQLAlchemyError
+from models import db
+
+
+# Milliseconds /readyz waits for the database before reporting the
+# application isn't ready.
+READY_TIMEOUT = 1000
+
+# Latest latencies kept per route for the summaries of /debug/stats.
+LATENCY_SAMPLES = 1000
+
+# Extension name -> key of its statistics in /debug/stats.
+EXTENSION_STATS = (
+    ('cache', 'cache'),
+    ('documents', 'documents'),
+    ('single_flight', 'coalescing'),
+    ('autocomplete', 'autocomplete'),
+    ('warmer', 'warm')
+)
+
+health = Blueprint('health', __name__)
+
+
+@health.route('/healthz')
+def healthz():
+    """ Whether the process serves requests, without touching the
+        database, for liveness checks.
+    """
+    return jsonify(status='ok')
+
+
+# The thread of the latest database check, which may still be waiting
+# for a connection.
+_check = None
+
+
+@health.route('/readyz')
+def readyz():
+    """ Whether the application should get traffic: the database answers
+        a trivial query in time and the warm-up, if any, is done.
+    """
+    warmer = current_app.extensions.get('warmer')
+    if warmer is not None and not warmer.ready:
+        return jsonify(status='warming'), 503
+    error = probe_database(db.engine)
+    if error is not None:
+        return jsonify(status='unavailable', error=error), 503
+    return jsonify(status='ok')
+
+
+def check_database(engine, timeout):
+    conn = engine.connect()
+    try:
+        transaction = conn.begin()
+        # Local to the transaction, so the connection goes back to the
+        # pool without the timeout.
+        conn.execute('SET LOCAL statement_timeout = {0:d}'.format(timeout))
+        conn.execute('SELECT 1')
+        transaction.rollback()
+    finally:
+        conn.close()
+
+
+def probe_database(engine):
+    """ Checks the database in a thread, which bounds the wait for a
+        connection from the pool or the server as well as the query.
+        Returns why the database isn't ready, or None. Checks aren't
+        started while the previous one still waits, so a hung database
+        doesn't pile up threads.
+    """
+    global _check
+    if _check is not None and _check.is_alive():
+        return 'previous check still waiting for the database'
+
+    errors = []
+
+    def check():
+        try:
+            check_database(engine, READY_TIMEOUT)
+        except SQLAlchemyError as e:
+            errors.append(str(e).strip())
+
+    _check = threading.Thread(target=check, name='readyz')
+    _check.daemon = True
+    _check.start()
+    _check.join(READY_TIMEOUT / 1000.0)
+    if _check.is_alive():
+        return 'no answer within {0}ms'.format(READY_TIMEOUT)
+    return errors[0] if errors else None
+
+
+def pool_stats(pool):
+    """ Size and usage of a connection pool, as far as its class tells.
+    """
+    stats = {'pool': type(pool).__name__}
+    for key, name in (('size', 'size'), ('checked_in', 'checkedin'),
+                      ('checked_out', 'checkedout'), ('overflow', 'overflow')):
+        method = getattr(pool, name, None)
+        if method is not None:
+            stats[key] = method()
+    return stats
+
+
+def latency_summary(count, samples):
+    """ Count, mean, median, 95th percentile and maximum, in
+        milliseconds, of the latest latencies of a route.
+    """
+    ordered = sorted(samples)
+
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        'count': count,
+        'mean_ms': round(1000 * sum(ordered) / len(ordered), 3),
+        'p50_ms': round(1000 * percentile(0.5), 3),
+        'p95_ms': round(1000 * percentile(0.95), 3),
+        'max_ms': round(1000 * ordered[-1], 3)
+    }
+
+
+class RequestMetrics(object):
+    """ Counts the requests in flight and keeps the latest latencies of
+        every route.
+    """
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.counts = collections.defaultdict(int)
+        self.latencies = collections.defaultdict(
+            lambda: collections.deque(maxlen=LATENCY_SAMPLES))
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self.started)
+        app.teardown_request(self.finished)
+        app.extensions['request_metrics'] = self
+
+    def started(self):
+        g.request_started = time.time()
+        with self.lock:
+            self.in_flight += 1
+
+    def finished(self, exception=None):
+        started = getattr(g, 'request_started', None)
+        if started is None:
+            return
+        seconds = time.time() - started
+        rule = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        with self.lock:
+            self.in_flight -= 1
+            self.counts[rule] += 1
+            self.latencies[rule].append(seconds)
+
+    def stats(self):
+        with self.lock:
+            routes = dict((rule, latency_summary(self.counts[rule], samples))
+                          for rule, samples in self.latencies.items())
+            return {'in_flight': self.in_flight, 'routes': routes}
+
+
+def debug_stats():
+    """ Database pool usage, requests in flight, route latencies and the
+        statistics of the caches and other components of the application.
+    """
+    extensions = current_app.extensions
+    stats = {
+        'database': pool_stats(db.engine.pool),
+        'requests': extensions['request_metrics'].stats()
+    }
+    for name, key in EXTENSION_STATS:
+        if name in extensions:
+            stats[key] = extensions[name].stats()
+    return jsonify(stats)
+
+
+def init_health(app):
+    """ Adds /healthz and /readyz, and /debug/stats when DEBUG_ROUTES
+        is set.
+    """
+    app.register_blueprint(health)
+    if app.config.get('DEBUG_ROUTES'):
+        RequestMetrics(app)
+        app.add_url_rule('/debug/stats', 'debug_stats', debug_stats)
@@ -0,0 +1,123 @@
+from flask import request
+from flask.ext.restful import fields, marshal, abort
+from sqlalchemy.orm import joinedload
+from models import Person, Team, Vehicle
+from sql import in_array
+
+
+person_fields = {
+    'id': fields.Integer,
+    'name': fields.String,
+    'country': fields.String
+}
+
+team_fields = {
+    'id': fields.String,
+    'name': fields.String,
+    'alias': fields.String,
+    'owner': fields.Nested(person_fields)
+}
+
+vehicle_fields = {
+    'id': fields.Integer,
+    'number': fields.Integer,
+    'owner': fields.Nested(person_fields),
+    'vehicle_metadata': fields.Raw
+}
+
+# Kind -> (model, fields, references) of the objects ?include= can
+# move to the included section. References map relationships of the
+# model to the kind of object they hold; each relationship `x` has its
+# id in `x_id`.
+KINDS = {
+    'people': (Person, person_fields, {}),
+    'teams': (Team, team_fields, {'owner': 'people'}),
+    'vehicles': (Vehicle, vehicle_fields, {'owner': 'people'})
+}
+
+# Teams and vehicles come first, as they add their owners to the people.
+LOAD_ORDER = ('teams', 'vehicles', 'people')
+
+
+def include_arg():
+    """ Returns the set of kinds requested with ?include=people,teams,
+        empty if the argument is missing.
+    """
+    kinds = set(kind.strip() for kind in request.args.get('include', '').split(',')
+                if kind.strip())
+    if kinds - set(KINDS):
+        abort(400, message='include must be a comma separated list of {0}'.format(
+            ', '.join(sorted(KINDS))))
+    return kinds
+
+
+class Included(object):
+    """ The people, teams and vehicles a response refers to.
+
+        Without ?include=, related objects are rendered in every row
+        referring to them, as they always were. With it, rows refer to
+        objects of the included kinds by id, and `render` loads each of
+        them once, with one query per kind, for the included section.
+    """
+
+    def __init__(self, kinds=None):
+        self.kinds = include_arg() if kinds is None else kinds
+        self.ids = dict((kind, set()) for kind in KINDS)
+
+    def __nonzero__(self):
+        return bool(self.kinds)
+
+    def fields(self, row_fields, references):
+        """ Copy of `row_fields` where references to included kinds are
+            rendered as ids.
+        """
+        row_fields = dict(row_fields)
+        for key, kind in references.items():
+            if kind in self.kinds:
+                row_fields[key] = fields.Raw(attribute=key + '_id')
+        return row_fields
+
+    def marshal(self, data, row_fields, references):
+        """ Marshals an object or a list of objects, noting the ids of the
+            included objects they refer to.
+        """
+        for obj in data if isinstance(data, (list, tuple)) else [data]:
+            for key, kind in references.items():
+                if kind in self.kinds:
+                    self.add(kind, getattr(obj, key + '_id'))
+        return marshal(data, self.fields(row_fields, references))
+
+    def related(self, obj, key, kind, related_fields):
+        """ Renders the `key` relationship of `obj`: the id of the related
+            object if its kind is included, its fields otherwise.
+        """
+        if kind in self.kinds:
+            return self.add(kind, getattr(obj, key + '_id'))
+        return marshal(getattr(obj, key), related_fields)
+
+    def add(self, kind, id):
+        if id is not None:
+            self.ids[kind].add(id)
+        return id
+
+    def render(self):
+        """ Loads the included objects the response refers to and returns
+            the included section, with the objects of every kind sorted
+            by id.
+        """
+        included = {}
+        for kind in LOAD_ORDER:
+            if kind not in self.kinds:
+                continue
+            model, kind_fields, references = KINDS[kind]
+            objs = []
+            if self.ids[kind]:
+                query = model.query.\
+                    filter(in_array(model.id, self.ids[kind])).\
+                    order_by(model.id)
+                for key, related in references.items():
+                    if related not in self.kinds:
+                        query = query.options(joinedload(key))
+                objs = query.all()
+            included[kind] = self.marshal(objs, kind_fields, references)
+        return included
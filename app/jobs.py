@@ -0,0 +1,252 @@
+import datetime
+import logging
+import os
+import socket
+import time
+import traceback
+from collections import OrderedDict
+from sqlalchemy import select, func, and_, case, exists, cast, text
+from sqlalchemy.exc import DBAPIError
+from models import db, Job
+from export import export_columnar
+from points import recompute_standings
+from projections import rebuild_projections
+
+
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Seconds before retrying a failed job, doubled after every attempt.
+RETRY_DELAY = 30
+
+# Seconds after which a running job is presumed lost with its worker
+# and run again.
+JOB_TIMEOUT = 3600
+
+# SQLSTATE of unique violations. SQLAlchemy 0.8 doesn't know the error
+# classes of psycopg2 2.8, and raises them as plain DBAPIErrors.
+UNIQUE_VIOLATION = '23505'
+
+# Seconds an idle worker waits before looking for jobs again.
+POLL_INTERVAL = 1.0
+
+# Name -> function called with the arguments of a job, in the order
+# they were registered.
+job_handlers = OrderedDict()
+
+# Queues a job unless an identical one is pending, which the partial
+# unique index on pending jobs tells. SQLAlchemy 0.8 can't express
+# ON CONFLICT.
+ENQUEUE_JOB = text(
+    "INSERT INTO jobs (name, arguments, max_attempts) "
+    "VALUES (:name, CAST(:arguments AS varchar(100)[]), :max_attempts) "
+    "ON CONFLICT (name, arguments) WHERE state = 'pending' DO NOTHING "
+    "RETURNING id")
+
+# Claims the oldest job ready to run, pending or lost with its worker.
+# SKIP LOCKED lets workers claim jobs concurrently without waiting on
+# each other, which SQLAlchemy 0.8 can't express either.
+CLAIM_JOB = text(
+    "UPDATE jobs SET state = 'running', attempts = attempts + 1, started_at = now(), "
+    "finished_at = NULL, worker = :worker "
+    "WHERE id = (SELECT id FROM jobs "
+    "            WHERE (state = 'pending' AND run_after <= now()) "
+    "               OR (state = 'running' AND attempts < max_attempts "
+    "                   AND started_at < now() - :timeout) "
+    "            ORDER BY id LIMIT 1 FOR UPDATE SKIP LOCKED) "
+    "RETURNING id, name, arguments, attempts, max_attempts")
+
+
+def register_job(name):
+    """ Decorator registering a function as the handler of the jobs
+        named `name`.
+    """
+    def register(handler):
+        job_handlers[name] = handler
+        return handler
+    return register
+
+
+@register_job('recompute-standings')
+def recompute_standings_job(series, season):
+    recompute_standings(series, int(season))
+
+
+@register_job('rebuild-projections')
+def rebuild_projections_job():
+    rebuild_projections(db.session)
+
+
+@register_job('export-columnar')
+def export_columnar_job(output, series=None):
+    export_columnar(output, series=series)
+
+
+def same_arguments(column, arguments):
+    # Bound arrays of strings are text[], which can't be compared with
+    # the varchar[] column without a cast.
+    return column == cast(arguments, column.type)
+
+
+def enqueue(name, *arguments, **options):
+    """ Queues a call of the handler `name` with string arguments, in
+        the current transaction, and returns the id of the job. If an
+        identical job is pending, nothing is queued and its id is
+        returned instead.
+    """
+    if name not in job_handlers:
+        raise ValueError('unknown job {0!r}'.format(name))
+    arguments = [unicode(argument) for argument in arguments]
+    max_attempts = options.get('max_attempts', DEFAULT_MAX_ATTEMPTS)
+
+    jobs = Job.__table__
+    while True:
+        row = db.session.execute(ENQUEUE_JOB, {'name': name, 'arguments': arguments,
+                                               'max_attempts': max_attempts}).first()
+        if row is not None:
+            return row.id
+
+        job_id = db.session.execute(select([jobs.c.id]).where(and_(
+            jobs.c.name == name, same_arguments(jobs.c.arguments, arguments),
+            jobs.c.state == 'pending'))).scalar()
+        if job_id is not None:
+            return job_id
+        # The pending job was claimed in between: it may run before the
+        # changes of this transaction commit, so queue another one.
+
+
+def fail_lost_jobs(timeout=JOB_TIMEOUT):
+    """ Marks failed the running jobs lost with their worker after their
+        last attempt.
+    """
+    jobs = Job.__table__
+    db.session.execute(jobs.update().
+                       where(jobs.c.state == 'running').
+                       where(jobs.c.attempts >= jobs.c.max_attempts).
+                       where(jobs.c.started_at < func.now() - datetime.timedelta(seconds=timeout)).
+                       values(state='failed', finished_at=func.now(),
+                              error='lost with its worker'))
+
+
+def job_metrics():
+    """ For every job name, the number of jobs in each state, and the
+        average seconds finished jobs waited to start and took to run.
+    """
+    jobs = Job.__table__
+
+    def count(state):
+        return func.count(case([(jobs.c.state == state, 1)]))
+
+    def seconds(interval):
+        return func.coalesce(func.avg(func.extract('epoch', interval)), 0)
+
+    finished = jobs.c.state == 'done'
+    query = select([jobs.c.name, count('pending'), count('running'), count('done'),
+                    count('failed'),
+                    seconds(case([(finished, jobs.c.started_at - jobs.c.created_at)])),
+                    seconds(case([(finished, jobs.c.finished_at - jobs.c.started_at)])),
+                    func.coalesce(func.max(func.extract(
+                        'epoch', case([(finished, jobs.c.finished_at - jobs.c.started_at)]))), 0)]).\
+        group_by(jobs.c.name).\
+        order_by(jobs.c.name)
+
+    metrics = OrderedDict()
+    for name, pending, running, done, failed, wait, run, longest in db.session.execute(query):
+        metrics[name] = {'pending': pending, 'running': running, 'done': done,
+                         'failed': failed, 'wait_seconds': float(wait),
+                         'run_seconds': float(run), 'max_run_seconds': float(longest)}
+    return metrics
+
+
+class Worker(object):
+    """ Claims queued jobs one at a time and runs them. Any number of
+        workers, in any number of processes and hosts, can share the
+        queue.
+    """
+
+    def __init__(self, app, poll_interval=POLL_INTERVAL, timeout=JOB_TIMEOUT):
+        self.app = app
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.name = '{0}:{1}'.format(socket.gethostname(), os.getpid())
+        self.done = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+    def claim(self):
+        fail_lost_jobs(self.timeout)
+        timeout = datetime.timedelta(seconds=self.timeout)
+        job = db.session.execute(CLAIM_JOB, {'worker': self.name, 'timeout': timeout}).first()
+        db.session.commit()
+        return job
+
+    def run_job(self, job):
+        """ Runs a claimed job, committing what it did along with its
+            completion. Failed jobs are retried later until they run out
+            of attempts. Returns whether the job succeeded.
+        """
+        jobs = Job.__table__
+        started = time.time()
+        try:
+            job_handlers[job.name](*job.arguments)
+            db.session.execute(jobs.update().where(jobs.c.id == job.id).
+                               values(state='done', finished_at=func.now(), error=None))
+            db.session.commit()
+            self.done += 1
+            return True
+        except Exception:
+            db.session.rollback()
+            error = traceback.format_exc()
+            logging.warning('job %s %s(%s) failed:\n%s', job.id, job.name,
+                            ', '.join(job.arguments), error)
+
+            # Retried unless out of attempts, or an identical job was
+            # queued meanwhile and will do the same work.
+            other = jobs.alias('other')
+            identical = exists().where(and_(other.c.name == job.name,
+                                            same_arguments(other.c.arguments, job.arguments),
+                                            other.c.state == 'pending'))
+            delay = datetime.timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+            try:
+                retried = db.session.execute(jobs.update().
+                                             where(jobs.c.id == job.id).
+                                             where(jobs.c.attempts < jobs.c.max_attempts).
+                                             where(~identical).
+                                             values(state='pending', run_after=func.now() + delay,
+                                                    error=error)).rowcount
+            except DBAPIError as e:
+                # The identical job was queued after the check; the
+                # unique index on pending jobs refused a second one.
+                if getattr(e.orig, 'pgcode', None) != UNIQUE_VIOLATION:
+                    raise
+                db.session.rollback()
+                retried = 0
+            if not retried:
+                db.session.execute(jobs.update().where(jobs.c.id == job.id).values(
+                    state='failed', finished_at=func.now(), error=error))
+            db.session.commit()
+            self.failed += 1
+            return False
+        finally:
+            self.seconds += time.time() - started
+
+    def run(self, burst=False):
+        """ Runs jobs until stopped or, in burst mode, until none is
+            ready to run.
+        """
+        with self.app.app_context():
+            while True:
+                job = self.claim()
+                if job is not None:
+                    self.run_job(job)
+                elif burst:
+                    return self.stats()
+                else:
+                    time.sleep(self.poll_interval)
+
+    def stats(self):
+        return {
+            'worker': self.name,
+            'done': self.done,
+            'failed': self.failed,
+            'seconds': self.seconds
+        }
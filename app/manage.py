@@ -1,138 +1,198 @@
-import os
-from flask import Flask
-from flask.ext.migrate import Migrate, MigrateCommand
-from flask.ext.restful import Api
-from flask.ext.script import Manager, Server, Shell
+import sys
+from flask import current_app
+from flask.ext.script import Manager, Server, Shell, Command, Option
 from models import db
-from controllers import DriverList, TeamList, VehicleList, \
-    DriverStandingsList, TeamStandingsList, RaceList, RaceStandingList, \
-    RaceEntryList, RaceResultList, QualifyingResultList, PracticeResultList, \
-    PeopleList, OwnerStandingsList
+from application import create_app, get_config_from_env
+from export import DATASETS, export_columnar
+from autocomplete import Autocomplete, benchmark
+from projections import rebuild_projections
+from cache import Cache
+from warm import Warmer, DEFAULT_SEASONS, DEFAULT_WORKERS
+from jobs import Worker, job_handlers, enqueue, job_metrics
 
 
-def create_app(env_config):
+# Only `runserver` imports the controllers and adds the API routes, and
+# only `database` imports Flask-Migrate and Alembic, so that one-shot
+# commands start quickly.
 
-    #crate the flask app and configure it
-    app = Flask(__name__, template_folder="templates")
-    app.config.update(env_config)
 
-    #configure database
-    db.init_app(app)
+class RunServer(Server):
 
-    #create restful API objet
-    api = Api(app)
+    description = 'Runs the Flask development server with the API routes'
 
-    #add api routes
-    api.add_resource(DriverList,
-                     '/api/<string:version>/drivers',
-                     '/api/<string:version>/<string:series>/drivers',
-                     '/api/<string:version>/<string:series>/<string:season>/drivers',
-                     endpoint='drivers')
+    def handle(self, app, *args, **kwargs):
+        from web import register_api
+        register_api(app)
+        return Server.handle(self, app, *args, **kwargs)
 
-    api.add_resource(TeamList,
-                     '/api/<string:version>/teams',
-                     '/api/<string:version>/<string:series>/teams',
-                     '/api/<string:version>/<string:series>/<string:season>/teams',
-                     endpoint='teams')
 
-    api.add_resource(VehicleList,
-                     '/api/<string:version>/vehicles',
-                     '/api/<string:version>/<string:series>/vehicles',
-                     '/api/<string:version>/<string:series>/<string:season>/vehicles',
-                     endpoint='vehicles')
-
-    api.add_resource(DriverStandingsList,
-                     '/api/<string:version>/<string:series>/<string:season>/driverstandings',
-                     endpoint='driverstandings')
+class ExportColumnar(Command):
+    """ Export results and standings as columnar files partitioned
+        by series and season.
+    """
 
-    api.add_resource(TeamStandingsList,
-                     '/api/<string:version>/<string:series>/<string:season>/teamstandings',
-                     endpoint='teamstandings')
+    option_list = (
+        Option('-o', '--output', dest='output', default='export'),
+        Option('-d', '--dataset', dest='datasets', action='append',
+               choices=sorted(DATASETS)),
+        Option('-s', '--series', dest='series', default=None)
+    )
 
-    api.add_resource(OwnerStandingsList,
-                     '/api/<string:version>/<string:series>/<string:season>/ownerstandings',
-                     endpoint='ownerstandings')
+    def run(self, output, datasets, series):
+        for path in export_columnar(output, datasets, series):
+            print path
 
-    api.add_resource(RaceList,
-                     '/api/<string:version>/<string:series>/<string:season>/races',
-                     endpoint='races')
 
-    api.add_resource(RaceStandingList,
-                     '/api/<string:version>/racestandings/<string:race_id>',
-                     endpoint='racestandings')
+class BenchmarkAutocomplete(Command):
+    """ Build the autocomplete index and measure lookups per second.
+    """
 
-    api.add_resource(RaceEntryList,
-                     '/api/<string:version>/<string:series>/<string:season>/raceentry/<string:entry_type>/<string:round>',
-                     endpoint='raceentry')
+    option_list = (
+        Option('-n', '--lookups', dest='lookups', type=int, default=100000),
+        Option('-p', '--prefix-length', dest='prefix_length', type=int, default=3)
+    )
 
-    api.add_resource(RaceResultList,
-                     '/api/<string:version>/<string:series>/<string:season>/raceresults/<string:round>',
-                     endpoint='raceresults')
+    def run(self, lookups, prefix_length):
+        autocomplete = current_app.extensions.get('autocomplete') or Autocomplete(current_app)
+        index = autocomplete.build()
+        print 'entries: {0}'.format(len(index))
+        print 'memory: {0} bytes'.format(index.memory_usage())
+        print 'build: {0:.3f}s'.format(autocomplete.build_seconds)
+        print 'lookups/s: {0:.0f}'.format(benchmark(index, lookups, prefix_length))
 
-    api.add_resource(QualifyingResultList,
-                     '/api/<string:version>/<string:series>/<string:season>/qualifyingresults/<string:round>',
-                     '/api/<string:version>/<string:series>/<string:season>/qualifyingresults/<string:round>/<string:session>',
-                     endpoint='qualifyingresults')
 
-    api.add_resource(PracticeResultList,
-                     '/api/<string:version>/<string:series>/<string:season>/practiceresults/<string:round>',
-                     '/api/<string:version>/<string:series>/<string:season>/practiceresults/<string:round>/<string:session>',
-                     endpoint='practiceresults')
+class RebuildProjections(Command):
+    """ Recompute every projection table, such as race_summaries, from scratch.
+    """
 
-    return app
+    def run(self):
+        rebuild_projections(db.session)
+        db.session.commit()
 
 
-def create_and_config_app(overloads={}):
-    """ Returns an application object grabbing configuration
-        from the environment and supplementing that with any
-        parameters passed in the `overloads` parameter.
+class Warm(Command):
+    """ Request the standings, races and results of the latest seasons
+        of every series, to warm the database caches after a deploy.
     """
-    config = get_config_from_env(overloads)
-    return create_app(config)
 
+    option_list = (
+        Option('-n', '--seasons', dest='seasons', type=int, default=DEFAULT_SEASONS),
+        Option('-w', '--workers', dest='workers', type=int, default=DEFAULT_WORKERS)
+    )
 
-def create_manager(env_config):
+    def run(self, seasons, workers):
+        from web import register_api
+        app = register_api(current_app._get_current_object())
 
-    #create app
-    app = create_app(env_config)
+        warmer = Warmer(app, seasons, workers)
 
-    #create migration manager
-    Migrate(app, db)
+        def progress(url, status):
+            print '[{0}/{1}] {2} {3}'.format(warmer.done, warmer.total, status, url)
 
-    #Create manager object and add commands to it
-    manager = Manager(app)
-    manager.add_command('runserver', Server())
-    manager.add_command('shell', Shell())
-    manager.add_command('database', MigrateCommand)
+        stats = warmer.run(progress)
+        if stats['error'] is not None:
+            print 'warming up failed: {0}'.format(stats['error'])
+        print 'ready in {0:.3f}s, {1} of {2} pages failed'.format(
+            stats['seconds'], len(stats['failed']), stats['pages'])
+
+
+def run_worker(app, burst):
+    stats = Worker(app).run(burst)
+    print '{0}: {1} jobs done, {2} failed attempts in {3:.3f}s'.format(
+        stats['worker'], stats['done'], stats['failed'], stats['seconds'])
 
-    return manager
 
+class RunWorker(Command):
+    """ Run queued jobs, such as standings recomputation and exports,
+        until stopped.
+    """
+
+    option_list = (
+        Option('-p', '--processes', dest='processes', type=int, default=1),
+        Option('-b', '--burst', dest='burst', action='store_true',
+               help='stop once no job is ready to run')
+    )
 
-def get_config_from_env(overloads={}):
+    def run(self, processes, burst):
+        app = current_app._get_current_object()
+        if processes == 1:
+            return run_worker(app, burst)
 
-    # Get our environment
-    full_env = dict(os.environ)
-    full_env.update(overloads)
+        import multiprocessing
+        # Forked processes can't share the connections of the pool.
+        db.engine.dispose()
+        workers = [multiprocessing.Process(target=run_worker, args=(app, burst))
+                   for i in range(processes)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
 
-    # Empty config
-    config = {}
 
-    # Keys for config dictionary.  We'll only pull out
-    # things that are specified here.
-    keys = (
-        "DATABASE_URL",
-        "DEBUG"
+class Enqueue(Command):
+    """ Queue a job for the workers, unless an identical one is pending.
+    """
+
+    option_list = (
+        Option('name', choices=list(job_handlers)),
+        Option('arguments', nargs='*')
     )
 
-    for key in keys:
-        if key in full_env:
-            value = full_env[key]
-            if value.lower() == 'true':
-                value = True
-            config[key] = value
+    def run(self, name, arguments):
+        job_id = enqueue(name, *arguments)
+        db.session.commit()
+        print 'job {0}'.format(job_id)
 
-    config['SQLALCHEMY_DATABASE_URI'] = config['DATABASE_URL']
-    return config
+
+class JobMetrics(Command):
+    """ Show how many jobs of every name are pending, running, done and
+        failed, and how long finished ones waited and ran.
+    """
+
+    def run(self):
+        print '{0:<24}{1:>8}{2:>8}{3:>8}{4:>8}{5:>10}{6:>10}{7:>10}'.format(
+            'job', 'pending', 'running', 'done', 'failed', 'wait', 'run', 'max run')
+        for name, m in job_metrics().items():
+            print '{0:<24}{1:>8}{2:>8}{3:>8}{4:>8}{5:>9.3f}s{6:>9.3f}s{7:>9.3f}s'.format(
+                name, m['pending'], m['running'], m['done'], m['failed'],
+                m['wait_seconds'], m['run_seconds'], m['max_run_seconds'])
+
+
+def needs_migrations(args):
+    """ Whether the command line runs the `database` command or lists
+        the commands, the only cases needing Flask-Migrate and Alembic.
+    """
+    return not args or args[0] in ('database', '-h', '--help')
+
+
+def create_manager(env_config, args=None):
+
+    #create app
+    app = create_app(env_config)
+
+    #commits of commands and job workers invalidate the responses cached
+    #by web workers in the shared file and memcached backends
+    Cache(app)
+
+    #Create manager object and add commands to it
+    manager = Manager(app, with_default_commands=False)
+    manager.add_command('runserver', RunServer())
+    manager.add_command('shell', Shell())
+    manager.add_command('export-columnar', ExportColumnar())
+    manager.add_command('benchmark-autocomplete', BenchmarkAutocomplete())
+    manager.add_command('rebuild-projections', RebuildProjections())
+    manager.add_command('warm', Warm())
+    manager.add_command('worker', RunWorker())
+    manager.add_command('enqueue', Enqueue())
+    manager.add_command('jobs', JobMetrics())
+
+    #create migration manager
+    if needs_migrations(sys.argv[1:] if args is None else args):
+        from flask.ext.migrate import Migrate, MigrateCommand
+        Migrate(app, db)
+        manager.add_command('database', MigrateCommand)
+
+    return manager
 
 if __name__ == '__main__':
     manager = create_manager(get_config_from_env())
@@ -1,10 +1,44 @@
 from flask.ext.sqlalchemy import SQLAlchemy
-from sqlalchemy.dialects.postgresql import HSTORE
+from sqlalchemy import event, DDL
+from sqlalchemy.dialects.postgresql import HSTORE, ARRAY
 from sqlalchemy.ext.mutable import MutableDict
+from sqlalchemy.types import UserDefinedType
 
 db = SQLAlchemy()
 
 
+class JSONB(UserDefinedType):
+    """ Postgres jsonb. Values are bound as JSON text; select them cast
+        to text to read them back the same way.
+    """
+
+    def get_col_spec(self):
+        return 'JSONB'
+
+
+# Name search folds case and accents with `search_key`. unaccent() is
+# only STABLE, so it is wrapped in an IMMUTABLE function that can be
+# used in index expressions.  Keep in sync with the migrations.
+event.listen(db.metadata, 'before_create', DDL(
+    "CREATE EXTENSION IF NOT EXISTS hstore; "
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm; "
+    "CREATE EXTENSION IF NOT EXISTS unaccent; "
+    "CREATE OR REPLACE FUNCTION search_key(text) RETURNS text AS "
+    "$$ SELECT lower(public.unaccent('public.unaccent'::regdictionary, $1)) $$ "
+    "LANGUAGE sql IMMUTABLE STRICT"))
+
+
+def search_indexes(table, column):
+    """ Indexes on search_key(column): trigram for substring matches and
+        text_pattern_ops for short prefixes.
+    """
+    ddl = (
+        "CREATE INDEX ix_{0}_{1}_trgm ON {0} USING gin (search_key({1}) gin_trgm_ops); "
+        "CREATE INDEX ix_{0}_{1}_prefix ON {0} (search_key({1}) text_pattern_ops)"
+    )
+    event.listen(table, 'after_create', DDL(ddl.format(table.name, column)))
+
+
 PersonType = db.Enum('driver', 'team-owner', 'crew-chief', 'vehicle-owner', 'team-principal',
                      'technical-chief', 'race-engineer', name='person_types')
 
@@ -17,6 +51,8 @@ class Person(db.Model):
     name = db.Column(db.String(100), nullable=False)
     country = db.Column(db.String(50), nullable=False)
 
+search_indexes(Person.__table__, 'name')
+
 
 class Series(db.Model):
 
@@ -38,10 +74,16 @@ class Team(db.Model):
     races = db.relationship('Race', secondary='race_results')
     owner = db.relationship('Person', primaryjoin=owner_id == Person.id)
 
+search_indexes(Team.__table__, 'name')
+search_indexes(Team.__table__, 'alias')
+
 
 class Vehicle(db.Model):
 
     __tablename__ = 'vehicles'
+    __table_args__ = (
+        db.Index('ix_vehicles_vehicle_metadata', 'vehicle_metadata', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     number = db.Column(db.Integer, nullable=False)
@@ -55,6 +97,9 @@ class Vehicle(db.Model):
 class DriverStanding(db.Model):
 
     __tablename__ = 'driver_standings'
+    __table_args__ = (
+        db.Index('ix_driver_standings_series_season', 'series', 'season'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     driver_id = db.Column(db.Integer, db.ForeignKey('people.id'), nullable=False)
@@ -77,6 +122,9 @@ class DriverStanding(db.Model):
 class TeamStanding(db.Model):
 
     __tablename__ = 'team_standings'
+    __table_args__ = (
+        db.Index('ix_team_standings_series_season', 'series', 'season'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     team_id = db.Column(db.String(50), db.ForeignKey('teams.id'), nullable=False)
@@ -94,6 +142,9 @@ class TeamStanding(db.Model):
 class OwnerStanding(db.Model):
 
     __tablename__ = 'owner_standings'
+    __table_args__ = (
+        db.Index('ix_owner_standings_series_season', 'series', 'season'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
@@ -120,6 +171,9 @@ class RaceTrack(db.Model):
 class Race(db.Model):
 
     __tablename__ = 'races'
+    __table_args__ = (
+        db.Index('ix_races_series_season', 'series', 'season'),
+    )
 
     id = db.Column(db.String(50), primary_key=True)
     round = db.Column(db.Integer, nullable=False)
@@ -301,3 +355,185 @@ class PracticeResultPerson(db.Model):
 
     person = db.relationship('Person')
     practice_result = db.relationship('PracticeResult')
+
+
+
+class RaceSummary(db.Model):
+    """ One row per race combining the race, its track, race types,
+        standing, winner and pole sitter. Maintained by
+        projections.RaceSummaries; don't write to it directly.
+    """
+
+    __tablename__ = 'race_summaries'
+    __table_args__ = (
+        db.Index('ix_race_summaries_series_season_date', 'series', 'season', 'date'),
+        db.Index('ix_race_summaries_race_track_id_date', 'race_track_id', 'date'),
+    )
+
+    race_id = db.Column(db.String(50), primary_key=True)
+    series = db.Column(db.String(5), nullable=False)
+    season = db.Column(db.Integer, nullable=False)
+    round = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    date = db.Column(db.DateTime, nullable=False)
+    laps = db.Column(db.Integer, nullable=False)
+    length = db.Column(db.Numeric(5, 3), nullable=False)
+    distance = db.Column(db.Numeric(5, 1), nullable=False)
+    race_track_id = db.Column(db.Integer, nullable=False)
+    site = db.Column(db.String(50), nullable=False)
+    circuit_name = db.Column(db.String(100), nullable=False)
+    city = db.Column(db.String(50), nullable=False)
+    state = db.Column(db.String(2), nullable=True)
+    country = db.Column(db.String(50), nullable=False)
+    race_types = db.Column(ARRAY(db.String(5)), nullable=False)
+    race_time = db.Column(db.Time, nullable=True)
+    caution_flags = db.Column(db.Integer, nullable=True)
+    caution_flag_laps = db.Column(db.Integer, nullable=True)
+    lead_changes = db.Column(db.Integer, nullable=True)
+    pole_speed = db.Column(db.Numeric(6, 3), nullable=True)
+    avg_speed = db.Column(db.Numeric(6, 3), nullable=True)
+    victory_margin = db.Column(db.Numeric(6, 3), nullable=True)
+    winner_id = db.Column(db.Integer, nullable=True)
+    winner_name = db.Column(db.String(100), nullable=True)
+    winner_team_id = db.Column(db.String(50), nullable=True)
+    winner_vehicle_number = db.Column(db.Integer, nullable=True)
+    pole_id = db.Column(db.Integer, nullable=True)
+    pole_name = db.Column(db.String(100), nullable=True)
+    pole_lap_time = db.Column(db.Numeric(6, 3), nullable=True)
+
+
+class PersonRole(db.Model):
+    """ Every (person, type, series, season) appearing in race entries
+        and race, qualifying or practice results. Maintained by
+        projections.PersonRoles; don't write to it directly.
+    """
+
+    __tablename__ = 'person_roles'
+
+    type = db.Column(PersonType, primary_key=True)
+    series = db.Column(db.String(5), primary_key=True)
+    season = db.Column(db.Integer, primary_key=True)
+    person_id = db.Column(db.Integer, primary_key=True)
+
+
+class TeamSeason(db.Model):
+    """ One row per team, series and season the team raced or was ranked
+        in, rolling up its results, vehicles, drivers, vehicle owners and
+        championship standing. Maintained by projections.TeamSeasons;
+        don't write to it directly.
+    """
+
+    __tablename__ = 'team_seasons'
+
+    team_id = db.Column(db.String(50), primary_key=True)
+    series = db.Column(db.String(5), primary_key=True)
+    season = db.Column(db.Integer, primary_key=True)
+    races = db.Column(db.Integer, nullable=False)
+    starts = db.Column(db.Integer, nullable=False)
+    wins = db.Column(db.Integer, nullable=False)
+    top5 = db.Column(db.Integer, nullable=False)
+    top10 = db.Column(db.Integer, nullable=False)
+    laps_led = db.Column(db.Integer, nullable=False)
+    best_finish = db.Column(db.Integer, nullable=True)
+    vehicle_numbers = db.Column(ARRAY(db.Integer), nullable=False)
+    driver_ids = db.Column(ARRAY(db.Integer), nullable=False)
+    driver_names = db.Column(ARRAY(db.String(100)), nullable=False)
+    owner_ids = db.Column(ARRAY(db.Integer), nullable=False)
+    owner_names = db.Column(ARRAY(db.String(100)), nullable=False)
+    standing_position = db.Column(db.Integer, nullable=True)
+    standing_points = db.Column(db.Integer, nullable=True)
+
+
+class TrackRecord(db.Model):
+    """ One row per track that held a race, with the number of races and
+        seasons held there, the fastest qualifying lap, the fastest
+        average race speed and the driver with the most wins. Maintained
+        by projections.TrackRecords; don't write to it directly.
+    """
+
+    __tablename__ = 'track_records'
+
+    race_track_id = db.Column(db.Integer, primary_key=True)
+    races = db.Column(db.Integer, nullable=False)
+    first_season = db.Column(db.Integer, nullable=False)
+    last_season = db.Column(db.Integer, nullable=False)
+    lap_record = db.Column(db.Numeric(6, 3), nullable=True)
+    lap_record_race_id = db.Column(db.String(50), nullable=True)
+    lap_record_person_id = db.Column(db.Integer, nullable=True)
+    lap_record_person_name = db.Column(db.String(100), nullable=True)
+    avg_speed_record = db.Column(db.Numeric(6, 3), nullable=True)
+    avg_speed_race_id = db.Column(db.String(50), nullable=True)
+    most_wins = db.Column(db.Integer, nullable=True)
+    most_wins_person_id = db.Column(db.Integer, nullable=True)
+    most_wins_person_name = db.Column(db.String(100), nullable=True)
+
+
+class ChangeLog(db.Model):
+    """ One row per insert, update or delete of a model instance, in the
+        order they were flushed. Written by changes.record_changes;
+        don't write to it directly.
+    """
+
+    __tablename__ = 'change_log'
+    __table_args__ = (
+        db.Index('ix_change_log_transaction_id_id', 'transaction_id', 'id'),
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    transaction_id = db.Column(db.BigInteger, nullable=False,
+                               server_default=db.text('txid_current()'))
+    changed_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    entity = db.Column(db.String(50), nullable=False)
+    key = db.Column(ARRAY(db.String(100)), nullable=False)
+    operation = db.Column(db.Enum('insert', 'update', 'delete', name='change_operations'),
+                          nullable=False)
+
+
+class RenderedDocument(db.Model):
+    """ The rendered JSON of a race or season endpoint, stored by
+        documents.DocumentStore the first time it is requested and
+        deleted by projections.RenderedDocuments when the rows it was
+        rendered from change.
+    """
+
+    __tablename__ = 'rendered_documents'
+    __table_args__ = (
+        db.Index('ix_rendered_documents_series_season_round', 'series', 'season', 'round'),
+    )
+
+    path = db.Column(db.String(200), primary_key=True)
+    series = db.Column(db.String(5), nullable=False)
+    season = db.Column(db.Integer, nullable=False)
+    # None for documents covering a whole season.
+    round = db.Column(db.Integer, nullable=True)
+    document = db.Column(JSONB, nullable=False)
+    rendered_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+
+class Job(db.Model):
+    """ A queued call of a function registered in jobs.job_handlers,
+        run by `manage.py worker`. Only one pending job per name and
+        arguments is kept; enqueueing it again returns the pending one.
+    """
+
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_name_arguments_pending', 'name', 'arguments', unique=True,
+                 postgresql_where=db.text("state = 'pending'")),
+        db.Index('ix_jobs_state_run_after', 'state', 'run_after'),
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    name = db.Column(db.String(50), nullable=False)
+    arguments = db.Column(ARRAY(db.String(100)), nullable=False)
+    state = db.Column(db.Enum('pending', 'running', 'done', 'failed', name='job_states'),
+                      nullable=False, server_default='pending')
+    attempts = db.Column(db.Integer, nullable=False, server_default='0')
+    max_attempts = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    # Not run before then; retries are pushed back further every time.
+    run_after = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    worker = db.Column(db.String(100), nullable=True)
+    error = db.Column(db.Text, nullable=True)
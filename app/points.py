@@ -0,0 +1,178 @@
+from collections import OrderedDict
+from sqlalchemy import select, func, and_, case, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.sql.expression import Grouping
+from models import db, Person, Race, RaceResult, RaceResultPerson, DriverStanding
+
+
+# Name -> PointsSystem, in the order they were registered.
+points_systems = OrderedDict()
+
+NASCAR_SERIES = ('w', 'b', 'c')
+
+
+class PointsSystem(object):
+    """ Rules awarding championship points for a race result: points by
+        finishing position, and bonuses for winning, leading a lap and
+        leading the most laps.
+
+        `series` and `seasons` (first and last, None for the current
+        one) tell where the system was in force; results of any season
+        can be rescored with any system.
+    """
+
+    def __init__(self, name, description, positions, win=0, led=0, most_led=0,
+                 series=(), seasons=(None, None)):
+        self.name = name
+        self.description = description
+        self.positions = list(positions)
+        self.win = win
+        self.led = led
+        self.most_led = most_led
+        self.series = series
+        self.seasons = seasons
+
+    def in_force(self, series, season):
+        first, last = self.seasons
+        return series in self.series and \
+            (first is None or first <= season) and (last is None or season <= last)
+
+
+def register_points_system(system):
+    points_systems[system.name] = system
+    return system
+
+
+def points_system_in_force(series, season):
+    """ The registered system in force in a series and season, or None.
+    """
+    for system in points_systems.values():
+        if system.in_force(series, int(season)):
+            return system
+    return None
+
+
+def latford():
+    # 175 for a win, then 5 fewer down to 6th, 4 fewer down to 11th and
+    # 3 fewer for every other position, down to 34 for 43rd.
+    positions = [175 - 5 * i for i in range(6)]
+    positions += [positions[-1] - 4 * i for i in range(1, 6)]
+    positions += [positions[-1] - 3 * i for i in range(1, 33)]
+    return positions
+
+register_points_system(PointsSystem(
+    'latford', 'NASCAR 1975-2003', latford(), led=5, most_led=5,
+    series=NASCAR_SERIES, seasons=(1975, 2003)))
+register_points_system(PointsSystem(
+    'latford-2004', 'NASCAR 2004-2006, 5 more points for a win', latford(), win=5, led=5,
+    most_led=5, series=NASCAR_SERIES, seasons=(2004, 2006)))
+register_points_system(PointsSystem(
+    'latford-2007', 'NASCAR 2007-2010, 10 more points for a win', latford(), win=10, led=5,
+    most_led=5, series=NASCAR_SERIES, seasons=(2007, 2010)))
+register_points_system(PointsSystem(
+    'nascar-2011', 'NASCAR since 2011, 43 for a win down to 1', range(43, 0, -1), win=3, led=1,
+    most_led=1, series=NASCAR_SERIES, seasons=(2011, None)))
+register_points_system(PointsSystem(
+    'f1-2010', 'Formula One since 2010, top ten score', (25, 18, 15, 12, 10, 8, 6, 4, 2, 1),
+    series=('f',), seasons=(2010, None)))
+
+
+def rescored_standings_select(system, series, season):
+    """ Select producing the driver standings of a season with every race
+        result rescored under `system`, best first.
+
+        The points by position are bound as one array indexed by the
+        finishing position of every result, so the whole season is
+        rescored and summed in a single statement.
+    """
+    races = Race.__table__
+    results = RaceResult.__table__
+    people = RaceResultPerson.__table__
+
+    # Parenthesized, as Postgres can't subscript ARRAY[...] directly.
+    table = Grouping(bindparam('positions', system.positions, type_=ARRAY(db.Integer)))
+    scored = select([people.c.person_id.label('driver_id'), results.c.position,
+                     results.c.status, results.c.laps_led,
+                     func.max(results.c.laps_led).over(partition_by=results.c.race_id).
+                     label('most_led'),
+                     func.coalesce(table[results.c.position], 0).label('points')],
+                    from_obj=results.join(races, races.c.id == results.c.race_id).
+                    join(people, and_(people.c.race_result_id == results.c.id,
+                                      people.c.type == 'driver'))).\
+        where(and_(races.c.series == series, races.c.season == season)).\
+        alias('scored')
+
+    bonus = case([(scored.c.position == 1, system.win)], else_=0) + \
+        case([(scored.c.laps_led > 0, system.led)], else_=0) + \
+        case([(and_(scored.c.laps_led > 0, scored.c.laps_led == scored.c.most_led),
+               system.most_led)], else_=0)
+    points = func.sum(scored.c.points + bonus)
+    wins = func.count(case([(scored.c.position == 1, 1)]))
+
+    persons = Person.__table__
+    return select([persons.c.id, persons.c.name, persons.c.country,
+                   func.rank().over(order_by=[points.desc(), wins.desc()]).label('position'),
+                   points.label('points'),
+                   wins.label('wins'),
+                   func.count().label('starts'),
+                   func.count(case([(scored.c.status != 'Running', 1)])).label('dnfs'),
+                   func.count(case([(scored.c.position <= 5, 1)])).label('top5'),
+                   func.count(case([(scored.c.position <= 10, 1)])).label('top10'),
+                   func.sum(scored.c.laps_led).label('laps_led')],
+                  from_obj=scored.join(persons, persons.c.id == scored.c.driver_id)).\
+        group_by(persons.c.id, persons.c.name, persons.c.country).\
+        order_by('position', persons.c.id)
+
+
+def rescored_standings(system, series, season):
+    return db.session.execute(rescored_standings_select(system, series, season)).fetchall()
+
+
+def latest_vehicles(series, season, driver_ids):
+    """ Driver id -> id of the vehicle of their latest result in a season.
+    """
+    races = Race.__table__
+    results = RaceResult.__table__
+    people = RaceResultPerson.__table__
+    query = select([people.c.person_id, results.c.vehicle_id],
+                   from_obj=results.join(races, races.c.id == results.c.race_id).
+                   join(people, and_(people.c.race_result_id == results.c.id,
+                                     people.c.type == 'driver'))).\
+        where(and_(races.c.series == series, races.c.season == season)).\
+        where(people.c.person_id.in_(driver_ids)).\
+        distinct(people.c.person_id).\
+        order_by(people.c.person_id, races.c.date.desc())
+    return dict((row.person_id, row.vehicle_id) for row in db.session.execute(query))
+
+
+def recompute_standings(series, season):
+    """ Rewrites the driver standings of a season from its race results,
+        scored under the points system in force. Drivers without a
+        standing get one, with the vehicle of their latest result.
+        Returns the number of standings written.
+    """
+    system = points_system_in_force(series, season)
+    if system is None:
+        raise ValueError('no points system known for {0} {1}'.format(series, season))
+
+    standings = DriverStanding.query.filter_by(series=series, season=season)
+    current = dict((standing.driver_id, standing) for standing in standings)
+    rows = rescored_standings(system, series, season)
+
+    missing = [row.id for row in rows if row.id not in current]
+    vehicles = latest_vehicles(series, season, missing) if missing else {}
+
+    for row in rows:
+        standing = current.get(row.id)
+        if standing is None:
+            standing = DriverStanding(driver_id=row.id, vehicle_id=vehicles[row.id],
+                                      series=series, season=season, poles=0)
+            db.session.add(standing)
+        standing.position = row.position
+        standing.points = row.points
+        standing.wins = row.wins
+        standing.starts = row.starts
+        standing.dnfs = row.dnfs
+        standing.top5 = row.top5
+        standing.top10 = row.top10
+    return len(rows)
@@ -0,0 +1,96 @@
+from sqlalchemy import select, func, and_
+from sqlalchemy.sql.expression import true
+from models import db, Person, Race, RaceResult, RaceResultPerson
+from cache import LRUCache
+from tracking import after_commit
+
+
+# Seasons whose progression is kept in memory, most recently used first.
+MAX_SEASONS = 50
+
+# Seconds a progression is kept. Commits in this process forget them at
+# once; this bounds how long changes committed by other processes, such
+# as ingest commands and job workers, take to show.
+PROGRESSION_TIMEOUT = 60
+
+_progressions = LRUCache(max_entries=MAX_SEASONS)
+
+
+def progression_select(series, season):
+    """ Select producing, for every driver of a season and every round,
+        the points scored in the round, the total after it and the
+        championship position after it. Drivers missing a round keep
+        their total and still get a position.
+    """
+    races = Race.__table__
+    results = RaceResult.__table__
+    people = RaceResultPerson.__table__
+
+    in_season = and_(races.c.series == series, races.c.season == season)
+
+    rounds = select([races.c.round]).where(in_season).distinct().alias('rounds')
+
+    scored = select([people.c.person_id.label('driver_id'), races.c.round,
+                     func.sum(func.coalesce(results.c.points, 0)).label('points')],
+                    from_obj=results.join(races, races.c.id == results.c.race_id).
+                    join(people, and_(people.c.race_result_id == results.c.id,
+                                      people.c.type == 'driver'))).\
+        where(in_season).\
+        group_by(people.c.person_id, races.c.round).\
+        cte('scored')
+
+    drivers = select([scored.c.driver_id]).distinct().alias('drivers')
+
+    points = func.coalesce(scored.c.points, 0)
+    totals = select([drivers.c.driver_id, rounds.c.round, points.label('points'),
+                     func.sum(points).over(partition_by=drivers.c.driver_id,
+                                           order_by=rounds.c.round).label('total')],
+                    from_obj=drivers.join(rounds, true()).
+                    outerjoin(scored, and_(scored.c.driver_id == drivers.c.driver_id,
+                                           scored.c.round == rounds.c.round))).\
+        alias('totals')
+
+    position = func.rank().over(partition_by=totals.c.round, order_by=totals.c.total.desc())
+    persons = Person.__table__
+    return select([totals.c.driver_id, persons.c.name, persons.c.country, totals.c.round,
+                   totals.c.points, totals.c.total, position.label('position')],
+                  from_obj=totals.join(persons, persons.c.id == totals.c.driver_id)).\
+        order_by(totals.c.round, 'position', totals.c.driver_id)
+
+
+def season_progression(series, season):
+    """ Returns the rounds of a season and, for every driver, ordered by
+        their position after the last round, their points, total and
+        position after every round.
+    """
+    key = (series, season)
+    progression = _progressions.get(key)
+    if progression is None:
+        progression = compute_progression(series, season)
+        _progressions.set(key, progression, PROGRESSION_TIMEOUT)
+    return progression
+
+
+def compute_progression(series, season):
+    rounds = []
+    drivers = {}
+    for row in db.session.execute(progression_select(series, season)):
+        if not rounds or rounds[-1] != row.round:
+            rounds.append(row.round)
+        driver = drivers.get(row.driver_id)
+        if driver is None:
+            driver = drivers[row.driver_id] = {
+                'driver': {'id': row.driver_id, 'name': row.name, 'country': row.country},
+                'rounds': []
+            }
+        driver['rounds'].append({'round': row.round, 'points': row.points,
+                                 'total': row.total, 'position': row.position})
+
+    final = lambda driver: (driver['rounds'][-1]['position'], driver['driver']['id'])
+    return {'rounds': rounds, 'drivers': sorted(drivers.values(), key=final)}
+
+
+def forget_progressions(session=None, tables=None):
+    _progressions.clear()
+
+after_commit(('races', 'race_results', 'race_results_people', 'people'), forget_progressions)
@@ -0,0 +1,720 @@
+from sqlalchemy import select, func, and_, or_, case, literal_column, tuple_, union
+from models import db, Person, Team, Vehicle, Race, RaceTrack, RacesTypes, RaceStanding, \
+    RaceResult, RaceResultPerson, QualifyingResult, QualifyingResultPerson, \
+    RaceEntry, RaceEntryPerson, RaceEntryType, PracticeResult, PracticeResultPerson, \
+    DriverStanding, TeamStanding, OwnerStanding, RaceSummary, PersonRole, TeamSeason, \
+    TrackRecord, RenderedDocument
+from sql import in_array
+from tracking import Projection, register_projection, registered_projections, \
+    attribute_values, load_previous_values, mark_changed
+
+
+def keyed(kind, name='id'):
+    """ Source returning a (kind, value) key for each current and previous
+        value of an attribute of a changed instance.
+    """
+    def source(obj):
+        return set((kind, value) for value in attribute_values(obj, name))
+    return source
+
+
+def group_keys(keys):
+    """ Turns (kind, value) keys into a dict of kind -> list of values.
+    """
+    groups = {}
+    for kind, value in keys:
+        groups.setdefault(kind, []).append(value)
+    return groups
+
+
+class RaceSummaries(Projection):
+    """ Maintains race_summaries, one row per race with its track, race
+        types, standing, winner and pole sitter.
+    """
+
+    sources = {
+        Race: keyed('race'),
+        RaceTrack: keyed('track'),
+        RacesTypes: keyed('race', 'race_id'),
+        RaceStanding: keyed('race', 'race_id'),
+        RaceResult: keyed('race', 'race_id'),
+        RaceResultPerson: keyed('race_result', 'race_result_id'),
+        QualifyingResult: keyed('race', 'race_id'),
+        QualifyingResultPerson: keyed('qualifying_result', 'qualifying_result_id'),
+        Person: keyed('person'),
+        Vehicle: keyed('vehicle')
+    }
+
+    def affected_races(self, session, keys):
+        """ Ids of the races whose summary depends on any of the keys.
+        """
+        groups = group_keys(keys)
+        races = Race.__table__
+        results = RaceResult.__table__
+        qualifying = QualifyingResult.__table__
+        summaries = RaceSummary.__table__
+
+        race_ids = set(groups.get('race', ()))
+        conditions = []
+
+        if 'track' in groups:
+            conditions.append(in_array(races.c.race_track_id, groups['track']))
+        if 'race_result' in groups:
+            conditions.append(races.c.id.in_(
+                select([results.c.race_id]).
+                where(in_array(results.c.id, groups['race_result']))))
+        if 'qualifying_result' in groups:
+            conditions.append(races.c.id.in_(
+                select([qualifying.c.race_id]).
+                where(in_array(qualifying.c.id, groups['qualifying_result']))))
+        if 'vehicle' in groups:
+            conditions.append(races.c.id.in_(
+                select([results.c.race_id]).
+                where(in_array(results.c.vehicle_id, groups['vehicle'])).
+                where(results.c.position == 1)))
+        if 'person' in groups:
+            conditions.append(races.c.id.in_(
+                select([summaries.c.race_id]).
+                where(or_(in_array(summaries.c.winner_id, groups['person']),
+                          in_array(summaries.c.pole_id, groups['person'])))))
+
+        if conditions:
+            query = select([races.c.id]).where(or_(*conditions))
+            race_ids.update(row.id for row in session.execute(query))
+        return race_ids
+
+    def summary_select(self, race_ids=None):
+        """ Select producing the race_summaries rows of the given races,
+            or of every race.
+        """
+        races = Race.__table__
+        tracks = RaceTrack.__table__
+        races_types = RacesTypes.__table__
+        standings = RaceStanding.__table__
+        results = RaceResult.__table__
+        result_people = RaceResultPerson.__table__
+        qualifying = QualifyingResult.__table__
+        qualifying_people = QualifyingResultPerson.__table__
+        people = Person.__table__
+        vehicles = Vehicle.__table__
+
+        types = select([races_types.c.race_id,
+                        func.array_agg(races_types.c.race_type).label('race_types')]).\
+            group_by(races_types.c.race_id)
+
+        standing = select([standings]).\
+            distinct(standings.c.race_id).\
+            order_by(standings.c.race_id, standings.c.id)
+
+        winner = select([results.c.race_id, results.c.team_id, vehicles.c.number,
+                         people.c.id.label('person_id'), people.c.name],
+                        from_obj=results.join(vehicles, vehicles.c.id == results.c.vehicle_id).
+                        outerjoin(result_people,
+                                  and_(result_people.c.race_result_id == results.c.id,
+                                       result_people.c.type == 'driver')).
+                        outerjoin(people, people.c.id == result_people.c.person_id)).\
+            where(results.c.position == 1).\
+            distinct(results.c.race_id).\
+            order_by(results.c.race_id, result_people.c.id)
+
+        # The pole sitter tops the last qualifying session.
+        pole = select([qualifying.c.race_id, qualifying.c.lap_time,
+                       people.c.id.label('person_id'), people.c.name],
+                      from_obj=qualifying.outerjoin(
+                          qualifying_people,
+                          and_(qualifying_people.c.qualifying_result_id == qualifying.c.id,
+                               qualifying_people.c.type == 'driver')).
+                      outerjoin(people, people.c.id == qualifying_people.c.person_id)).\
+            where(qualifying.c.position == 1).\
+            distinct(qualifying.c.race_id).\
+            order_by(qualifying.c.race_id, qualifying.c.session.desc(), qualifying_people.c.id)
+
+        query = races.join(tracks, tracks.c.id == races.c.race_track_id)
+
+        if race_ids is not None:
+            types = types.where(in_array(races_types.c.race_id, race_ids))
+            standing = standing.where(in_array(standings.c.race_id, race_ids))
+            winner = winner.where(in_array(results.c.race_id, race_ids))
+            pole = pole.where(in_array(qualifying.c.race_id, race_ids))
+
+        types = types.alias('types')
+        standing = standing.alias('standing')
+        winner = winner.alias('winner')
+        pole = pole.alias('pole')
+
+        query = query.\
+            outerjoin(types, types.c.race_id == races.c.id).\
+            outerjoin(standing, standing.c.race_id == races.c.id).\
+            outerjoin(winner, winner.c.race_id == races.c.id).\
+            outerjoin(pole, pole.c.race_id == races.c.id)
+
+        query = select([races.c.id, races.c.series, races.c.season, races.c.round,
+                        races.c.name, races.c.date, races.c.laps, races.c.length,
+                        races.c.distance, tracks.c.id, tracks.c.site,
+                        tracks.c.circuit_name, tracks.c.city, tracks.c.state,
+                        tracks.c.country,
+                        func.coalesce(types.c.race_types, literal_column("'{}'::varchar[]")),
+                        standing.c.race_time, standing.c.caution_flags,
+                        standing.c.caution_flag_laps, standing.c.lead_changes,
+                        standing.c.pole_speed, standing.c.avg_speed,
+                        standing.c.victory_margin,
+                        winner.c.person_id, winner.c.name, winner.c.team_id,
+                        winner.c.number,
+                        pole.c.person_id, pole.c.name, pole.c.lap_time],
+                       from_obj=query)
+
+        if race_ids is not None:
+            query = query.where(in_array(races.c.id, race_ids))
+        return query
+
+    def write(self, session, race_ids=None):
+        summaries = RaceSummary.__table__
+        names = [c.name for c in summaries.columns]
+
+        delete = summaries.delete()
+        if race_ids is not None:
+            delete = delete.where(in_array(summaries.c.race_id, race_ids))
+        session.execute(delete)
+        # inline keeps SQLAlchemy from adding RETURNING for the primary
+        # key, which it can't read back when the select is empty.
+        session.execute(summaries.insert(inline=True).from_select(names, self.summary_select(race_ids)))
+
+    def refresh(self, session, keys):
+        race_ids = self.affected_races(session, keys)
+        if race_ids:
+            self.write(session, list(race_ids))
+
+    def rebuild(self, session):
+        self.write(session)
+
+
+load_previous_values(Race.series, Race.season)
+
+
+def race_seasons(obj):
+    """ (series, season) keys for the current and previous series and
+        season of a changed race.
+    """
+    return set(('season', (series, season))
+               for series in attribute_values(obj, 'series')
+               for season in attribute_values(obj, 'season'))
+
+
+class PersonRoles(Projection):
+    """ Maintains person_roles, the distinct (type, series, season,
+        person) combinations of the people linked to entries and results.
+        A change rewrites the roles of the affected series and seasons.
+    """
+
+    # (link model, parent model, link column referencing the parent)
+    links = (
+        (RaceResultPerson, RaceResult, 'race_result_id'),
+        (RaceEntryPerson, RaceEntry, 'race_entry_id'),
+        (QualifyingResultPerson, QualifyingResult, 'qualifying_result_id'),
+        (PracticeResultPerson, PracticeResult, 'practice_result_id')
+    )
+
+    sources = {
+        Race: race_seasons,
+        RaceResult: keyed('race', 'race_id'),
+        RaceEntry: keyed('race', 'race_id'),
+        QualifyingResult: keyed('race', 'race_id'),
+        PracticeResult: keyed('race', 'race_id')
+    }
+    for link, parent, column in links:
+        sources[link] = keyed(parent.__table__.name, column)
+
+    def affected_seasons(self, session, keys):
+        """ (series, season) pairs whose roles depend on any of the keys.
+        """
+        groups = group_keys(keys)
+        races = Race.__table__
+
+        seasons = set(groups.get('season', ()))
+        conditions = []
+
+        if 'race' in groups:
+            conditions.append(in_array(races.c.id, groups['race']))
+        for link, parent, column in self.links:
+            table = parent.__table__
+            if table.name in groups:
+                conditions.append(races.c.id.in_(
+                    select([table.c.race_id]).
+                    where(in_array(table.c.id, groups[table.name]))))
+
+        if conditions:
+            query = select([races.c.series, races.c.season]).distinct().where(or_(*conditions))
+            seasons.update((row.series, row.season) for row in session.execute(query))
+        return seasons
+
+    def roles_select(self, seasons=None):
+        """ Select producing the person_roles rows of the given series
+            and seasons, or of every season.
+        """
+        races = Race.__table__
+        selects = []
+        for link, parent, column in self.links:
+            people = link.__table__
+            table = parent.__table__
+            query = select([people.c.type, races.c.series, races.c.season, people.c.person_id],
+                           from_obj=people.join(table, table.c.id == people.c[column]).
+                           join(races, races.c.id == table.c.race_id))
+            if seasons is not None:
+                query = query.where(tuple_(races.c.series, races.c.season).in_(seasons))
+            selects.append(query)
+        # UNION, not UNION ALL, so every role is stored once.
+        return union(*selects)
+
+    def write(self, session, seasons=None):
+        roles = PersonRole.__table__
+
+        delete = roles.delete()
+        if seasons is not None:
+            delete = delete.where(tuple_(roles.c.series, roles.c.season).in_(seasons))
+        session.execute(delete)
+        session.execute(roles.insert(inline=True).from_select(
+            ['type', 'series', 'season', 'person_id'], self.roles_select(seasons)))
+
+    def refresh(self, session, keys):
+        seasons = self.affected_seasons(session, keys)
+        if seasons:
+            self.write(session, list(seasons))
+
+    def rebuild(self, session):
+        self.write(session)
+
+
+load_previous_values(RaceResult.team_id, TeamStanding.team_id)
+
+
+def count_where(condition):
+    return func.coalesce(func.sum(case([(condition, 1)], else_=0)), 0)
+
+
+class TeamSeasons(Projection):
+    """ Maintains team_seasons, one row per team, series and season with
+        the results, vehicles, drivers, vehicle owners and championship
+        standing of the team. A change rewrites every season of the
+        affected teams.
+    """
+
+    sources = {
+        Race: keyed('race'),
+        RaceResult: keyed('team', 'team_id'),
+        RaceResultPerson: keyed('race_result', 'race_result_id'),
+        TeamStanding: keyed('team', 'team_id'),
+        Person: keyed('person'),
+        Vehicle: keyed('vehicle')
+    }
+
+    def affected_teams(self, session, keys):
+        """ Ids of the teams whose seasons depend on any of the keys.
+        """
+        groups = group_keys(keys)
+        results = RaceResult.__table__
+        team_seasons = TeamSeason.__table__
+
+        team_ids = set(groups.get('team', ()))
+        conditions = []
+
+        if 'race' in groups:
+            conditions.append(in_array(results.c.race_id, groups['race']))
+        if 'race_result' in groups:
+            conditions.append(in_array(results.c.id, groups['race_result']))
+        if 'vehicle' in groups:
+            conditions.append(in_array(results.c.vehicle_id, groups['vehicle']))
+
+        if conditions:
+            query = select([results.c.team_id]).distinct().where(or_(*conditions))
+            team_ids.update(row.team_id for row in session.execute(query))
+        if 'person' in groups:
+            query = select([team_seasons.c.team_id]).distinct().\
+                where(or_(team_seasons.c.driver_ids.overlap(groups['person']),
+                          team_seasons.c.owner_ids.overlap(groups['person'])))
+            team_ids.update(row.team_id for row in session.execute(query))
+        return team_ids
+
+    def people_arrays(self, people, name):
+        """ Aggregates (team_id, series, season, id, name) rows into
+            aligned arrays of ids and names, in the order of the rows.
+        """
+        ordered = people.alias()
+        return select([ordered.c.team_id, ordered.c.series, ordered.c.season,
+                       func.array_agg(ordered.c.id).label('ids'),
+                       func.array_agg(ordered.c.name).label('names')]).\
+            group_by(ordered.c.team_id, ordered.c.series, ordered.c.season).\
+            alias(name)
+
+    def seasons_select(self, team_ids=None):
+        """ Select producing the team_seasons rows of the given teams, or
+            of every team.
+        """
+        races = Race.__table__
+        results = RaceResult.__table__
+        result_people = RaceResultPerson.__table__
+        standings = TeamStanding.__table__
+        people = Person.__table__
+        vehicles = Vehicle.__table__
+
+        team_results = results.join(races, races.c.id == results.c.race_id)
+        fielded = team_results.join(vehicles, vehicles.c.id == results.c.vehicle_id)
+        keys = (results.c.team_id, races.c.series, races.c.season)
+
+        totals = select(list(keys) + [
+            func.count(results.c.race_id.distinct()).label('races'),
+            func.count().label('starts'),
+            count_where(results.c.position == 1).label('wins'),
+            count_where(results.c.position <= 5).label('top5'),
+            count_where(results.c.position <= 10).label('top10'),
+            func.sum(results.c.laps_led).label('laps_led'),
+            func.min(results.c.position).label('best_finish'),
+            func.array_agg(vehicles.c.number.distinct()).label('vehicle_numbers')],
+            from_obj=fielded).\
+            group_by(*keys)
+
+        drivers = select(list(keys) + [people.c.id, people.c.name],
+                         from_obj=team_results.
+                         join(result_people,
+                              and_(result_people.c.race_result_id == results.c.id,
+                                   result_people.c.type == 'driver')).
+                         join(people, people.c.id == result_people.c.person_id)).\
+            distinct().\
+            order_by(people.c.id)
+
+        owners = select(list(keys) + [people.c.id, people.c.name],
+                        from_obj=fielded.join(people, people.c.id == vehicles.c.owner_id)).\
+            distinct().\
+            order_by(people.c.id)
+
+        # A team has a standing per vehicle; the best one is the team's.
+        standing = select([standings.c.team_id, standings.c.series, standings.c.season,
+                           standings.c.position, standings.c.points]).\
+            distinct(standings.c.team_id, standings.c.series, standings.c.season).\
+            order_by(standings.c.team_id, standings.c.series, standings.c.season,
+                     standings.c.position)
+
+        raced = select(list(keys), from_obj=team_results)
+        ranked = select([standings.c.team_id, standings.c.series, standings.c.season])
+
+        if team_ids is not None:
+            totals = totals.where(in_array(results.c.team_id, team_ids))
+            drivers = drivers.where(in_array(results.c.team_id, team_ids))
+            owners = owners.where(in_array(results.c.team_id, team_ids))
+            standing = standing.where(in_array(standings.c.team_id, team_ids))
+            raced = raced.where(in_array(results.c.team_id, team_ids))
+            ranked = ranked.where(in_array(standings.c.team_id, team_ids))
+
+        seasons = union(raced, ranked).alias('seasons')
+        totals = totals.alias('totals')
+        drivers = self.people_arrays(drivers, 'drivers')
+        owners = self.people_arrays(owners, 'owners')
+        standing = standing.alias('standing')
+
+        query = seasons
+        for part in (totals, drivers, owners, standing):
+            query = query.outerjoin(part, and_(part.c.team_id == seasons.c.team_id,
+                                               part.c.series == seasons.c.series,
+                                               part.c.season == seasons.c.season))
+
+        empty_ids = literal_column("'{}'::integer[]")
+        empty_names = literal_column("'{}'::varchar[]")
+        return select([seasons.c.team_id, seasons.c.series, seasons.c.season,
+                       func.coalesce(totals.c.races, 0),
+                       func.coalesce(totals.c.starts, 0),
+                       func.coalesce(totals.c.wins, 0),
+                       func.coalesce(totals.c.top5, 0),
+                       func.coalesce(totals.c.top10, 0),
+                       func.coalesce(totals.c.laps_led, 0),
+                       totals.c.best_finish,
+                       func.coalesce(totals.c.vehicle_numbers, empty_ids),
+                       func.coalesce(drivers.c.ids, empty_ids),
+                       func.coalesce(drivers.c.names, empty_names),
+                       func.coalesce(owners.c.ids, empty_ids),
+                       func.coalesce(owners.c.names, empty_names),
+                       standing.c.position,
+                       standing.c.points],
+                      from_obj=query)
+
+    def write(self, session, team_ids=None):
+        team_seasons = TeamSeason.__table__
+        names = [c.name for c in team_seasons.columns]
+
+        delete = team_seasons.delete()
+        if team_ids is not None:
+            delete = delete.where(in_array(team_seasons.c.team_id, team_ids))
+        session.execute(delete)
+        session.execute(team_seasons.insert(inline=True).from_select(
+            names, self.seasons_select(team_ids)))
+
+    def refresh(self, session, keys):
+        team_ids = self.affected_teams(session, keys)
+        if team_ids:
+            self.write(session, list(team_ids))
+
+    def rebuild(self, session):
+        self.write(session)
+
+
+load_previous_values(Race.race_track_id)
+
+
+class TrackRecords(Projection):
+    """ Maintains track_records, one row per track with the races held
+        there, its qualifying lap and average speed records and the
+        driver with the most wins. A change rewrites the records of the
+        affected tracks.
+    """
+
+    sources = {
+        Race: keyed('track', 'race_track_id'),
+        RaceStanding: keyed('race', 'race_id'),
+        RaceResult: keyed('race', 'race_id'),
+        RaceResultPerson: keyed('race_result', 'race_result_id'),
+        QualifyingResult: keyed('race', 'race_id'),
+        QualifyingResultPerson: keyed('qualifying_result', 'qualifying_result_id'),
+        Person: keyed('person')
+    }
+
+    def affected_tracks(self, session, keys):
+        """ Ids of the tracks whose records depend on any of the keys.
+        """
+        groups = group_keys(keys)
+        races = Race.__table__
+        results = RaceResult.__table__
+        qualifying = QualifyingResult.__table__
+        records = TrackRecord.__table__
+
+        track_ids = set(groups.get('track', ()))
+        conditions = []
+
+        if 'race' in groups:
+            conditions.append(in_array(races.c.id, groups['race']))
+        if 'race_result' in groups:
+            conditions.append(races.c.id.in_(
+                select([results.c.race_id]).
+                where(in_array(results.c.id, groups['race_result']))))
+        if 'qualifying_result' in groups:
+            conditions.append(races.c.id.in_(
+                select([qualifying.c.race_id]).
+                where(in_array(qualifying.c.id, groups['qualifying_result']))))
+
+        if conditions:
+            query = select([races.c.race_track_id]).distinct().where(or_(*conditions))
+            track_ids.update(row.race_track_id for row in session.execute(query))
+        if 'person' in groups:
+            query = select([records.c.race_track_id]).\
+                where(or_(in_array(records.c.lap_record_person_id, groups['person']),
+                          in_array(records.c.most_wins_person_id, groups['person'])))
+            track_ids.update(row.race_track_id for row in session.execute(query))
+        return track_ids
+
+    def records_select(self, track_ids=None):
+        """ Select producing the track_records rows of the given tracks,
+            or of every track.
+        """
+        races = Race.__table__
+        standings = RaceStanding.__table__
+        results = RaceResult.__table__
+        result_people = RaceResultPerson.__table__
+        qualifying = QualifyingResult.__table__
+        qualifying_people = QualifyingResultPerson.__table__
+        people = Person.__table__
+
+        held = select([races.c.race_track_id,
+                       func.count().label('races'),
+                       func.min(races.c.season).label('first_season'),
+                       func.max(races.c.season).label('last_season')]).\
+            group_by(races.c.race_track_id)
+
+        # Ties go to whoever set the record first.
+        lap = select([races.c.race_track_id, qualifying.c.lap_time, qualifying.c.race_id,
+                      people.c.id.label('person_id'), people.c.name],
+                     from_obj=qualifying.join(races, races.c.id == qualifying.c.race_id).
+                     outerjoin(qualifying_people,
+                               and_(qualifying_people.c.qualifying_result_id == qualifying.c.id,
+                                    qualifying_people.c.type == 'driver')).
+                     outerjoin(people, people.c.id == qualifying_people.c.person_id)).\
+            distinct(races.c.race_track_id).\
+            order_by(races.c.race_track_id, qualifying.c.lap_time, races.c.date,
+                     qualifying_people.c.id)
+
+        speed = select([races.c.race_track_id, standings.c.avg_speed, standings.c.race_id],
+                       from_obj=standings.join(races, races.c.id == standings.c.race_id)).\
+            distinct(races.c.race_track_id).\
+            order_by(races.c.race_track_id, standings.c.avg_speed.desc(), races.c.date)
+
+        # The winner of a race is the first driver of the winning result.
+        winners = select([races.c.race_track_id, people.c.id.label('person_id'), people.c.name],
+                         from_obj=results.join(races, races.c.id == results.c.race_id).
+                         join(result_people,
+                              and_(result_people.c.race_result_id == results.c.id,
+                                   result_people.c.type == 'driver')).
+                         join(people, people.c.id == result_people.c.person_id)).\
+            where(results.c.position == 1).\
+            distinct(results.c.race_id).\
+            order_by(results.c.race_id, result_people.c.id)
+
+        if track_ids is not None:
+            held = held.where(in_array(races.c.race_track_id, track_ids))
+            lap = lap.where(in_array(races.c.race_track_id, track_ids))
+            speed = speed.where(in_array(races.c.race_track_id, track_ids))
+            winners = winners.where(in_array(races.c.race_track_id, track_ids))
+
+        winners = winners.alias('winners')
+        wins = select([winners.c.race_track_id, winners.c.person_id, winners.c.name,
+                       func.count().label('wins')]).\
+            group_by(winners.c.race_track_id, winners.c.person_id, winners.c.name).\
+            alias('wins')
+        most_wins = select([wins]).\
+            distinct(wins.c.race_track_id).\
+            order_by(wins.c.race_track_id, wins.c.wins.desc(), wins.c.person_id)
+
+        held = held.alias('held')
+        lap = lap.alias('lap')
+        speed = speed.alias('speed')
+        most_wins = most_wins.alias('most_wins')
+
+        query = held.\
+            outerjoin(lap, lap.c.race_track_id == held.c.race_track_id).\
+            outerjoin(speed, speed.c.race_track_id == held.c.race_track_id).\
+            outerjoin(most_wins, most_wins.c.race_track_id == held.c.race_track_id)
+
+        return select([held.c.race_track_id, held.c.races, held.c.first_season,
+                       held.c.last_season,
+                       lap.c.lap_time, lap.c.race_id, lap.c.person_id, lap.c.name,
+                       speed.c.avg_speed, speed.c.race_id,
+                       most_wins.c.wins, most_wins.c.person_id, most_wins.c.name],
+                      from_obj=query)
+
+    def write(self, session, track_ids=None):
+        records = TrackRecord.__table__
+        names = [c.name for c in records.columns]
+
+        delete = records.delete()
+        if track_ids is not None:
+            delete = delete.where(in_array(records.c.race_track_id, track_ids))
+        session.execute(delete)
+        session.execute(records.insert(inline=True).from_select(
+            names, self.records_select(track_ids)))
+
+    def refresh(self, session, keys):
+        track_ids = self.affected_tracks(session, keys)
+        if track_ids:
+            self.write(session, list(track_ids))
+
+    def rebuild(self, session):
+        self.write(session)
+
+
+# Advisory lock serializing rendered documents with the changes that
+# delete them. Requests storing a document hold it shared from before
+# they read its rows, and transactions deleting documents take it
+# exclusively, so no document rendered from replaced rows is stored
+# after the change commits.
+DOCUMENTS_LOCK = 0x646f6373
+
+load_previous_values(DriverStanding.series, DriverStanding.season,
+                     TeamStanding.series, TeamStanding.season,
+                     OwnerStanding.series, OwnerStanding.season)
+
+
+def every_document(obj):
+    return set([('all', None)])
+
+
+class RenderedDocuments(Projection):
+    """ Deletes the rendered_documents rendered from changed rows, for
+        documents.DocumentStore to render again when next requested.
+        Results and entries of a race delete the documents of the race,
+        standings and races those of their season. People, teams,
+        vehicles and tracks appear in too many to tell, so changing one
+        deletes every document.
+    """
+
+    # (link model, parent model, link column referencing the parent)
+    links = PersonRoles.links
+
+    sources = {
+        Race: race_seasons,
+        DriverStanding: race_seasons,
+        TeamStanding: race_seasons,
+        OwnerStanding: race_seasons,
+        RaceResult: keyed('race', 'race_id'),
+        RaceEntry: keyed('race', 'race_id'),
+        QualifyingResult: keyed('race', 'race_id'),
+        PracticeResult: keyed('race', 'race_id'),
+        Person: every_document,
+        Team: every_document,
+        Vehicle: every_document,
+        RaceTrack: every_document,
+        RaceEntryType: every_document
+    }
+    for link, parent, column in links:
+        sources[link] = keyed(parent.__table__.name, column)
+
+    def affected_rounds(self, session, groups):
+        """ (series, season, round) of the races whose documents depend
+            on any of the keys.
+        """
+        races = Race.__table__
+        conditions = []
+
+        if 'race' in groups:
+            conditions.append(in_array(races.c.id, groups['race']))
+        for link, parent, column in self.links:
+            table = parent.__table__
+            if table.name in groups:
+                conditions.append(races.c.id.in_(
+                    select([table.c.race_id]).
+                    where(in_array(table.c.id, groups[table.name]))))
+
+        if not conditions:
+            return set()
+        query = select([races.c.series, races.c.season, races.c.round]).\
+            distinct().where(or_(*conditions))
+        return set((row.series, row.season, row.round) for row in session.execute(query))
+
+    def write(self, session, seasons=None, rounds=None):
+        documents = RenderedDocument.__table__
+        session.execute(select([func.pg_advisory_xact_lock(DOCUMENTS_LOCK)]))
+
+        delete = documents.delete()
+        if seasons is not None or rounds is not None:
+            conditions = []
+            if seasons:
+                conditions.append(tuple_(documents.c.series, documents.c.season).in_(seasons))
+            if rounds:
+                conditions.append(tuple_(documents.c.series, documents.c.season,
+                                         documents.c.round).in_(rounds))
+            delete = delete.where(or_(*conditions))
+        session.execute(delete)
+
+    def refresh(self, session, keys):
+        groups = group_keys(keys)
+        if 'all' in groups:
+            self.write(session)
+            return
+        seasons = set(groups.get('season', ()))
+        rounds = self.affected_rounds(session, groups)
+        if seasons or rounds:
+            self.write(session, list(seasons), list(rounds))
+
+    def rebuild(self, session):
+        self.write(session)
+
+
+race_summaries = register_projection(RaceSummaries())
+person_roles = register_projection(PersonRoles())
+team_seasons = register_projection(TeamSeasons())
+track_records = register_projection(TrackRecords())
+rendered_documents = register_projection(RenderedDocuments())
+
+
+def rebuild_projections(session):
+    """ Recomputes every projection from scratch. Their rows are
+        rewritten with bulk statements, so every table counts as changed
+        for the hooks run after the commit.
+    """
+    for projection in registered_projections:
+        projection.rebuild(session)
+    mark_changed(session, db.metadata.tables.keys())
@@ -0,0 +1,55 @@
+from sqlalchemy import String, func, or_, case
+from sqlalchemy.sql.expression import literal
+
+
+# Queries shorter than this only match name prefixes; trigram indexes
+# can't narrow down substring matches of one or two characters.
+MIN_SUBSTRING_LENGTH = 3
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_key(value):
+    return func.search_key(value, type_=String)
+
+
+def name_search(model, columns, q, limit=DEFAULT_LIMIT):
+    """ Returns rows of `model` where any of `columns` matches `q`,
+        ignoring case and accents.
+
+        Names starting with `q` rank first, then names with a word
+        starting with `q`, then other substring matches; ties are broken
+        by trigram similarity.
+    """
+    pattern = search_key(literal(escape_like(q)))
+    key = search_key(literal(q))
+
+    keys = [search_key(column) for column in columns]
+
+    if len(q) < MIN_SUBSTRING_LENGTH:
+        match = or_(*[k.like(pattern + '%') for k in keys])
+    else:
+        match = or_(*[k.like('%' + pattern + '%') for k in keys])
+
+    ranks = [case([(k.like(pattern + '%'), 0),
+                   (k.like('% ' + pattern + '%'), 1)],
+                  else_=2) for k in keys]
+    scores = [func.similarity(k, key) for k in keys]
+
+    if len(keys) > 1:
+        rank = func.least(*ranks)
+        score = func.greatest(*scores)
+    else:
+        rank = ranks[0]
+        score = scores[0]
+
+    return model.query.\
+        filter(match).\
+        order_by(rank, score.desc(), columns[0]).\
+        limit(limit).\
+        all()
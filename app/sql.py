@@ -0,0 +1,9 @@
+from sqlalchemy import bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, Any
+
+
+def in_array(column, values):
+    """ `column = ANY(:values)`, which binds the whole list as one array
+        parameter instead of one parameter per value like IN does.
+    """
+    return Any(column, bindparam(None, list(values), type_=ARRAY(column.type)))
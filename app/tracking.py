@@ -0,0 +1,124 @@
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+
+# (tables, callback) pairs. The callback is called with the session and
+# the set of changed table names once a commit touching any of the
+# tables succeeds.
+_commit_hooks = []
+
+registered_projections = []
+
+
+def after_commit(tables, callback):
+    """ Calls `callback(session, changed)` after every commit that
+        inserted, updated or deleted rows of any of `tables`.
+    """
+    _commit_hooks.append((frozenset(tables), callback))
+
+
+class Projection(object):
+    """ A table derived from other tables and refreshed in the same
+        transaction as the changes it depends on.
+
+        `sources` maps model classes to functions returning the keys
+        that an added, changed or deleted instance affects. Before the
+        transaction commits, `refresh` is called with all of them.
+    """
+
+    sources = {}
+
+    def refresh(self, session, keys):
+        raise NotImplementedError
+
+    def rebuild(self, session):
+        raise NotImplementedError
+
+
+def register_projection(projection):
+    registered_projections.append(projection)
+    return projection
+
+
+def attribute_values(obj, name):
+    """ The current and, for changed instances, previous values of an
+        attribute of a flushed instance.
+    """
+    history = inspect(obj).attrs[name].history
+    values = set()
+    for part in history:
+        values.update(part or ())
+    values.discard(None)
+    return values
+
+
+def load_previous_values(*attributes):
+    """ Makes changes to the given attributes load the value they
+        replace, so that `attribute_values` sees it even when the
+        instance was expired before being changed.
+    """
+    for attribute in attributes:
+        event.listen(attribute, 'set', lambda target, value, oldvalue, initiator: value,
+                     active_history=True, retval=True)
+
+
+def mark_changed(session, tables):
+    """ Counts `tables` as changed by the current transaction of
+        `session`, for changes made with bulk statements, which flushes
+        don't see.
+    """
+    changed_tables(session).update(tables)
+
+
+def changed_tables(session):
+    if not hasattr(session, '_changed_tables'):
+        session._changed_tables = set()
+    return session._changed_tables
+
+
+def projection_keys(session):
+    if not hasattr(session, '_projection_keys'):
+        session._projection_keys = {}
+    return session._projection_keys
+
+
+@event.listens_for(Session, 'after_flush')
+def record_flushed_changes(session, flush_context):
+    tables = changed_tables(session)
+    keys = projection_keys(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            tables.add(table.name)
+        for projection in registered_projections:
+            source = projection.sources.get(type(obj))
+            if source is not None:
+                keys.setdefault(projection, set()).update(source(obj))
+
+
+@event.listens_for(Session, 'before_commit')
+def refresh_projections(session):
+    # Flush first so the changes still pending are recorded too.
+    session.flush()
+    keys = projection_keys(session)
+    session._projection_keys = {}
+    for projection in registered_projections:
+        if keys.get(projection):
+            projection.refresh(session, keys[projection])
+
+
+@event.listens_for(Session, 'after_commit')
+def run_commit_hooks(session):
+    changed = changed_tables(session)
+    if not changed:
+        return
+    session._changed_tables = set()
+    for tables, callback in _commit_hooks:
+        if tables & changed:
+            callback(session, changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_flushed_changes(session):
+    session._changed_tables = set()
+    session._projection_keys = {}
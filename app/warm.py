@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+from sqlalchemy import select, func
+from models import db, Race
+
+
+DEFAULT_SEASONS = 2
+DEFAULT_WORKERS = 4
+
+# Advisory lock held while warming up. The workers of a deploy, on any
+# host, start together; one of them warms up and the others wait for it
+# rather than request the same pages again.
+WARM_LOCK = 0x7761726d
+
+# Pages requested for every warmed series and season, and for every
+# round of it.
+SEASON_PATHS = ('driverstandings', 'teamstandings', 'ownerstandings', 'races')
+ROUND_PATHS = ('raceresults/{round}', 'qualifyingresults/{round}')
+
+
+def warm_urls(seasons=DEFAULT_SEASONS, version='v1.0'):
+    """ Urls of the standings, races and results of the latest `seasons`
+        seasons of every series, latest seasons first.
+    """
+    rounds = {}
+    for series, season, round in db.session.query(Race.series, Race.season, Race.round).distinct():
+        rounds.setdefault(series, {}).setdefault(season, []).append(round)
+
+    latest = []
+    for series in sorted(rounds):
+        for season in sorted(rounds[series], reverse=True)[:seasons]:
+            latest.append((series, season))
+    latest.sort(key=lambda key: (-key[1], key[0]))
+
+    urls = []
+    for series, season in latest:
+        prefix = '/api/{0}/{1}/{2}/'.format(version, series, season)
+        urls.extend(prefix + path for path in SEASON_PATHS)
+        for round in sorted(rounds[series][season]):
+            urls.extend(prefix + path.format(round=round) for path in ROUND_PATHS)
+    return urls
+
+
+class Warmer(object):
+    """ Requests the pages of recent seasons through the application, so
+        that the first clients after a deploy don't pay for cold database
+        caches, connections and indexes.
+    """
+
+    def __init__(self, app, seasons=DEFAULT_SEASONS, workers=DEFAULT_WORKERS):
+        self.app = app
+        self.seasons = seasons
+        self.workers = workers
+        self.total = None
+        self.done = 0
+        self.failed = []
+        self.error = None
+        self.started_at = None
+        self.ready_at = None
+        self.thread = None
+        self.lock = threading.Lock()
+        app.extensions['warmer'] = self
+
+    @property
+    def ready(self):
+        return self.ready_at is not None
+
+    def fetch(self, url):
+        try:
+            return url, self.app.test_client().get(url).status_code
+        except Exception:
+            # Applications in debug mode raise instead of answering 500.
+            logging.exception('warming %s failed', url)
+            return url, None
+
+    def run(self, progress=None):
+        """ Requests every page in a pool of `workers` threads, calling
+            `progress(url, status)` after each, and returns the stats.
+            If another worker is warming up, waits for it to finish
+            instead. A warm-up that fails still ends, with its error in
+            the stats, so the application serves requests cold rather
+            than never becoming ready.
+        """
+        self.started_at = time.time()
+        try:
+            conn = db.get_engine(self.app).connect()
+            try:
+                if conn.execute(select([func.pg_try_advisory_lock(WARM_LOCK)])).scalar():
+                    try:
+                        self.warm(progress)
+                    finally:
+                        conn.execute(select([func.pg_advisory_unlock(WARM_LOCK)]))
+                else:
+                    logging.info('waiting for another worker to warm up')
+                    conn.execute(select([func.pg_advisory_lock(WARM_LOCK)]))
+                    conn.execute(select([func.pg_advisory_unlock(WARM_LOCK)]))
+                    self.total = 0
+            finally:
+                conn.close()
+        except Exception as e:
+            logging.exception('warming up failed')
+            self.error = str(e).strip()
+        finally:
+            self.ready_at = time.time()
+
+        logging.info('warmed %d pages in %.3fs, %d failed', self.done,
+                     self.ready_at - self.started_at, len(self.failed))
+        return self.stats()
+
+    def warm(self, progress=None):
+        with self.app.app_context():
+            urls = warm_urls(self.seasons)
+        self.total = len(urls)
+        logging.info('warming %d pages of the latest %d seasons', self.total, self.seasons)
+
+        pool = ThreadPool(self.workers)
+        try:
+            for url, status in pool.imap_unordered(self.fetch, urls):
+                with self.lock:
+                    self.done += 1
+                    if status != 200:
+                        self.failed.append(url)
+                if progress is not None:
+                    progress(url, status)
+        finally:
+            pool.close()
+            pool.join()
+
+    def start(self):
+        """ Runs the warm-up in a background thread.
+        """
+        self.thread = threading.Thread(target=self.run, name='warm')
+        self.thread.daemon = True
+        self.thread.start()
+        return self.thread
+
+    def stats(self):
+        finished = self.ready_at or time.time()
+        return {
+            'pages': self.total,
+            'done': self.done,
+            'failed': list(self.failed),
+            'ready': self.ready,
+            'error': self.error,
+            'seconds': round(finished - self.started_at, 3) if self.started_at else None
+        }
@@ -0,0 +1,165 @@
+from flask.ext.restful import Api
+from controllers import PersonList, DriverList, TeamList, TeamHistory, VehicleList, \
+    DriverStandingsList, DriverProgression, TeamStandingsList, RaceList, TrackList, \
+    RaceStandingList, RaceEntryList, RaceResultList, QualifyingResultList, PracticeResultList, \
+    PeopleList, OwnerStandingsList, ColumnarExport, Search, AutocompleteList, ChangeList, \
+    CoalescingStats, CacheStats
+from autocomplete import Autocomplete
+from cache import Cache
+from documents import DocumentStore
+from coalesce import SingleFlight
+from warm import Warmer, DEFAULT_WORKERS
+from application import create_app, get_config_from_env
+
+
+def register_api(app):
+    """ Adds the API routes and the components serving them to an
+        application created by `application.create_app`.
+    """
+
+    #in-memory prefix index for typeahead lookups
+    Autocomplete(app)
+
+    #response cache, in the backend named by CACHE_TYPE
+    Cache(app)
+
+    #coalesces concurrent identical requests
+    SingleFlight(app)
+
+    #rendered race and season documents, when DOCUMENT_STORE is set
+    DocumentStore(app)
+
+    #create restful API objet
+    api = Api(app)
+
+    #add api routes
+    api.add_resource(DriverList,
+                     '/api/<string:version>/drivers',
+                     '/api/<string:version>/<string:series>/drivers',
+                     '/api/<string:version>/<string:series>/<string:season>/drivers',
+                     endpoint='drivers')
+
+    api.add_resource(PersonList,
+                     '/api/<string:version>/people',
+                     endpoint='persons')
+
+    roles = 'any({0}):role'.format(','.join(sorted(PeopleList.roles)))
+    api.add_resource(PeopleList,
+                     '/api/<string:version>/<{0}>'.format(roles),
+                     '/api/<string:version>/<string:series>/<{0}>'.format(roles),
+                     '/api/<string:version>/<string:series>/<string:season>/<{0}>'.format(roles),
+                     endpoint='people')
+
+    api.add_resource(TeamList,
+                     '/api/<string:version>/teams',
+                     '/api/<string:version>/<string:series>/teams',
+                     '/api/<string:version>/<string:series>/<string:season>/teams',
+                     endpoint='teams')
+
+    api.add_resource(TeamHistory,
+                     '/api/<string:version>/teams/<string:team_id>/history',
+                     endpoint='teamhistory')
+
+    api.add_resource(VehicleList,
+                     '/api/<string:version>/vehicles',
+                     '/api/<string:version>/<string:series>/vehicles',
+                     '/api/<string:version>/<string:series>/<string:season>/vehicles',
+                     endpoint='vehicles')
+
+    api.add_resource(DriverStandingsList,
+                     '/api/<string:version>/<string:series>/<string:season>/driverstandings',
+                     endpoint='driverstandings')
+
+    api.add_resource(DriverProgression,
+                     '/api/<string:version>/<string:series>/<string:season>/driverstandings/progression',
+                     endpoint='driverprogression')
+
+    api.add_resource(TeamStandingsList,
+                     '/api/<string:version>/<string:series>/<string:season>/teamstandings',
+                     endpoint='teamstandings')
+
+    api.add_resource(OwnerStandingsList,
+                     '/api/<string:version>/<string:series>/<string:season>/ownerstandings',
+                     endpoint='ownerstandings')
+
+    api.add_resource(RaceList,
+                     '/api/<string:version>/races',
+                     '/api/<string:version>/<string:series>/<string:season>/races',
+                     endpoint='races')
+
+    api.add_resource(TrackList,
+                     '/api/<string:version>/tracks',
+                     '/api/<string:version>/tracks/<int:track_id>',
+                     endpoint='tracks')
+
+    api.add_resource(RaceStandingList,
+                     '/api/<string:version>/racestandings/<string:race_id>',
+                     endpoint='racestandings')
+
+    api.add_resource(RaceEntryList,
+                     '/api/<string:version>/<string:series>/<string:season>/raceentry/<string:entry_type>/<string:round>',
+                     endpoint='raceentry')
+
+    api.add_resource(RaceResultList,
+                     '/api/<string:version>/<string:series>/<string:season>/raceresults/<string:round>',
+                     endpoint='raceresults')
+
+    api.add_resource(QualifyingResultList,
+                     '/api/<string:version>/<string:series>/<string:season>/qualifyingresults/<string:round>',
+                     '/api/<string:version>/<string:series>/<string:season>/qualifyingresults/<string:round>/<string:session>',
+                     endpoint='qualifyingresults')
+
+    api.add_resource(PracticeResultList,
+                     '/api/<string:version>/<string:series>/<string:season>/practiceresults/<string:round>',
+                     '/api/<string:version>/<string:series>/<string:season>/practiceresults/<string:round>/<string:session>',
+                     endpoint='practiceresults')
+
+    api.add_resource(ColumnarExport,
+                     '/api/<string:version>/<string:series>/<string:season>/export/<string:dataset>',
+                     endpoint='export')
+
+    api.add_resource(Search,
+                     '/api/<string:version>/search',
+                     endpoint='search')
+
+    api.add_resource(AutocompleteList,
+                     '/api/<string:version>/autocomplete',
+                     endpoint='autocomplete')
+
+    api.add_resource(ChangeList,
+                     '/api/<string:version>/changes',
+                     endpoint='changes')
+
+    # Internals, only served when DEBUG_ROUTES is set.
+    if app.config.get('DEBUG_ROUTES'):
+        api.add_resource(CoalescingStats,
+                         '/api/<string:version>/debug/coalescing',
+                         endpoint='coalescing')
+        api.add_resource(CacheStats,
+                         '/api/<string:version>/debug/cache',
+                         endpoint='cache')
+
+    return app
+
+
+def create_web_app(env_config):
+    app = register_api(create_app(env_config))
+
+    #request recent seasons in the background when WARM_SEASONS is set,
+    #from the first request on: threads started here wouldn't survive
+    #servers forking workers from a preloaded application
+    seasons = int(app.config.get('WARM_SEASONS') or 0)
+    if seasons > 0:
+        workers = int(app.config.get('WARM_WORKERS') or DEFAULT_WORKERS)
+        app.before_first_request(Warmer(app, seasons, workers).start)
+
+    return app
+
+
+def create_and_config_app(overloads={}):
+    """ Returns an application object grabbing configuration
+        from the environment and supplementing that with any
+        parameters passed in the `overloads` parameter.
+    """
+    config = get_config_from_env(overloads)
+    return create_web_app(config)
@@ -0,0 +1,12 @@
+""" Entry point of web workers: `app` is the application, configured
+    from the environment. Run directly, it starts the development server
+    on HOST and PORT.
+"""
+import os
+from web import create_and_config_app
+
+app = create_and_config_app()
+
+if __name__ == '__main__':
+    app.run(host=os.environ.get('HOST', '127.0.0.1'),
+            port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,27 @@
+"""series season indexes
+
+Revision ID: 2d26faef8611
+Revises: 8c4f2e6a1d57
+Create Date: 2026-10-19 23:44:18.762337
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2d26faef8611'
+down_revision = '8c4f2e6a1d57'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+TABLES = ('driver_standings', 'team_standings', 'owner_standings', 'races')
+
+
+def upgrade():
+    for table in TABLES:
+        op.create_index('ix_{0}_series_season'.format(table), table, ['series', 'season'])
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index('ix_{0}_series_season'.format(table))
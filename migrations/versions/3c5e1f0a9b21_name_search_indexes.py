@@ -0,0 +1,43 @@
+"""name search indexes
+
+Revision ID: 3c5e1f0a9b21
+Revises: fb7e2cdf950
+Create Date: 2026-10-19 19:02:41.118204
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3c5e1f0a9b21'
+down_revision = 'fb7e2cdf950'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+SEARCH_COLUMNS = (
+    ('people', 'name'),
+    ('teams', 'name'),
+    ('teams', 'alias')
+)
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+    op.execute("CREATE OR REPLACE FUNCTION search_key(text) RETURNS text AS "
+               "$$ SELECT lower(public.unaccent('public.unaccent'::regdictionary, $1)) $$ "
+               "LANGUAGE sql IMMUTABLE STRICT")
+
+    for table, column in SEARCH_COLUMNS:
+        op.execute('CREATE INDEX ix_{0}_{1}_trgm ON {0} '
+                   'USING gin (search_key({1}) gin_trgm_ops)'.format(table, column))
+        op.execute('CREATE INDEX ix_{0}_{1}_prefix ON {0} '
+                   '(search_key({1}) text_pattern_ops)'.format(table, column))
+
+
+def downgrade():
+    for table, column in SEARCH_COLUMNS:
+        op.drop_index('ix_{0}_{1}_prefix'.format(table, column))
+        op.drop_index('ix_{0}_{1}_trgm'.format(table, column))
+
+    op.execute('DROP FUNCTION search_key(text)')
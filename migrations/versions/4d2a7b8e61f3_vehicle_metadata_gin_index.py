@@ -0,0 +1,23 @@
+"""vehicle metadata gin index
+
+Revision ID: 4d2a7b8e61f3
+Revises: 3c5e1f0a9b21
+Create Date: 2026-10-19 19:47:12.530117
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4d2a7b8e61f3'
+down_revision = '3c5e1f0a9b21'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_index('ix_vehicles_vehicle_metadata', 'vehicles', ['vehicle_metadata'],
+                    postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_vehicles_vehicle_metadata')
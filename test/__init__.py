@@ -0,0 +1,9 @@
+from base import close_connection
+
+
+# Each worker process runs the package fixtures for itself.
+_multiprocess_can_split_ = True
+
+
+def teardown_package():
+    close_connection()
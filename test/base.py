@@ -0,0 +1,257 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import zlib
+import psycopg2
+from functools import partial
+from flask.ext.sqlalchemy import _SignallingSession
+from flask.ext.testing import TestCase
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.orm import scoped_session
+from app.models import db
+from app.web import create_and_config_app
+
+
+# If you don't want to use the default testing database url,
+# specify one using TEST_DATABASE_URL in the environment.
+DBURL = os.environ.get('TEST_DATABASE_URL',
+                       'postgresql://localhost/motorsports_api_test')
+DBNAME = make_url(DBURL).database
+
+# Databases are cloned from this one, which holds the empty schema.
+TEMPLATE_NAME = DBNAME + '_template'
+
+# The connection every test runs on, opened on the database of the
+# process the first time a test needs it.
+_connection = None
+
+
+def admin_connection(database='postgres'):
+    """ Returns an autocommit connection to a database, by default the
+        maintenance database, of the server holding the test database.
+    """
+    url = make_url(DBURL)
+    params = dict(database=database, host=url.host, port=url.port,
+                  user=url.username, password=url.password)
+    conn = psycopg2.connect(**dict((k, v) for k, v in params.items() if v is not None))
+    conn.autocommit = True
+    return conn
+
+
+def database_name():
+    """ Name of the database tests of this process run on. Worker
+        processes started with `nosetests --processes` each get their
+        own, named after the configured one.
+    """
+    identity = multiprocessing.current_process()._identity
+    if identity:
+        return '{0}_{1}'.format(DBNAME, identity[0])
+    return DBNAME
+
+
+def database_url():
+    url = make_url(DBURL)
+    url.database = database_name()
+    return str(url)
+
+
+def schema_fingerprint():
+    """ Hash of the DDL creating the tables of the models, stored as the
+        comment of the template database.
+    """
+    statements = []
+    engine = create_engine('postgresql://', strategy='mock',
+                           executor=lambda sql, *args, **kwargs:
+                           statements.append(unicode(sql.compile(dialect=engine.dialect))))
+    db.metadata.create_all(engine, checkfirst=False)
+    return 'schema ' + hashlib.sha1(u'\n'.join(sorted(statements)).encode('utf-8')).hexdigest()
+
+
+def database_comment(cur, name):
+    """ The comment of a database, or None if it doesn't exist.
+    """
+    cur.execute("SELECT coalesce(shobj_description(oid, 'pg_database'), '') "
+                "FROM pg_database WHERE datname = %s", (name,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def create_template(cur, fingerprint):
+    """ Creates the template database with the tables of the models.
+    """
+    logging.info('creating test template database %s', TEMPLATE_NAME)
+    cur.execute('DROP DATABASE IF EXISTS "{0}"'.format(TEMPLATE_NAME))
+    cur.execute('CREATE DATABASE "{0}"'.format(TEMPLATE_NAME))
+
+    url = make_url(DBURL)
+    url.database = TEMPLATE_NAME
+    engine = create_engine(url)
+    try:
+        with engine.begin() as conn:
+            db.metadata.create_all(conn)
+    finally:
+        engine.dispose()
+    cur.execute('COMMENT ON DATABASE "{0}" IS %s'.format(TEMPLATE_NAME), (fingerprint,))
+
+
+def prepare_database():
+    """ Clones the database of this process from the template database,
+        rebuilding the template first when the models have changed.
+
+        The database is cloned on every run rather than reused: rolled
+        back rows still grow tables and ANALYZE statistics outlive the
+        transaction, and both would change query plans from one run to
+        the next. Everything happens under an advisory lock, so worker
+        processes starting together don't race each other.
+    """
+    name = database_name()
+    fingerprint = schema_fingerprint()
+
+    conn = admin_connection()
+    cur = conn.cursor()
+    cur.execute('SELECT pg_advisory_lock(%s)', (zlib.crc32(TEMPLATE_NAME),))
+    try:
+        if database_comment(cur, TEMPLATE_NAME) != fingerprint:
+            create_template(cur, fingerprint)
+
+        cur.execute('DROP DATABASE IF EXISTS "{0}"'.format(name))
+        cur.execute('CREATE DATABASE "{0}" TEMPLATE "{1}"'.format(name, TEMPLATE_NAME))
+    finally:
+        cur.execute('SELECT pg_advisory_unlock(%s)', (zlib.crc32(TEMPLATE_NAME),))
+        cur.close()
+        conn.close()
+
+
+def create_test_app(overloads={}):
+    return create_and_config_app(dict(overloads, DATABASE_URL=database_url()))
+
+
+def connection():
+    """ Returns the connection tests run on, preparing the database of
+        the process on the first call.
+    """
+    global _connection
+    if _connection is None:
+        prepare_database()
+        _connection = create_engine(database_url()).connect()
+    return _connection
+
+
+def vacuum_database():
+    """ Vacuums the database of the process, dropping the pages left by
+        rows the tests before rolled back.
+    """
+    connection()
+    conn = admin_connection(database_name())
+    try:
+        conn.cursor().execute('VACUUM')
+    finally:
+        conn.close()
+
+
+def close_connection():
+    global _connection
+    if _connection is not None:
+        _connection.close()
+        _connection.engine.dispose()
+        _connection = None
+
+
+class TestSession(_SignallingSession):
+    """ Session bound to the connection tests run on instead of the
+        engine of the application.
+
+        Test sessions start a savepoint and start a new one every time
+        the previous one is committed or rolled back, so `commit` and
+        `rollback` behave as usual while everything stays inside the
+        transaction of the running test.
+    """
+
+    def __init__(self, db, bind, savepoints=True, **options):
+        _SignallingSession.__init__(self, db, **options)
+        self.bind = bind
+        self.savepoints = savepoints
+        if savepoints:
+            self.begin_nested()
+
+    def get_bind(self, mapper=None, clause=None):
+        # The application session maps every table to the engine of the
+        # application; everything has to go through the test connection.
+        return self.bind
+
+    def close(self):
+        # Closing ends the savepoint too; start the next one once the
+        # session is closed rather than while it is being closed.
+        savepoints, self.savepoints = self.savepoints, False
+        _SignallingSession.close(self)
+        self.savepoints = savepoints
+        if savepoints:
+            self.begin_nested()
+
+
+@event.listens_for(TestSession, 'after_transaction_end')
+def restart_savepoint(session, transaction):
+    if session.savepoints and transaction.nested and not transaction._parent.nested:
+        # A real commit expires every instance; releasing a savepoint
+        # doesn't, so expire them here to behave the same.
+        session.expire_all()
+        session.begin_nested()
+
+
+class BaseTest(TestCase):
+    """ Runs every test in a transaction rolled back once it is done,
+        so that tests share one schema, created once per run.
+
+        Rows used by every test of a class, however many, can be added
+        once in `create_fixtures`. They're added in a transaction
+        enclosing the tests of the class, which is rolled back after the
+        last one. Tests can change them; those changes are rolled back
+        with the rest of the test.
+    """
+
+    @classmethod
+    def create_fixtures(cls):
+        """ Adds rows shared by the tests of the class. Instances kept
+            on the class stay loaded, but are detached from the session.
+        """
+        pass
+
+    @classmethod
+    def setUpClass(cls):
+        conn = connection()
+        cls.class_transaction = conn.begin()
+        cls.original_session = db.session
+
+        ctx = create_test_app().app_context()
+        ctx.push()
+        try:
+            db.session = scoped_session(partial(TestSession, db, conn, savepoints=False,
+                                                expire_on_commit=False))
+            cls.create_fixtures()
+            db.session.commit()
+            db.session.remove()
+        except:
+            cls.tearDownClass()
+            raise
+        finally:
+            ctx.pop()
+
+        db.session = scoped_session(partial(TestSession, db, conn))
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        db.session = cls.original_session
+        cls.class_transaction.rollback()
+
+    def create_app(self):
+        return create_test_app()
+
+    def setUp(self):
+        self.transaction = connection().begin_nested()
+
+    def tearDown(self):
+        db.session.remove()
+        self.transaction.rollback()
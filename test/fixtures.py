@@ -0,0 +1,87 @@
+import datetime
+from app.models import db, Series, Team, Vehicle, DriverStanding, RaceTrack, \
+    TeamStanding, Race, RaceResult, RaceStanding, RaceEntry, RaceEntryType, \
+    QualifyingResult, PracticeResult, Person, RaceResultPerson, \
+    QualifyingResultPerson, PracticeResultPerson, RaceEntryPerson, OwnerStanding, \
+    RaceType, RacesTypes
+
+
+def create_reference_data(series=('s1',), seasons=(2012, 2013), races=3, cars=10):
+    """ Adds a complete, if small, data set: for every series and season,
+        `races` races with entries, practice, qualifying and race results
+        for `cars` cars, race standings and championship standings.
+
+        Drivers, crew chiefs, owners, teams and vehicles are shared by
+        every series and season. Returns the added series.
+    """
+    rt = RaceType(id='pts', description='Points race')
+    entry_type = RaceEntryType(entry_type='official')
+    tracks = [RaceTrack(site='Site {0}'.format(i), circuit_name='Circuit {0}'.format(i),
+                        city='City {0}'.format(i), state='ST', country='USA')
+              for i in range(races)]
+    drivers = [Person(name='Driver {0}'.format(i), country='USA') for i in range(cars)]
+    chiefs = [Person(name='Crew Chief {0}'.format(i), country='USA') for i in range(cars)]
+    owners = [Person(name='Owner {0}'.format(i), country='USA') for i in range(cars)]
+    db.session.add_all([rt, entry_type] + tracks + drivers + chiefs + owners)
+    db.session.flush()
+
+    teams = [Team(id='t{0}'.format(i), name='Team {0}'.format(i), alias='team{0}'.format(i),
+                  owner_id=owners[i].id) for i in range(cars)]
+    vehicles = [Vehicle(number=i + 1, owner_id=owners[i].id,
+                        vehicle_metadata={'make': ('Ford', 'Chevy')[i % 2]})
+                for i in range(cars)]
+    all_series = [Series(id=s, description='Series {0}'.format(s)) for s in series]
+    db.session.add_all(teams + vehicles + all_series)
+    db.session.flush()
+
+    for s in series:
+        for season in seasons:
+            for rnd in range(1, races + 1):
+                race = Race(id='{0}-{1}-{2}'.format(s, season, rnd), round=rnd,
+                            name='Race {0}'.format(rnd), season=season,
+                            race_track_id=tracks[rnd - 1].id,
+                            date=datetime.datetime(season, 2, 1) + datetime.timedelta(weeks=rnd),
+                            laps=200, length=2.5, distance=500, series=s)
+                db.session.add(race)
+                db.session.flush()
+
+                db.session.add(RacesTypes(race_id=race.id, race_type=rt.id))
+                db.session.add(RaceStanding(race_id=race.id, race_time=datetime.time(3, 10),
+                                            caution_flags=5, caution_flag_laps=25,
+                                            lead_changes=12, pole_speed=190.5,
+                                            avg_speed=150.25, victory_margin=0.5))
+
+                for i in range(cars):
+                    common = dict(race_id=race.id, team_id=teams[i].id, vehicle_id=vehicles[i].id)
+                    entry = RaceEntry(entry_type_id=entry_type.id, **common)
+                    practice = PracticeResult(session=1, position=i + 1, lap_time=30 + i, **common)
+                    qualifying = QualifyingResult(session=1, position=i + 1, lap_time=30 + i,
+                                                  **common)
+                    result = RaceResult(sponsor='Sponsor {0}'.format(i), grid=i + 1,
+                                        position=i + 1, laps=200, status='Running',
+                                        laps_led=10, points=43 - i, money=1000, **common)
+                    db.session.add_all([entry, practice, qualifying, result])
+                    db.session.flush()
+
+                    for person, type in ((drivers[i], 'driver'), (chiefs[i], 'crew-chief')):
+                        db.session.add_all([
+                            RaceEntryPerson(race_entry_id=entry.id, person_id=person.id,
+                                            type=type),
+                            PracticeResultPerson(practice_result_id=practice.id,
+                                                 person_id=person.id, type=type),
+                            QualifyingResultPerson(qualifying_result_id=qualifying.id,
+                                                   person_id=person.id, type=type),
+                            RaceResultPerson(race_result_id=result.id, person_id=person.id,
+                                             type=type)])
+
+            for i in range(cars):
+                standing = dict(series=s, season=season, vehicle_id=vehicles[i].id,
+                                position=i + 1, points=(43 - i) * races)
+                db.session.add_all([
+                    DriverStanding(driver_id=drivers[i].id, poles=0, wins=0, starts=races,
+                                   dnfs=0, top5=0, top10=0, **standing),
+                    TeamStanding(team_id=teams[i].id, poles=0, **standing),
+                    OwnerStanding(**standing)])
+
+    db.session.commit()
+    return all_series
@@ -0,0 +1,66 @@
+import nose
+from sqlalchemy.exc import DBAPIError
+from app.models import db, Series, Person
+from base import BaseTest
+
+
+class TransactionTests(BaseTest):
+
+    @classmethod
+    def create_fixtures(cls):
+        cls.s1 = Series(id='s1', description='series 1')
+        cls.people = [Person(name='person {0}'.format(i), country='USA') for i in range(100)]
+        db.session.add(cls.s1)
+        db.session.add_all(cls.people)
+
+    def test_1_commit(self):
+        '''should keep committed rows until the end of the test'''
+
+        db.session.add(Series(id='s2', description='series 2'))
+        db.session.commit()
+
+        Series.query.filter_by(id='s1').update({'description': 'changed'})
+        db.session.commit()
+
+        self.assertEqual(Series.query.count(), 2)
+        self.assertEqual(Series.query.get('s1').description, 'changed')
+
+    def test_2_rolled_back(self):
+        '''should roll back the rows committed by the previous test'''
+
+        self.assertEqual([s.id for s in Series.query.all()], ['s1'])
+        self.assertEqual(Series.query.get('s1').description, 'series 1')
+
+    def test_3_rollback(self):
+        '''should keep fixtures and earlier commits after a rollback'''
+
+        db.session.add(Series(id='s2', description='series 2'))
+        db.session.commit()
+
+        db.session.add(Series(id='s1', description='duplicate'))
+        self.assertRaises(DBAPIError, db.session.commit)
+        db.session.rollback()
+
+        self.assertEqual(sorted(s.id for s in Series.query.all()), ['s1', 's2'])
+        self.assertEqual(Person.query.count(), 100)
+
+    def test_4_fixtures(self):
+        '''should share fixtures between the tests of a class'''
+
+        self.assertEqual(self.s1.description, 'series 1')
+
+        response = self.client.get('/api/v1.0/search?q=person 42')
+        self.assertEqual(response._status_code, 200)
+        self.assertEqual(response.json['people'][0]['id'], self.people[42].id)
+
+
+class IsolationTests(BaseTest):
+
+    def test_no_fixtures(self):
+        '''should not see the fixtures of other classes'''
+
+        self.assertEqual(Series.query.count(), 0)
+        self.assertEqual(Person.query.count(), 0)
+
+if __name__ == '__main__':
+    nose.main()
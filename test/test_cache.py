@@ -0,0 +1,187 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import nose
+from SocketServer import ThreadingTCPServer, StreamRequestHandler
+from unittest import TestCase
+from app.cache import LRUCache, FileCache, MemcachedCache
+from app.models import db, DriverStanding
+from base import BaseTest, create_test_app
+from fixtures import create_reference_data
+
+
+class FakeMemcachedHandler(StreamRequestHandler):
+    """ Answers get, set and delete like memcached, ignoring expiry.
+    """
+
+    def handle(self):
+        values = self.server.values
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            parts = line.split()
+            if parts[0] == 'get':
+                value = values.get(parts[1])
+                if value is not None:
+                    self.wfile.write('VALUE {0} 0 {1}\r\n{2}\r\n'.format(parts[1], len(value), value))
+                self.wfile.write('END\r\n')
+            elif parts[0] == 'set':
+                values[parts[1]] = self.rfile.read(int(parts[4]) + 2)[:-2]
+                self.wfile.write('STORED\r\n')
+            elif parts[0] == 'delete':
+                found = values.pop(parts[1], None) is not None
+                self.wfile.write('DELETED\r\n' if found else 'NOT_FOUND\r\n')
+            else:
+                self.wfile.write('ERROR\r\n')
+
+
+class FakeMemcached(ThreadingTCPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        ThreadingTCPServer.__init__(self, ('127.0.0.1', 0), FakeMemcachedHandler)
+        self.values = {}
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    @property
+    def address(self):
+        return '{0}:{1}'.format(*self.server_address)
+
+
+class BackendTests(TestCase):
+
+    def check_backend(self, cache):
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', 'value\r\nwith lines')
+        cache.set('b', '')
+        self.assertEqual(cache.get('a'), 'value\r\nwith lines')
+        self.assertEqual(cache.get('b'), '')
+        cache.delete('a')
+        cache.delete('missing')
+        self.assertIsNone(cache.get('a'))
+
+    def test_lru(self):
+        '''should keep the most recently used values until they expire'''
+
+        cache = LRUCache(max_entries=2)
+        self.check_backend(cache)
+
+        cache.set('a', '1')
+        cache.set('b', '2')
+        cache.get('a')
+        cache.set('c', '3')
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), ('1', None, '3'))
+
+        cache.set('d', '4', timeout=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('d'))
+
+    def test_file(self):
+        '''should share values through files until they expire'''
+
+        directory = tempfile.mkdtemp()
+        try:
+            cache = FileCache(directory)
+            self.check_backend(cache)
+
+            cache.set('a', '1', timeout=60)
+            self.assertEqual(FileCache(directory).get('a'), '1')
+
+            cache.set('d', '4', timeout=0.01)
+            time.sleep(0.02)
+            self.assertIsNone(cache.get('d'))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_file_sweep(self):
+        '''should remove the files of expired values'''
+
+        directory = tempfile.mkdtemp()
+        try:
+            cache = FileCache(directory, sweep_interval=0.05)
+            cache.set('a', '1', timeout=0.01)
+            cache.set('b', '2', timeout=0.01)
+            cache.set('c', '3')
+            with open(os.path.join(directory, '.tmpleft'), 'w') as f:
+                f.write('0.0')
+            time.sleep(0.06)
+
+            self.assertIsNone(cache.get('a'))
+            self.assertEqual(sorted(os.listdir(directory)), ['.tmpleft', 'b', 'c'])
+            cache.set('d', '4', timeout=60)
+            self.assertEqual(sorted(os.listdir(directory)), ['c', 'd'])
+            self.assertEqual(cache.get('c'), '3')
+        finally:
+            shutil.rmtree(directory)
+
+    def test_memcached(self):
+        '''should talk the memcached protocol'''
+
+        server = FakeMemcached()
+        try:
+            cache = MemcachedCache(server.address)
+            self.check_backend(cache)
+            self.assertEqual(server.values, {'b': ''})
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_memcached_down(self):
+        '''should miss when memcached can't be reached'''
+
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        address = '{0}:{1}'.format(*sock.getsockname())
+        sock.close()
+
+        cache = MemcachedCache(address)
+        cache.set('a', '1')
+        self.assertIsNone(cache.get('a'))
+
+
+class ResponseCacheTests(BaseTest):
+
+    @classmethod
+    def create_fixtures(cls):
+        create_reference_data(seasons=(2013,), races=1, cars=2)
+
+    def create_app(self):
+        return create_test_app({'CACHE_TYPE': 'lru'})
+
+    def test_cached_until_commit(self):
+        '''should serve cached responses until the next commit'''
+
+        url = '/api/v1.0/s1/2013/driverstandings'
+        first = self.client.get(url).json
+        self.assertEqual(self.client.get(url).json, first)
+        self.assertEqual(self.app.extensions['cache'].stats(),
+                         {'backend': 'LRUCache', 'hits': 1, 'misses': 1, 'hit_rate': 0.5,
+                          'entries': 2})
+
+        standing = DriverStanding.query.filter_by(position=1).one()
+        standing.points = 1000
+        db.session.commit()
+
+        response = self.client.get(url)
+        points = [s['points'] for s in response.json['driverstandings'] if s['position'] == 1]
+        self.assertEqual(points, [1000])
+        self.assertEqual(self.app.extensions['cache'].stats()['misses'], 2)
+
+    def test_not_cached(self):
+        '''should not cache errors'''
+
+        url = '/api/v1.0/s1/2013/driverstandings?metadata=bad'
+        self.assertEqual(self.client.get(url)._status_code, 400)
+        self.assertEqual(self.client.get(url)._status_code, 400)
+        self.assertEqual(self.app.extensions['cache'].stats()['hits'], 0)
+
+if __name__ == '__main__':
+    nose.main()
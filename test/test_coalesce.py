@@ -0,0 +1,93 @@
+import threading
+import time
+import nose
+from unittest import TestCase
+from app.coalesce import SingleFlight
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.001)
+
+
+class SingleFlightTests(TestCase):
+
+    def run_concurrently(self, flight, key, compute, callers):
+        """ Calls `flight.do(key, compute)` from `callers` threads and
+            returns what every call returned or raised.
+        """
+        outcomes = []
+
+        def call():
+            try:
+                outcomes.append(flight.do(key, compute))
+            except Exception as e:
+                outcomes.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        return threads, outcomes
+
+    def test_coalesces_concurrent_calls(self):
+        '''should compute once for concurrent calls with the same key'''
+
+        flight = SingleFlight()
+        release = threading.Event()
+        result = {'rows': [1, 2, 3]}
+        computed = []
+
+        def compute():
+            computed.append(1)
+            release.wait()
+            return result
+
+        threads, outcomes = self.run_concurrently(flight, 'k', compute, 5)
+        wait_until(lambda: flight.stats()['waiting'] == 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(computed), 1)
+        self.assertEqual(len(outcomes), 5)
+        self.assertTrue(all(outcome is result for outcome in outcomes))
+
+        stats = flight.stats()
+        self.assertEqual((stats['computations'], stats['coalesced'], stats['waiting'],
+                          stats['in_flight']), (1, 4, 0, 0))
+        self.assertTrue(stats['wait_seconds'] > 0)
+
+    def test_shares_exceptions(self):
+        '''should raise the exception of the computation in every waiter'''
+
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def compute():
+            release.wait()
+            raise ValueError('failed')
+
+        threads, outcomes = self.run_concurrently(flight, 'k', compute, 3)
+        wait_until(lambda: flight.stats()['waiting'] == 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([type(outcome) for outcome in outcomes], [ValueError] * 3)
+        self.assertEqual(flight.stats()['errors'], 1)
+
+    def test_no_sharing_between_calls(self):
+        '''should compute again once the previous call returned, and per key'''
+
+        flight = SingleFlight()
+        self.assertEqual(flight.do('a', lambda: 1), 1)
+        self.assertEqual(flight.do('a', lambda: 2), 2)
+        self.assertEqual(flight.do('b', lambda: 3), 3)
+        self.assertEqual(flight.stats()['computations'], 3)
+        self.assertEqual(flight.stats()['coalesced'], 0)
+
+if __name__ == '__main__':
+    nose.main()
@@ -0,0 +1,82 @@
+import json
+import nose
+from app.models import db, Person, RaceResult, DriverStanding, RenderedDocument
+from base import BaseTest, create_test_app
+from fixtures import create_reference_data
+
+
+class DocumentStoreTests(BaseTest):
+
+    @classmethod
+    def create_fixtures(cls):
+        create_reference_data(seasons=(2013,), races=2, cars=2)
+
+    def create_app(self):
+        return create_test_app({'DOCUMENT_STORE': 'true'})
+
+    def stored_paths(self):
+        return sorted(d.path for d in RenderedDocument.query)
+
+    def test_stored(self):
+        '''should store documents when first rendered and serve them after'''
+
+        url = '/api/v1.0/s1/2013/raceresults/1'
+        first = self.client.get(url)
+        self.assertEqual(first._status_code, 200)
+        self.assertEqual(self.stored_paths(), [url])
+
+        second = self.client.get(url)
+        self.assertEqual(second._status_code, 200)
+        self.assertEqual(json.loads(second.data), first.json)
+        self.assertEqual(self.app.extensions['documents'].stats(),
+                         {'enabled': True, 'hits': 1, 'misses': 1})
+
+    def test_request_not_committed(self):
+        '''should store documents without committing the session of the request'''
+
+        db.session.add(Person(name='Pending', country='USA'))
+        self.client.get('/api/v1.0/s1/2013/raceresults/1')
+        self.assertEqual(self.stored_paths(), ['/api/v1.0/s1/2013/raceresults/1'])
+        self.assertEqual(Person.query.filter_by(name='Pending').count(), 0)
+
+    def test_not_stored(self):
+        '''should not store documents of requests with arguments, sessions or lists'''
+
+        for url in ('/api/v1.0/s1/2013/raceresults/1?include=people',
+                    '/api/v1.0/s1/2013/qualifyingresults/1/1',
+                    '/api/v1.0/s1/2012,2013/driverstandings',
+                    '/api/v1.0/s1/2013/drivers'):
+            self.assertEqual(self.client.get(url)._status_code, 200, url)
+        self.assertEqual(self.stored_paths(), [])
+
+    def test_deleted_on_change(self):
+        '''should delete the documents rendered from changed rows'''
+
+        race = '/api/v1.0/s1/2013/raceresults/1'
+        other_race = '/api/v1.0/s1/2013/raceresults/2'
+        standings = '/api/v1.0/s1/2013/driverstandings'
+        for url in (race, other_race, standings):
+            self.client.get(url)
+
+        result = RaceResult.query.filter_by(race_id='s1-2013-1', position=1).one()
+        result.laps_led = 100
+        db.session.commit()
+        self.assertEqual(self.stored_paths(), [standings, other_race])
+
+        response = self.client.get(race)
+        self.assertEqual([r['laps_led'] for r in response.json['raceresults']
+                          if r['position'] == 1], [100])
+
+        standing = DriverStanding.query.filter_by(position=1).one()
+        standing.points = 1000
+        db.session.commit()
+        self.assertEqual(self.stored_paths(), [])
+
+        self.client.get(race)
+        person = Person.query.first()
+        person.name = 'Renamed'
+        db.session.commit()
+        self.assertEqual(self.stored_paths(), [])
+
+if __name__ == '__main__':
+    nose.main()
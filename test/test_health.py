@@ -0,0 +1,112 @@
+import json
+import socket
+import time
+import nose
+import app.health
+from app.warm import Warmer
+from app.web import create_and_config_app
+from base import BaseTest, create_test_app
+from fixtures import create_reference_data
+
+
+class HealthTests(BaseTest):
+
+    @classmethod
+    def create_fixtures(cls):
+        create_reference_data(seasons=(2013,), races=1, cars=2)
+
+    def test_healthz(self):
+        '''should report the process alive'''
+
+        response = self.client.get('/healthz')
+        self.assertEqual(response._status_code, 200)
+        self.assertEqual(response.json, {'status': 'ok'})
+
+    def test_readyz(self):
+        '''should report ready once the database answers and the warm-up is done'''
+
+        response = self.client.get('/readyz')
+        self.assertEqual(response._status_code, 200)
+        self.assertEqual(response.json, {'status': 'ok'})
+
+        warmer = Warmer(self.app, seasons=1, workers=1)
+        response = self.client.get('/readyz')
+        self.assertEqual(response._status_code, 503)
+        self.assertEqual(response.json, {'status': 'warming'})
+
+        warmer.run()
+        self.assertEqual(self.client.get('/readyz')._status_code, 200)
+
+    def test_readyz_database_down(self):
+        '''should report not ready when the database can't be reached'''
+
+        app = create_and_config_app({'DATABASE_URL': 'postgresql://localhost:1/missing'})
+        response = app.test_client().get('/readyz')
+        self.assertEqual(response._status_code, 503)
+        self.assertEqual(json.loads(response.data)['status'], 'unavailable')
+
+    def test_readyz_database_hung(self):
+        '''should report not ready in time when the database accepts connections but never answers'''
+
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(5)
+        timeout = app.health.READY_TIMEOUT
+        app.health.READY_TIMEOUT = 100
+        try:
+            url = 'postgresql://127.0.0.1:{0}/hung'.format(sock.getsockname()[1])
+            client = create_and_config_app({'DATABASE_URL': url}).test_client()
+            started = time.time()
+            response = client.get('/readyz')
+            self.assertLess(time.time() - started, 1)
+            self.assertEqual(response._status_code, 503)
+            self.assertEqual(json.loads(response.data),
+                             {'status': 'unavailable', 'error': 'no answer within 100ms'})
+
+            # The first check still waits, so no other one is started.
+            response = client.get('/readyz')
+            self.assertEqual(json.loads(response.data)['error'],
+                             'previous check still waiting for the database')
+        finally:
+            app.health.READY_TIMEOUT = timeout
+            sock.close()
+
+    def test_stats_not_served(self):
+        '''should only serve stats when DEBUG_ROUTES is set'''
+
+        self.assertEqual(self.client.get('/debug/stats')._status_code, 404)
+
+
+class DebugStatsTests(BaseTest):
+
+    @classmethod
+    def create_fixtures(cls):
+        create_reference_data(seasons=(2013,), races=1, cars=2)
+
+    def create_app(self):
+        return create_test_app({'DEBUG_ROUTES': 'true', 'CACHE_TYPE': 'lru'})
+
+    def test_stats(self):
+        '''should report pool usage, caches, requests in flight and route latencies'''
+
+        for i in range(3):
+            self.client.get('/api/v1.0/s1/2013/driverstandings')
+        self.client.get('/missing')
+
+        stats = self.client.get('/debug/stats').json
+        self.assertIn('pool', stats['database'])
+        self.assertEqual((stats['cache']['hits'], stats['cache']['misses']), (2, 1))
+        self.assertEqual(stats['coalescing']['in_flight'], 0)
+        self.assertIn('documents', stats)
+        self.assertIn('autocomplete', stats)
+
+        # The stats request itself is in flight.
+        self.assertEqual(stats['requests']['in_flight'], 1)
+        routes = stats['requests']['routes']
+        standings = routes['/api/<string:version>/<string:series>/<string:season>/driverstandings']
+        self.assertEqual(standings['count'], 3)
+        self.assertTrue(0 <= standings['p50_ms'] <= standings['p95_ms'] <= standings['max_ms'])
+        self.assertEqual(routes['<unmatched>']['count'], 1)
+
+if __name__ == '__main__':
+    nose.main()
@@ -0,0 +1,206 @@
+import datetime
+import shutil
+import tempfile
+import threading
+import nose
+from unittest import TestCase
+from app.application import get_config_from_env
+from app.cache import FileCache, GENERATION_KEY
+from app.jobs import Worker, register_job, enqueue, job_metrics, ENQUEUE_JOB
+from app.manage import create_manager
+from app.models import db, Job, DriverStanding
+from base import BaseTest, create_test_app, database_url
+from fixtures import create_reference_data
+
+
+calls = []
+
+
+@register_job('test-record')
+def record(*arguments):
+    calls.append(arguments)
+
+
+@register_job('test-fail')
+def fail(*arguments):
+    raise RuntimeError('failed')
+
+
+# Connections queueing a job concurrently with the worker.
+racing = []
+
+
+@register_job('test-fail-raced')
+def fail_raced(*arguments):
+    # The first run fails while another connection queues an identical
+    # job, committed only once the worker is about to retry this one.
+    if not racing:
+        conn = db.engine.connect()
+        racing.append(conn)
+        transaction = conn.begin()
+        conn.execute(ENQUEUE_JOB, name='test-fail-raced', arguments=list(arguments),
+                     max_attempts=1)
+        threading.Timer(0.1, transaction.commit).start()
+    raise RuntimeError('failed')
+
+
+class JobTests(BaseTest):
+
+    @classmethod
+    def create_fixtures(cls):
+        create_reference_data(series=('w',), seasons=(2013,), races=2, cars=3)
+
+    def setUp(self):
+        BaseTest.setUp(self)
+        del calls[:]
+
+    def test_enqueue(self):
+        '''should queue one pending job per name and arguments'''
+
+        first = enqueue('test-record', 'w', 2013)
+        self.assertEqual(enqueue('test-record', 'w', '2013'), first)
+        other = enqueue('test-record', 'b', 2013)
+        self.assertNotEqual(other, first)
+        self.assertEqual(Job.query.count(), 2)
+        self.assertRaises(ValueError, enqueue, 'missing')
+
+    def test_run(self):
+        '''should run jobs in order and record their completion'''
+
+        enqueue('test-record', 'w', 2013)
+        enqueue('test-record')
+        stats = Worker(self.app).run(burst=True)
+
+        self.assertEqual(calls, [(u'w', u'2013'), ()])
+        self.assertEqual((stats['done'], stats['failed']), (2, 0))
+        self.assertEqual([(j.state, j.attempts) for j in Job.query.order_by(Job.id)],
+                         [('done', 1), ('done', 1)])
+
+        # Done jobs don't keep identical ones from being queued again.
+        enqueue('test-record', 'w', 2013)
+        self.assertEqual(Job.query.filter_by(state='pending').count(), 1)
+
+    def test_retry(self):
+        '''should retry failed jobs later until they run out of attempts'''
+
+        retried = enqueue('test-fail', 'a')
+        failed = enqueue('test-fail', 'b', max_attempts=1)
+        stats = Worker(self.app).run(burst=True)
+
+        self.assertEqual(stats['failed'], 2)
+        retried = Job.query.get(retried)
+        self.assertEqual((retried.state, retried.attempts), ('pending', 1))
+        self.assertTrue(retried.run_after > retried.created_at)
+        self.assertIn('RuntimeError: failed', retried.error)
+        self.assertEqual(Job.query.get(failed).state, 'failed')
+
+    def test_lost(self):
+        '''should run again jobs lost with their worker'''
+
+        job_id = enqueue('test-record', 'lost')
+        job = Job.query.get(job_id)
+        job.state = 'running'
+        job.attempts = 1
+        job.started_at = datetime.datetime.now() - datetime.timedelta(hours=2)
+        db.session.commit()
+
+        Worker(self.app).run(burst=True)
+        self.assertEqual(calls, [(u'lost',)])
+        job = Job.query.get(job_id)
+        self.assertEqual((job.state, job.attempts), ('done', 2))
+
+    def test_recompute_standings(self):
+        '''should recompute standings under the points system in force'''
+
+        expect = self.client.get('/api/v1.0/w/2013/driverstandings?points_system=era').json
+        standing = DriverStanding.query.filter_by(position=1).one()
+        standing.points = 0
+        standing.position = 3
+        db.session.delete(DriverStanding.query.filter_by(position=2).one())
+        db.session.commit()
+
+        enqueue('recompute-standings', 'w', 2013)
+        Worker(self.app).run(burst=True)
+
+        standings = DriverStanding.query.order_by(DriverStanding.position).all()
+        self.assertEqual([(s.driver_id, s.position, s.points) for s in standings],
+                         [(s['driver']['id'], s['position'], s['points'])
+                          for s in expect['driverstandings']])
+
+    def test_invalidates_shared_cache(self):
+        '''should invalidate the responses web workers cached in a shared backend'''
+
+        directory = tempfile.mkdtemp()
+        try:
+            config = {'CACHE_TYPE': 'file', 'CACHE_LOCATION': directory}
+            web = create_test_app(config)
+            manager = create_manager(get_config_from_env(dict(config, DATABASE_URL=database_url())),
+                                     ['worker'])
+            backend = FileCache(directory)
+
+            web.test_client().get('/api/v1.0/w/2013/driverstandings')
+            generation = backend.get(GENERATION_KEY)
+            self.assertIsNotNone(generation)
+
+            # Queueing a job changes no response.
+            enqueue('recompute-standings', 'w', 2013)
+            db.session.commit()
+            self.assertEqual(backend.get(GENERATION_KEY), generation)
+
+            # The worker's session, as in its own process.
+            db.session.remove()
+            Worker(manager.app).run(burst=True)
+            self.assertNotEqual(backend.get(GENERATION_KEY), generation)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_metrics(self):
+        '''should count jobs by state and time finished ones'''
+
+        enqueue('test-record', 'a')
+        enqueue('test-fail', 'a', max_attempts=1)
+        Worker(self.app).run(burst=True)
+        enqueue('test-record', 'b')
+
+        metrics = job_metrics()
+        self.assertEqual(metrics.keys(), ['test-fail', 'test-record'])
+        record = metrics['test-record']
+        self.assertEqual((record['pending'], record['running'], record['done'], record['failed']),
+                         (1, 0, 1, 0))
+        self.assertTrue(record['run_seconds'] >= 0)
+        self.assertEqual(metrics['test-fail']['failed'], 1)
+
+
+class RaceTests(TestCase):
+    """ Runs a worker on committed jobs, which connections other than the
+        one of the tests can see and lock.
+    """
+
+    def setUp(self):
+        self.app = create_test_app()
+        self.context = self.app.app_context()
+        self.context.push()
+
+    def tearDown(self):
+        db.session.rollback()
+        db.session.execute(Job.__table__.delete().where(Job.name == 'test-fail-raced'))
+        db.session.commit()
+        for conn in racing:
+            conn.close()
+        del racing[:]
+        self.context.pop()
+
+    def test_retry_raced(self):
+        '''should fail a job when an identical one is queued while it is retried'''
+
+        job_id = enqueue('test-fail-raced', 'a')
+        db.session.commit()
+        stats = Worker(self.app).run(burst=True)
+
+        # The identical job was claimed and run after this one failed.
+        self.assertEqual(stats['failed'], 2)
+        job = Job.query.get(job_id)
+        self.assertEqual((job.state, job.attempts), ('failed', 1))
+
+if __name__ == '__main__':
+    nose.main()
@@ -0,0 +1,197 @@
+import json
+import os
+import nose
+from sqlalchemy import event
+from app.models import db, RaceTrack, Person, Vehicle
+from base import BaseTest, connection, vacuum_database
+from fixtures import create_reference_data
+
+
+# Checked in statement counts and costs of every route. Run the tests
+# with UPDATE_QUERY_PLANS=1 in the environment to rewrite it, and
+# review the differences before committing them.
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'query_plans.json')
+
+# How much the estimated cost of a route may grow before it fails.
+# Estimates move a little between Postgres versions.
+COST_TOLERANCE = 0.25
+
+
+def first_ids(model, count=5):
+    return ','.join(str(obj.id) for obj in model.query.order_by(model.id).limit(count))
+
+
+# Values used for the arguments of every route. Callables are called for
+# values, such as generated ids, that are only known once the fixtures
+# exist.
+ROUTE_ARGUMENTS = {
+    'version': 'v1.0',
+    'series': 's1',
+    'season': '2013',
+    'round': '2',
+    'session': '1',
+    'race_id': 's1-2013-2',
+    'entry_type': 'official',
+    'role': 'crewchiefs',
+    'team_id': 't1',
+    'track_id': lambda: RaceTrack.query.filter_by(site='Site 1').one().id,
+    'dataset': 'race_results'
+}
+
+# Query strings requested for some endpoints, in addition to none. They
+# are formatted with QUERY_VALUES; the baseline names them unformatted.
+ENDPOINT_QUERIES = {
+    'persons': ['ids={person_ids}'],
+    'teams': ['ids=t1,t2,t3'],
+    'races': ['expand=summary', 'ids=s1-2013-1,s1-2013-2'],
+    'vehicles': ['metadata=make:Ford', 'ids={vehicle_ids}'],
+    'driverstandings': ['metadata=make:Ford', 'include=people,vehicles',
+                        'points_system=nascar-2011'],
+    'teamstandings': ['include=teams,vehicles'],
+    'raceentry': ['include=people,teams,vehicles'],
+    'raceresults': ['metadata=make:Ford', 'include=people,teams,vehicles'],
+    'search': ['q=driver', 'q=dr'],
+    'autocomplete': ['q=dri']
+}
+
+# Values of generated ids, known once the fixtures exist.
+QUERY_VALUES = {
+    'person_ids': lambda: first_ids(Person),
+    'vehicle_ids': lambda: first_ids(Vehicle)
+}
+
+# Endpoints that need a query string.
+QUERY_ONLY = ('persons', 'search', 'autocomplete')
+
+# Statements the tests issue to isolate themselves, not counted.
+HARNESS_STATEMENTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+_statements = None
+
+
+def record_statement(conn, cursor, statement, parameters, context, executemany):
+    if _statements is not None and not statement.startswith(HARNESS_STATEMENTS):
+        _statements.append((statement, parameters))
+
+
+def explain_cost(statement, parameters):
+    """ Estimated total cost of a statement, or 0 for statements other
+        than queries.
+    """
+    if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return 0.0
+    cursor = connection().connection.cursor()
+    try:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+        plan = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    if isinstance(plan, basestring):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Total Cost']
+
+
+class QueryPlanTests(BaseTest):
+
+    @classmethod
+    def setUpClass(cls):
+        # Rolled back rows of the tests run before still take pages,
+        # which would raise the cost of sequential scans.
+        vacuum_database()
+        super(QueryPlanTests, cls).setUpClass()
+
+    @classmethod
+    def create_fixtures(cls):
+        create_reference_data()
+        db.session.flush()
+        db.session.execute('ANALYZE')
+        event.listen(connection(), 'before_cursor_execute', record_statement)
+
+    def route_urls(self):
+        """ Yields (name, url) for every route of the application,
+            where name is the rule followed by the query string.
+        """
+        adapter = self.app.url_map.bind('localhost')
+        values = dict((name, value()) for name, value in QUERY_VALUES.items())
+        for rule in sorted(self.app.url_map.iter_rules(), key=lambda r: r.rule):
+            if rule.endpoint == 'static':
+                continue
+            url = adapter.build(rule.endpoint, dict((arg, self.route_argument(arg))
+                                                    for arg in rule.arguments))
+            queries = ENDPOINT_QUERIES.get(rule.endpoint, [])
+            if rule.endpoint not in QUERY_ONLY:
+                queries = [''] + queries
+            for query in queries:
+                name = rule.rule + ('?' + query if query else '')
+                yield name, url + ('?' + query.format(**values) if query else '')
+
+    def route_argument(self, name):
+        value = ROUTE_ARGUMENTS[name]
+        return value() if callable(value) else value
+
+    def measure(self, url):
+        """ Requests a url and returns the number of statements it ran
+            and their total estimated cost.
+        """
+        global _statements
+
+        # Start from an empty session, as requests outside the tests do.
+        db.session.remove()
+
+        _statements = []
+        try:
+            response = self.client.get(url)
+            statements = _statements
+        finally:
+            _statements = None
+
+        self.assertEqual(response._status_code, 200, '{0} returned {1}'.format(
+            url, response._status_code))
+        cost = sum(explain_cost(statement, parameters) for statement, parameters in statements)
+        return {'statements': len(statements), 'cost': round(cost, 2)}
+
+    def test_route_arguments(self):
+        '''should know a value for the arguments of every route'''
+
+        for rule in self.app.url_map.iter_rules():
+            if rule.endpoint == 'static':
+                continue
+            missing = set(rule.arguments) - set(ROUTE_ARGUMENTS)
+            self.assertFalse(missing, 'no value for {0} of {1}'.format(
+                ', '.join(sorted(missing)), rule.rule))
+
+    def test_query_plans(self):
+        '''should not run more or costlier statements than the baseline'''
+
+        # The first request builds the autocomplete index.
+        self.client.get('/api/v1.0/drivers')
+
+        measured = dict((name, self.measure(url)) for name, url in self.route_urls())
+
+        if os.environ.get('UPDATE_QUERY_PLANS'):
+            with open(BASELINE_PATH, 'w') as f:
+                json.dump(measured, f, indent=2, sort_keys=True, separators=(',', ': '))
+                f.write('\n')
+            return
+
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+        errors = []
+        for name in sorted(measured):
+            if name not in baseline:
+                errors.append('{0}: not in the baseline'.format(name))
+                continue
+            now, then = measured[name], baseline[name]
+            if now['statements'] > then['statements']:
+                errors.append('{0}: {1} statements, baseline {2}'.format(
+                    name, now['statements'], then['statements']))
+            if now['cost'] > then['cost'] * (1 + COST_TOLERANCE):
+                errors.append('{0}: cost {1}, baseline {2}'.format(
+                    name, now['cost'], then['cost']))
+
+        self.assertFalse(errors, 'query plan regressions (set UPDATE_QUERY_PLANS=1 to '
+                                 'accept them):\n' + '\n'.join(errors))
+
+if __name__ == '__main__':
+    nose.main()
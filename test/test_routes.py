@@ -1,98 +1,28 @@
 import nose
-import psycopg2
+import gzip
+import json
 import datetime
-from flask.ext.testing import TestCase
-from app.manage import create_and_config_app, db
-from app.models import Series, Team, Vehicle, DriverStanding, RaceTrack,\
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from unittest import TestCase
+from flask.ext.sqlalchemy import _SignallingSession
+from app.models import db, Series, Team, Vehicle, DriverStanding, RaceTrack,\
     TeamStanding, Race, RaceResult, RaceStanding, RaceEntry, RaceEntryType, \
     QualifyingResult, PracticeResult, Person, RaceResultPerson,\
-    QualifyingResultPerson, PracticeResultPerson, RaceEntryPerson, OwnerStanding
-from sqlalchemy.exc import OperationalError
-from psycopg2 import ProgrammingError
-import logging
-import os
-
-
-def run_postgres_commands(cmds, database="postgres"):
-    """ Run Postgres commands with autocommit.
-    """
-    logging.error("Creating database!")
-    if isinstance(cmds, (str, unicode)):
-        cmds = [cmds]
-    conn = psycopg2.connect(database=database)
-    conn.autocommit = True
-    cur = conn.cursor()
-    for cmd in cmds:
-        cur.execute(cmd)
-    cur.close()
-
-
-class BaseTest(TestCase):
-
-    def __init__(self, *args, **kwargs):
-        super(BaseTest, self).__init__(*args, **kwargs)
-
-        # If you don't want to use the default testing database url,
-        # specify one using TEST_DATABASE_URL in the environment.
-        dburl = os.environ.get('TEST_DATABASE_URL')
-        if dburl:
-            self.DBURL = dburl
-            self.DBNAME = dburl.split('/')[-1]
-            logging.error(dburl)
-        else:
-            self.DBNAME = "motorsports_api_test"
-            self.DBURL = "postgresql://localhost/{0}".format(self.DBNAME)
-
-    def create_app(self):
-        overrides = {'DATABASE_URL': self.DBURL}
-        app = create_and_config_app(overrides)
-        return app
-
-    def db_doest_exist(self, e):
-        """ Tests if an exception is about the database not existing
-        """
-        return '"{0}" does not exist'.format(self.DBNAME) in e.message
-
-    def create_database(self):
-        """ Create our testing database
-        """
-        run_postgres_commands('CREATE DATABASE {0}'.format(self.DBNAME))
-
-    def drop_database(self):
-        """ Try to drop the database, ignoring exceptions
-            raised when it doesn't exist.
-        """
-        try:
-            run_postgres_commands('DROP DATABASE {0}'.format(self.DBNAME))
-        except ProgrammingError, e:
-            if not self.db_doest_exist(e):
-                raise
-
-    def create_database_and_tables(self):
-        """ Create the database
-        """
-        try:
-
-            # Create the tables from the SQLAlchemy models
-            db.drop_all()
-            db.create_all()
-        except OperationalError, e:
-
-            # If the exception was related to a missing database,
-            # try to create it and then re-run the create_all command.
-            if self.db_doest_exist(e):
-                self.create_database()
-                db.create_all()
-            else:
-                raise
-
-    def setUp(self):
-        self.create_database_and_tables()
-
-    def tearDown(self):
-        db.session.remove()
-        db.drop_all()
-        db.get_engine(self.app).dispose()
+    QualifyingResultPerson, PracticeResultPerson, RaceEntryPerson, OwnerStanding, \
+    RaceType, RacesTypes, ChangeLog
+import app.autocomplete
+import app.progression
+from app.manage import ExportColumnar
+from app.progression import forget_progressions
+from StringIO import StringIO
+from base import BaseTest, create_test_app
+from fixtures import create_reference_data
 
 
 class DriverListTests(BaseTest):
@@ -184,6 +114,120 @@ class DriverListTests(BaseTest):
         self.assertEquals(response.json, expect)
 
 
+class PeopleListTests(BaseTest):
+
+    def test_no_version(self):
+        '''should return no people with missing or bad version'''
+
+        response = self.client.get('/api/crewchiefs')
+        self.assertEqual(response._status_code, 404)
+
+        response = self.client.get('/api/v0.0/crewchiefs')
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, dict(crewchiefs=[]))
+
+    def test_no_people(self):
+        '''should return no people for every role'''
+
+        for role in ('teamowners', 'crewchiefs', 'vehicleowners', 'teamprincipals',
+                     'technicalchiefs', 'raceengineers'):
+            response = self.client.get('/api/v1.0/s1/2013/{0}'.format(role))
+            self.assertEqual(response._status_code, 200)
+            self.assertEquals(response.json, {role: []})
+
+    def test_people_by_role_series_season(self):
+        '''should return each person once for a role in a series and/or season'''
+
+        s1 = Series(id='s1', description='series 1')
+        s2 = Series(id='s2', description='series 2')
+        db.session.add_all([s1, s2])
+        db.session.commit()
+
+        rt1 = RaceTrack(site='Site 1', circuit_name='Circuit 1',
+                        city='City 1', state='ST', country='USA')
+        db.session.add(rt1)
+        db.session.commit()
+
+        race1 = Race(id='race1', round=1, name='Race 1', season=2013, race_track_id=rt1.id,
+                     date=datetime.datetime.now(), laps=350, length=1.5, distance=525,
+                     series=s1.id)
+        race2 = Race(id='race2', round=2, name='Race 2', season=2013, race_track_id=rt1.id,
+                     date=datetime.datetime.now(), laps=350, length=1.5, distance=525,
+                     series=s1.id)
+        race3 = Race(id='race3', round=1, name='Race 1', season=2012, race_track_id=rt1.id,
+                     date=datetime.datetime.now(), laps=350, length=1.5, distance=525,
+                     series=s2.id)
+        db.session.add_all([race1, race2, race3])
+        db.session.commit()
+
+        p1 = Person(name='driver', country='USA')
+        p2 = Person(name='owner', country='USA')
+        p3 = Person(name='crew chief 1', country='USA')
+        p4 = Person(name='crew chief 2', country='USA')
+        db.session.add_all([p1, p2, p3, p4])
+        db.session.commit()
+
+        t1 = Team(id='t1', name='Team 1', alias='team1', owner_id=p2.id)
+        v1 = Vehicle(number=1, owner_id=p1.id, vehicle_metadata={'make': 'Ford'})
+        et1 = RaceEntryType(entry_type='Official')
+        db.session.add_all([t1, v1, et1])
+        db.session.commit()
+
+        re1 = RaceEntry(race_id=race1.id, team_id=t1.id, vehicle_id=v1.id,
+                        entry_type_id=et1.id)
+        rr1 = RaceResult(race_id=race1.id, team_id=t1.id, vehicle_id=v1.id,
+                         sponsor='sponsor 1', grid=2, position=1, laps=350,
+                         status='Finished', laps_led=200, points=0, money=0)
+        rr2 = RaceResult(race_id=race2.id, team_id=t1.id, vehicle_id=v1.id,
+                         sponsor='sponsor 1', grid=1, position=1, laps=350,
+                         status='Finished', laps_led=150, points=0, money=0)
+        qr1 = QualifyingResult(race_id=race3.id, team_id=t1.id, vehicle_id=v1.id,
+                               session=1, position=1, lap_time=35.25)
+        db.session.add_all([re1, rr1, rr2, qr1])
+        db.session.commit()
+
+        db.session.add_all([
+            RaceEntryPerson(race_entry_id=re1.id, person_id=p3.id, type='crew-chief'),
+            RaceResultPerson(race_result_id=rr1.id, person_id=p1.id, type='driver'),
+            RaceResultPerson(race_result_id=rr1.id, person_id=p3.id, type='crew-chief'),
+            RaceResultPerson(race_result_id=rr2.id, person_id=p3.id, type='crew-chief'),
+            RaceResultPerson(race_result_id=rr2.id, person_id=p2.id, type='team-owner'),
+            QualifyingResultPerson(qualifying_result_id=qr1.id, person_id=p4.id, type='crew-chief')])
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/crewchiefs')
+        expect = {u'crewchiefs': [{u'id': p3.id, u'name': u'crew chief 1', u'country': u'USA'},
+                                  {u'id': p4.id, u'name': u'crew chief 2', u'country': u'USA'}]}
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, expect)
+
+        response = self.client.get('/api/v1.0/s1/crewchiefs')
+        expect = {u'crewchiefs': [{u'id': p3.id, u'name': u'crew chief 1', u'country': u'USA'}]}
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, expect)
+
+        response = self.client.get('/api/v1.0/s2/2012/crewchiefs')
+        expect = {u'crewchiefs': [{u'id': p4.id, u'name': u'crew chief 2', u'country': u'USA'}]}
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, expect)
+
+        response = self.client.get('/api/v1.0/s1/2013/teamowners')
+        expect = {u'teamowners': [{u'id': p2.id, u'name': u'owner', u'country': u'USA'}]}
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, expect)
+
+        # Moving a race to another season moves the roles with it.
+        race3.season = 2014
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/s2/2012/crewchiefs')
+        self.assertEquals(response.json, dict(crewchiefs=[]))
+
+        response = self.client.get('/api/v1.0/s2/2014/crewchiefs')
+        expect = {u'crewchiefs': [{u'id': p4.id, u'name': u'crew chief 2', u'country': u'USA'}]}
+        self.assertEquals(response.json, expect)
+
+
 class TeamListTests(BaseTest):
 
     def test_no_version(self):
@@ -319,6 +363,76 @@ class TeamListTests(BaseTest):
         self.assertEquals(response.json, expect)
 
 
+class TeamHistoryTests(BaseTest):
+
+    @classmethod
+    def create_fixtures(cls):
+        create_reference_data(seasons=(2012, 2013), races=3, cars=3)
+
+    def test_no_version(self):
+        '''should return no history with missing or bad version'''
+
+        response = self.client.get('/api/teams/t0/history')
+        self.assertEqual(response._status_code, 404)
+
+        response = self.client.get('/api/v0.0/teams/t0/history')
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, dict(history=[]))
+
+    def test_no_team(self):
+        '''should return not found for an unknown team'''
+
+        response = self.client.get('/api/v1.0/teams/nope/history')
+        self.assertEqual(response._status_code, 404)
+
+    def test_team_history(self):
+        '''should return every season of a team and follow changes to its results'''
+
+        driver = Person.query.filter_by(name='Driver 0').one()
+        owner = Person.query.filter_by(name='Owner 0').one()
+
+        def season(year, **changes):
+            rslt = {u'series': u's1', u'season': year, u'races': 3, u'starts': 3,
+                    u'wins': 3, u'top5': 3, u'top10': 3, u'laps_led': 30,
+                    u'best_finish': 1, u'vehicle_numbers': [1],
+                    u'drivers': [{u'id': driver.id, u'name': u'Driver 0'}],
+                    u'owners': [{u'id': owner.id, u'name': u'Owner 0'}],
+                    u'standing': {u'position': 1, u'points': 129}}
+            rslt.update(changes)
+            return rslt
+
+        response = self.client.get('/api/v1.0/teams/t0/history')
+        expect = {u'team': {u'id': u't0', u'name': u'Team 0', u'alias': u'team0'},
+                  u'history': [season(2012), season(2013)]}
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, expect)
+
+        # Changed results and renamed drivers are rolled up again.
+        result = RaceResult.query.join(Race).\
+            filter(Race.id == 's1-2013-1', RaceResult.team_id == 't0').one()
+        result.position = 7
+        driver.name = 'Driver Zero'
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/teams/t0/history')
+        drivers = [{u'id': driver.id, u'name': u'Driver Zero'}]
+        expect[u'history'] = [season(2012, drivers=drivers),
+                              season(2013, drivers=drivers, wins=2, top5=2)]
+        self.assertEquals(response.json, expect)
+
+        # Moving a result to another team moves it between histories.
+        result.team_id = 't1'
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/teams/t0/history')
+        self.assertEquals(response.json[u'history'][1][u'starts'], 2)
+
+        response = self.client.get('/api/v1.0/teams/t1/history')
+        self.assertEquals(response.json[u'history'][1][u'starts'], 4)
+        self.assertEquals(response.json[u'history'][1][u'drivers'],
+                          [drivers[0], {u'id': driver.id + 1, u'name': u'Driver 1'}])
+
+
 class VehicleListTests(BaseTest):
 
     def test_no_version(self):
@@ -362,6 +476,35 @@ class VehicleListTests(BaseTest):
         self.assertEqual(response._status_code, 200)
         self.assertEquals(response.json, expect)
 
+    def test_vehicles_by_metadata(self):
+        '''should return vehicles whose metadata contains every requested pair'''
+
+        p1 = Person(name='owner 1', country='USA')
+        db.session.add(p1)
+        db.session.commit()
+
+        v1 = Vehicle(number=1, owner_id=p1.id, vehicle_metadata={'make': 'Ford', 'engine': 'V8'})
+        v2 = Vehicle(number=2, owner_id=p1.id, vehicle_metadata={'make': 'Chevrolet', 'engine': 'V8'})
+        v3 = Vehicle(number=3, owner_id=p1.id, vehicle_metadata={'make': 'Chevrolet', 'engine': 'V6'})
+        db.session.add_all([v1, v2, v3])
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/vehicles?metadata=make:Chevrolet')
+        self.assertEqual(response._status_code, 200)
+        self.assertEqual([v['id'] for v in response.json['vehicles']], [v2.id, v3.id])
+
+        response = self.client.get('/api/v1.0/vehicles?metadata=make:Chevrolet&metadata=engine:V8')
+        self.assertEqual(response.json['vehicles'],
+                         [{u'id': v2.id, u'number': 2,
+                           u'owner': {u'id': p1.id, u'name': 'owner 1', u'country': 'USA'},
+                           u'vehicle_metadata': {u'make': u'Chevrolet', u'engine': u'V8'}}])
+
+        response = self.client.get('/api/v1.0/vehicles?metadata=make:Toyota')
+        self.assertEqual(response.json, dict(vehicles=[]))
+
+        response = self.client.get('/api/v1.0/vehicles?metadata=make')
+        self.assertEqual(response._status_code, 400)
+
     def test_vehicles_by_series(self):
         '''should return all vehicless on a given series'''
 
@@ -509,7 +652,7 @@ class DriverStandingsListTests(BaseTest):
         db.session.commit()
 
         response = self.client.get('/api/v1.0/s1/2013/driverstandings')
-        expect = {u'driverstandings': [{u'id': 1,
+        expect = {u'driverstandings': [{u'id': ds1.id,
                                         u'driver': {u'id': p1.id, u'name': 'driver 1', u'country': 'USA'},
                                         u'vehicle': {u'id': v1.id, u'number': 1,
                                                      u'owner': {u'id': p3.id, u'name': 'vehicle owner 1',
@@ -518,7 +661,7 @@ class DriverStandingsListTests(BaseTest):
                                         u'series': u's1', u'season': 2013, u'position': 1,
                                         u'points': 500, u'poles': 5, u'wins': 5,
                                         u'starts': 10, u'dnfs': 0, u'top5': 7, u'top10': 10},
-                                       {u'id': 2,
+                                       {u'id': ds2.id,
                                         u'driver': {u'id': p2.id, u'name': 'driver 2', u'country': 'USA'},
                                         u'vehicle': {u'id': v2.id, u'number': 1,
                                                      u'owner': {u'id': p4.id, u'name': 'vehicle owner 2',
@@ -531,6 +674,38 @@ class DriverStandingsListTests(BaseTest):
         self.assertEquals(response.json, expect)
 
 
+    def test_driver_standings_by_metadata(self):
+        '''should return driver standings of vehicles with the requested metadata'''
+
+        s1 = Series(id='s1', description='series 1')
+        db.session.add(s1)
+        db.session.commit()
+
+        p1 = Person(name='driver 1', country='USA')
+        p2 = Person(name='driver 2', country='USA')
+        db.session.add_all([p1, p2])
+        db.session.commit()
+
+        v1 = Vehicle(number=1, owner_id=p1.id, vehicle_metadata={'make': 'Ford'})
+        v2 = Vehicle(number=2, owner_id=p2.id, vehicle_metadata={'make': 'Chevrolet'})
+        db.session.add_all([v1, v2])
+        db.session.commit()
+
+        ds1 = DriverStanding(driver_id=p1.id, vehicle_id=v1.id, series=s1.id,
+                             season=1995, position=1, points=500, poles=5,
+                             wins=5, starts=10, dnfs=0, top5=7, top10=10)
+        ds2 = DriverStanding(driver_id=p2.id, vehicle_id=v2.id, series=s1.id,
+                             season=1995, position=2, points=450, poles=3,
+                             wins=3, starts=10, dnfs=1, top5=7, top10=8)
+        db.session.add_all([ds1, ds2])
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/s1/1995/driverstandings?metadata=make:Chevrolet')
+        self.assertEqual(response._status_code, 200)
+        self.assertEqual([ds['driver']['id'] for ds in response.json['driverstandings']], [p2.id])
+        self.assertEqual(response.json['driverstandings'][0]['vehicle']['vehicle_metadata'],
+                         {u'make': u'Chevrolet'})
+
 class TeamStandingsListTests(BaseTest):
 
     def test_no_version(self):
@@ -580,7 +755,7 @@ class TeamStandingsListTests(BaseTest):
         db.session.commit()
 
         response = self.client.get('/api/v1.0/s1/2013/teamstandings')
-        expect = {u'teamstandings': [{u'id': 1,
+        expect = {u'teamstandings': [{u'id': ts1.id,
                                       u'team': {u'id': u't1', u'name': u'Team 1', u'alias': u'team1',
                                       u'owner': {u'id': p1.id, u'name': 'owner 1', u'country': 'USA'}},
                                       u'vehicle': {u'id': v1.id, u'number': 1,
@@ -588,7 +763,7 @@ class TeamStandingsListTests(BaseTest):
                                                    u'vehicle_metadata': {u'make': u'Ford'}},
                                       u'series': u's1', u'season': 2013, u'position': 1,
                                       u'points': 500, u'poles': 5},
-                                     {u'id': 2,
+                                     {u'id': ts2.id,
                                       u'team': {u'id': u't2', u'name': u'Team 2', u'alias': u'team2',
                                       u'owner': {u'id': p2.id, u'name': 'owner 2', u'country': 'USA'}},
                                       u'vehicle': {u'id': v2.id, u'number': 2,
@@ -645,12 +820,12 @@ class OwnerStandingsListTests(BaseTest):
 
         response = self.client.get('/api/v1.0/s1/2013/ownerstandings')
 
-        expect = {u'ownerstandings': [{u'id': 1,
+        expect = {u'ownerstandings': [{u'id': os1.id,
                                        u'vehicle': {u'id': v1.id, u'number': 1,
                                                     u'owner': {u'id': p1.id, u'name': 'owner 1', u'country': 'USA'},
                                                     u'vehicle_metadata': {u'make': u'Ford'}},
                                        u'series': u's1', u'season': 2013, u'position': 1, u'points': 500},
-                                      {u'id': 2,
+                                      {u'id': os2.id,
                                        u'vehicle': {u'id': v2.id, u'number': 2,
                                                     u'owner': {u'id': p2.id, u'name': 'owner 2', u'country': 'USA'},
                                                     u'vehicle_metadata': {u'make': u'Chevy'}},
@@ -721,6 +896,174 @@ class RaceListTests(BaseTest):
         self.assertEquals(response.json, expect)
 
 
+    def test_races_with_summary(self):
+        '''should return races with their track, standing, winner and pole'''
+
+        s1 = Series(id='s1', description='series 1')
+        rt1 = RaceTrack(site='Site 1', circuit_name='Circuit 1',
+                        city='City 1', state='ST', country='USA')
+        rtype = RaceType(id='pts', description='points race')
+        db.session.add_all([s1, rt1, rtype])
+        db.session.commit()
+
+        race1 = Race(id='race1', round=1, name='Race 1', season=2013, race_track_id=rt1.id,
+                     date=datetime.datetime(2013, 2, 24), laps=200, length=2.5, distance=500,
+                     series=s1.id)
+        race2 = Race(id='race2', round=2, name='Race 2', season=2013, race_track_id=rt1.id,
+                     date=datetime.datetime(2013, 3, 3), laps=200, length=2.5, distance=500,
+                     series=s1.id)
+        db.session.add_all([race1, race2])
+        db.session.commit()
+
+        p1 = Person(name='driver 1', country='USA')
+        p2 = Person(name='driver 2', country='USA')
+        db.session.add_all([p1, p2])
+        db.session.commit()
+
+        t1 = Team(id='t1', name='Team 1', alias='team1', owner_id=p1.id)
+        v1 = Vehicle(number=48, owner_id=p1.id, vehicle_metadata={'make': 'Chevrolet'})
+        v2 = Vehicle(number=24, owner_id=p2.id, vehicle_metadata={'make': 'Chevrolet'})
+        db.session.add_all([t1, v1, v2])
+        db.session.commit()
+
+        rr1 = RaceResult(race_id=race1.id, team_id=t1.id, vehicle_id=v1.id, sponsor='sponsor',
+                         grid=2, position=1, laps=200, status='Finished',
+                         laps_led=100, points=47, money=0)
+        rr2 = RaceResult(race_id=race1.id, team_id=t1.id, vehicle_id=v2.id, sponsor='sponsor',
+                         grid=1, position=2, laps=200, status='Finished',
+                         laps_led=50, points=43, money=0)
+        qr1 = QualifyingResult(race_id=race1.id, team_id=t1.id, vehicle_id=v1.id,
+                               session=1, position=1, lap_time=45.5)
+        qr2 = QualifyingResult(race_id=race1.id, team_id=t1.id, vehicle_id=v2.id,
+                               session=2, position=1, lap_time=45.25)
+        rs1 = RaceStanding(race_id=race1.id, race_time=datetime.time(3, 10, 5),
+                           caution_flags=5, caution_flag_laps=20, lead_changes=12,
+                           pole_speed=196.434, avg_speed=145.29, victory_margin=0.164)
+        db.session.add_all([rr1, rr2, qr1, qr2, rs1, RacesTypes(race_id=race1.id, race_type='pts')])
+        db.session.commit()
+
+        db.session.add_all([RaceResultPerson(race_result_id=rr1.id, person_id=p1.id, type='driver'),
+                            RaceResultPerson(race_result_id=rr2.id, person_id=p2.id, type='driver'),
+                            QualifyingResultPerson(qualifying_result_id=qr1.id, person_id=p1.id,
+                                                   type='driver'),
+                            QualifyingResultPerson(qualifying_result_id=qr2.id, person_id=p2.id,
+                                                   type='driver')])
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/s1/2013/races?expand=summary')
+        track = {u'site': u'Site 1', u'circuit_name': u'Circuit 1',
+                 u'city': u'City 1', u'state': 'ST', u'country': u'USA'}
+        expect = {u'races': [{u'id': u'race1', u'name': u'Race 1', u'season': 2013, u'round': 1,
+                              u'race_track': track, u'date': str(race1.date), u'laps': 200,
+                              u'length': u'2.500', u'distance': u'500.0', u'series': u's1',
+                              u'race_types': [u'pts'],
+                              u'race_standing': {u'race_time': u'03:10:05', u'caution_flags': 5,
+                                                 u'caution_flag_laps': 20, u'lead_changes': 12,
+                                                 u'pole_speed': u'196.434', u'avg_speed': u'145.290',
+                                                 u'victory_margin': u'0.164'},
+                              u'winner': {u'id': p1.id, u'name': u'driver 1', u'team_id': u't1',
+                                          u'vehicle_number': 48},
+                              u'pole': {u'id': p2.id, u'name': u'driver 2', u'lap_time': u'45.250'}},
+                             {u'id': u'race2', u'name': u'Race 2', u'season': 2013, u'round': 2,
+                              u'race_track': track, u'date': str(race2.date), u'laps': 200,
+                              u'length': u'2.500', u'distance': u'500.0', u'series': u's1',
+                              u'race_types': [], u'race_standing': None, u'winner': None,
+                              u'pole': None}]}
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, expect)
+
+        # summaries follow changes to the rows they are built from
+        p1.name = 'renamed driver'
+        rr1.position = 3
+        rr2.position = 1
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/s1/2013/races?expand=summary')
+        self.assertEqual(response.json['races'][0]['winner'],
+                         {u'id': p2.id, u'name': u'driver 2', u'team_id': u't1',
+                          u'vehicle_number': 24})
+
+        rr2.position = 2
+        rr1.position = 1
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/s1/2013/races?expand=summary')
+        self.assertEqual(response.json['races'][0]['winner']['name'], u'renamed driver')
+
+class TrackListTests(BaseTest):
+
+    @classmethod
+    def create_fixtures(cls):
+        create_reference_data(seasons=(2012, 2013), races=2, cars=3)
+
+    def test_no_version(self):
+        '''should return no tracks with missing or bad version'''
+
+        response = self.client.get('/api/tracks')
+        self.assertEqual(response._status_code, 404)
+
+        response = self.client.get('/api/v0.0/tracks')
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, dict(tracks=[]))
+
+    def test_no_track(self):
+        '''should return not found for an unknown track'''
+
+        response = self.client.get('/api/v1.0/tracks/0')
+        self.assertEqual(response._status_code, 404)
+
+    def test_tracks_with_records(self):
+        '''should return tracks with their records and follow new results'''
+
+        track = RaceTrack.query.filter_by(site='Site 0').one()
+        driver0 = Person.query.filter_by(name='Driver 0').one()
+        driver2 = Person.query.filter_by(name='Driver 2').one()
+        rt3 = RaceTrack(site='Site 3', circuit_name='Circuit 3', city='City 3',
+                        state='ST', country='USA')
+        db.session.add(rt3)
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/tracks')
+        self.assertEqual(response._status_code, 200)
+        tracks = response.json['tracks']
+        self.assertEquals([t['site'] for t in tracks], ['Site 0', 'Site 1', 'Site 3'])
+        self.assertEquals(tracks[0], {
+            u'id': track.id, u'site': u'Site 0', u'circuit_name': u'Circuit 0',
+            u'city': u'City 0', u'state': u'ST', u'country': u'USA',
+            u'races': 2, u'first_season': 2012, u'last_season': 2013,
+            u'records': {
+                u'lap': {u'lap_time': u'30.000', u'race_id': u's1-2012-1',
+                         u'driver_id': driver0.id, u'driver_name': u'Driver 0'},
+                u'avg_speed': {u'avg_speed': u'150.250', u'race_id': u's1-2012-1'},
+                u'most_wins': {u'wins': 2, u'driver_id': driver0.id,
+                               u'driver_name': u'Driver 0'}}})
+        self.assertEquals(tracks[2][u'races'], 0)
+        self.assertEquals(tracks[2][u'records'],
+                          {u'lap': None, u'avg_speed': None, u'most_wins': None})
+
+        response = self.client.get('/api/v1.0/tracks/{0}'.format(track.id))
+        self.assertEqual(response._status_code, 200)
+        races = response.json['tracks'][0]['race_list']
+        self.assertEquals([r['id'] for r in races], [u's1-2012-1', u's1-2013-1'])
+        self.assertEquals(races[0]['winner'][u'id'], driver0.id)
+
+        # A faster lap and a faster race at the track become its records.
+        qualifying = QualifyingResult.query.\
+            filter_by(race_id='s1-2013-1', position=3).one()
+        qualifying.lap_time = 29.5
+        standing = RaceStanding.query.filter_by(race_id='s1-2013-1').one()
+        standing.avg_speed = 160.5
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/tracks/{0}'.format(track.id))
+        records = response.json['tracks'][0]['records']
+        self.assertEquals(records[u'lap'], {u'lap_time': u'29.500', u'race_id': u's1-2013-1',
+                                           u'driver_id': driver2.id,
+                                           u'driver_name': u'Driver 2'})
+        self.assertEquals(records[u'avg_speed'],
+                          {u'avg_speed': u'160.500', u'race_id': u's1-2013-1'})
+
+
 class RaceStandingListTests(BaseTest):
 
     def test_no_version(self):
@@ -1161,5 +1504,872 @@ class PracticeResultListTests(BaseTest):
         self.assertEqual(response._status_code, 200)
         self.assertEquals(response.json, expect)
 
+
+class ColumnarExportTests(BaseTest):
+
+    def test_no_version(self):
+        '''
+        should return not found with a bad version or dataset
+        '''
+
+        response = self.client.get('/api/v0.0/s1/2013/export/race_results')
+        self.assertEqual(response._status_code, 404)
+
+        response = self.client.get('/api/v1.0/s1/2013/export/unknown')
+        self.assertEqual(response._status_code, 404)
+
+    def test_export_race_results(self):
+        '''should return race results for a series and season as columns'''
+
+        s1 = Series(id='s1', description='series 1')
+        db.session.add(s1)
+        db.session.commit()
+
+        rt1 = RaceTrack(site='Site 1', circuit_name='Circuit 1',
+                        city='City 1', state='ST', country='USA')
+        db.session.add(rt1)
+        db.session.commit()
+
+        race1 = Race(id='race1', round=1, name='Race 1', season=2013, race_track_id=rt1.id,
+                     date=datetime.datetime(2013, 2, 24), laps=350, length=1.5, distance=525,
+                     series=s1.id)
+        race2 = Race(id='race2', round=1, name='Race 1', season=2012, race_track_id=rt1.id,
+                     date=datetime.datetime(2012, 2, 26), laps=350, length=1.5, distance=525,
+                     series=s1.id)
+        db.session.add_all([race1, race2])
+        db.session.commit()
+
+        p1 = Person(name='driver', country='USA')
+        p2 = Person(name='owner', country='USA')
+        db.session.add_all([p1, p2])
+        db.session.commit()
+
+        t1 = Team(id='t1', name='Team 1', alias='team1', owner_id=p2.id)
+        v1 = Vehicle(number=1, owner_id=p1.id, vehicle_metadata={'make': 'Ford'})
+        db.session.add_all([t1, v1])
+        db.session.commit()
+
+        rr1 = RaceResult(race_id=race1.id, team_id=t1.id,
+                         vehicle_id=v1.id, sponsor='sponsor',
+                         grid=2, position=1, laps=350, status='Finished',
+                         laps_led=200, points=47, money=1000.5)
+        rr2 = RaceResult(race_id=race2.id, team_id=t1.id,
+                         vehicle_id=v1.id, sponsor='sponsor',
+                         grid=1, position=3, laps=350, status='Finished',
+                         laps_led=0, points=41, money=0)
+        db.session.add_all([rr1, rr2])
+        db.session.commit()
+
+        rrp1 = RaceResultPerson(race_result_id=rr1.id, person_id=p1.id, type='driver')
+        db.session.add(rrp1)
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/s1/2013/export/race_results')
+        self.assertEqual(response._status_code, 200)
+        self.assertEqual(response.mimetype, 'application/gzip')
+
+        data = json.load(gzip.GzipFile(fileobj=StringIO(response.data)))
+        self.assertEqual(data['dataset'], 'race_results')
+        self.assertEqual(data['series'], 's1')
+        self.assertEqual(data['season'], 2013)
+        self.assertEqual(data['num_rows'], 1)
+
+        columns = dict((c['name'], c) for c in data['columns'])
+        self.assertEqual(columns['race_id']['values'], ['race1'])
+        self.assertEqual(columns['round']['values'], [1])
+        self.assertEqual(columns['date']['values'], ['2013-02-24T00:00:00'])
+        self.assertEqual(columns['driver_id']['values'], [p1.id])
+        self.assertEqual(columns['points']['type'], 'int')
+        self.assertEqual(columns['money']['type'], 'float')
+        self.assertEqual(columns['money']['values'], [1000.5])
+
+
+class ColumnarExportCommandTests(BaseTest):
+
+    @classmethod
+    def create_fixtures(cls):
+        create_reference_data(series=('s1', 's2'), seasons=(2012, 2013), races=2, cars=2)
+
+    def export(self, output, datasets=None, series=None):
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            ExportColumnar().run(output, datasets, series)
+            return sys.stdout.getvalue().split()
+        finally:
+            sys.stdout = stdout
+
+    def test_export(self):
+        '''should write every dataset partitioned by series and season'''
+
+        output = tempfile.mkdtemp()
+        try:
+            printed = self.export(output)
+
+            written = []
+            for directory, _, files in os.walk(output):
+                written.extend(os.path.join(directory, name) for name in files)
+            self.assertEqual(sorted(printed), sorted(written))
+            self.assertEqual(sorted(os.path.relpath(path, output) for path in written), [
+                os.path.join(dataset, 'series=' + series, 'season=' + season,
+                             'part-0.cols.json.gz')
+                for dataset in ('driver_standings', 'owner_standings', 'qualifying_results',
+                                'race_results', 'team_standings')
+                for series in ('s1', 's2')
+                for season in ('2012', '2013')])
+
+            path = os.path.join(output, 'race_results', 'series=s1', 'season=2013',
+                                'part-0.cols.json.gz')
+            data = json.load(gzip.open(path))
+            self.assertEqual((data['dataset'], data['series'], data['season'], data['num_rows']),
+                             ('race_results', 's1', 2013, 4))
+
+            results = RaceResult.query.join(Race).\
+                filter(Race.series == 's1', Race.season == 2013).\
+                order_by(Race.round, RaceResult.position).all()
+            drivers = dict((p.race_result_id, p.person_id) for p in RaceResultPerson.query.
+                           filter(RaceResultPerson.type == 'driver'))
+            columns = dict((c['name'], c) for c in data['columns'])
+            self.assertEqual(columns['id']['values'], [r.id for r in results])
+            self.assertEqual(columns['race_id']['values'], [r.race_id for r in results])
+            self.assertEqual(columns['driver_id']['values'], [drivers[r.id] for r in results])
+            self.assertEqual(columns['date']['values'][0], '2013-02-08T00:00:00')
+            self.assertEqual((columns['money']['type'], columns['money']['values']),
+                             ('float', [1000.0] * 4))
+
+            self.assertEqual(self.export(output, ['driver_standings'], 's2'), [
+                os.path.join(output, 'driver_standings', 'series=s2', 'season=' + season,
+                             'part-0.cols.json.gz')
+                for season in ('2012', '2013')])
+        finally:
+            shutil.rmtree(output)
+
+
+class SearchTests(BaseTest):
+
+    def test_no_version(self):
+        '''should return no matches with a bad version or no query'''
+
+        response = self.client.get('/api/v0.0/search?q=dale')
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, dict(people=[], teams=[]))
+
+        response = self.client.get('/api/v1.0/search')
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, dict(people=[], teams=[]))
+
+    def test_search_people_and_teams(self):
+        '''should return ranked people and teams matching a name'''
+
+        p1 = Person(name='Dale Jarrett', country='USA')
+        p2 = Person(name='Dale Earnhardt', country='USA')
+        p3 = Person(name=u'Jos\xe9 G\xf3mez', country='MEX')
+        p4 = Person(name='Rick Hendrick', country='USA')
+        db.session.add_all([p1, p2, p3, p4])
+        db.session.commit()
+
+        t1 = Team(id='hms', name='Hendrick Motorsports', alias='HMS', owner_id=p4.id)
+        t2 = Team(id='rcr', name='Richard Childress Racing', alias='RCR', owner_id=p2.id)
+        db.session.add_all([t1, t2])
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/search?q=DALE')
+        self.assertEqual(response._status_code, 200)
+        self.assertEqual(sorted(p['name'] for p in response.json['people']),
+                         ['Dale Earnhardt', 'Dale Jarrett'])
+        self.assertEqual(response.json['teams'], [])
+
+        response = self.client.get('/api/v1.0/search?q=earn')
+        self.assertEqual([p['id'] for p in response.json['people']], [p2.id])
+
+        response = self.client.get('/api/v1.0/search?q=gomez')
+        self.assertEqual(response.json['people'],
+                         [{u'id': p3.id, u'name': u'Jos\xe9 G\xf3mez', u'country': u'MEX'}])
+
+        response = self.client.get('/api/v1.0/search?q=hendrick')
+        self.assertEqual([p['id'] for p in response.json['people']], [p4.id])
+        self.assertEqual(response.json['teams'],
+                         [{u'id': u'hms', u'name': u'Hendrick Motorsports', u'alias': u'HMS'}])
+
+        response = self.client.get('/api/v1.0/search?q=rc')
+        self.assertEqual([t['id'] for t in response.json['teams']], [u'rcr'])
+
+        response = self.client.get('/api/v1.0/search?q=da&limit=1')
+        self.assertEqual(len(response.json['people']), 1)
+
+        response = self.client.get('/api/v1.0/search?q=%25')
+        self.assertEqual(response.json, dict(people=[], teams=[]))
+
+
+class AutocompleteListTests(BaseTest):
+
+    def test_no_version(self):
+        '''should return no suggestions with a bad version or no prefix'''
+
+        response = self.client.get('/api/v0.0/autocomplete?q=da')
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, dict(autocomplete=[]))
+
+        response = self.client.get('/api/v1.0/autocomplete')
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, dict(autocomplete=[]))
+
+    def test_autocomplete(self):
+        '''should suggest people, teams and tracks by name prefix'''
+
+        p1 = Person(name='Dale Earnhardt', country='USA')
+        p2 = Person(name=u'\xc1lvaro Dalmau', country='ESP')
+        db.session.add_all([p1, p2])
+        db.session.commit()
+
+        t1 = Team(id='dei', name='Dale Earnhardt Inc', alias='DEI', owner_id=p1.id)
+        rt1 = RaceTrack(site='Daytona', circuit_name='Daytona International Speedway',
+                        city='Daytona Beach', state='FL', country='USA')
+        db.session.add_all([t1, rt1])
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/autocomplete?q=DAL')
+        self.assertEqual(response._status_code, 200)
+        self.assertEqual(response.json['autocomplete'],
+                         [{u'type': u'person', u'id': p1.id, u'name': u'Dale Earnhardt'},
+                          {u'type': u'team', u'id': u'dei', u'name': u'Dale Earnhardt Inc'},
+                          {u'type': u'person', u'id': p2.id, u'name': u'\xc1lvaro Dalmau'}])
+
+        response = self.client.get('/api/v1.0/autocomplete?q=alv')
+        self.assertEqual([s['id'] for s in response.json['autocomplete']], [p2.id])
+
+        response = self.client.get('/api/v1.0/autocomplete?q=beach')
+        self.assertEqual(response.json['autocomplete'],
+                         [{u'type': u'track', u'id': rt1.id,
+                           u'name': u'Daytona International Speedway'}])
+
+        response = self.client.get('/api/v1.0/autocomplete?q=dal&limit=1')
+        self.assertEqual(len(response.json['autocomplete']), 1)
+
+        # the index is rebuilt after people change
+        p3 = Person(name='Dallas Driver', country='USA')
+        db.session.add(p3)
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/autocomplete?q=dallas')
+        self.assertEqual([s['id'] for s in response.json['autocomplete']], [p3.id])
+
+    def test_changed_elsewhere(self):
+        '''should rebuild the index once it sees people changed by another process'''
+
+        interval = app.autocomplete.CHECK_INTERVAL
+        app.autocomplete.CHECK_INTERVAL = 0.05
+        try:
+            self.client.get('/api/v1.0/autocomplete?q=dallas')
+            # Logged without committing, as if by another process whose
+            # commit hooks don't run here.
+            p1 = Person(name='Dallas Driver', country='USA')
+            db.session.add(p1)
+            db.session.flush()
+
+            response = self.client.get('/api/v1.0/autocomplete?q=dallas')
+            self.assertEqual(response.json['autocomplete'], [])
+
+            time.sleep(0.06)
+            response = self.client.get('/api/v1.0/autocomplete?q=dallas')
+            self.assertEqual([s['id'] for s in response.json['autocomplete']], [p1.id])
+        finally:
+            app.autocomplete.CHECK_INTERVAL = interval
+
+    def test_built_once(self):
+        '''should build the index once for lookups waiting for the first build'''
+
+        autocomplete = self.app.extensions['autocomplete']
+        autocomplete.index = None
+        indexes = []
+
+        def lookup():
+            with self.app.app_context():
+                indexes.append(autocomplete.get_index())
+
+        with autocomplete.lock:
+            threads = [threading.Thread(target=lookup) for i in range(3)]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.05)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(id(index) for index in indexes)), 1)
+
+
+class AutocompleteCommitOrderTests(TestCase):
+    """ Commits people from two connections, which the connection of the
+        tests can't do within its transaction.
+    """
+
+    def setUp(self):
+        self.app = create_test_app()
+        self.context = self.app.app_context()
+        self.context.push()
+
+    def tearDown(self):
+        db.session.rollback()
+        names = ['Early Flushed', 'Late Flushed']
+        ids = [str(p.id) for p in Person.query.filter(Person.name.in_(names))]
+        Person.query.filter(Person.name.in_(names)).delete(synchronize_session=False)
+        if ids:
+            ChangeLog.query.filter(ChangeLog.entity == 'people').\
+                filter(ChangeLog.key[1].in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        self.context.pop()
+
+    def test_committed_out_of_order(self):
+        '''should see people committed after people logged later'''
+
+        interval = app.autocomplete.CHECK_INTERVAL
+        app.autocomplete.CHECK_INTERVAL = 0
+        try:
+            # Bound to the engine rather than the connection of the tests.
+            early = _SignallingSession(db)
+            early.add(Person(name='Early Flushed', country='USA'))
+            early.flush()
+
+            db.session.add(Person(name='Late Flushed', country='USA'))
+            db.session.commit()
+
+            autocomplete = self.app.extensions['autocomplete']
+            self.assertEqual([s[2] for s in autocomplete.lookup('flushed')], ['Late Flushed'])
+
+            early.commit()
+            early.close()
+            # As if committed by another process, whose commit hooks
+            # don't run here.
+            autocomplete.stale = False
+            self.assertEqual(sorted(s[2] for s in autocomplete.lookup('flushed')),
+                             ['Early Flushed', 'Late Flushed'])
+        finally:
+            app.autocomplete.CHECK_INTERVAL = interval
+
+
+class ChangeListTests(BaseTest):
+
+    def test_no_version(self):
+        '''should return no changes with missing or bad version'''
+
+        response = self.client.get('/api/changes')
+        self.assertEqual(response._status_code, 404)
+
+        response = self.client.get('/api/v0.0/changes')
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, dict(changes=[]))
+
+    def test_bad_token(self):
+        '''should reject tokens it didn't return'''
+
+        for token in ('nope', '1-x', '12'):
+            response = self.client.get('/api/v1.0/changes?since={0}'.format(token))
+            self.assertEqual(response._status_code, 400)
+
+    def test_changes(self):
+        '''should return inserts, updates and deletes in order after a token'''
+
+        response = self.client.get('/api/v1.0/changes')
+        self.assertEquals(response.json, dict(changes=[], next=None))
+
+        p1 = Person(name='owner', country='USA')
+        s1 = Series(id='s1', description='series 1')
+        t1 = Team(id='t1', name='Team 1', alias='team1', owner=p1)
+        db.session.add_all([t1, s1])
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/changes')
+        changes = response.json['changes']
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(sorted((c['entity'], c['key'], c['operation']) for c in changes),
+                          [(u'people', [p1.id], u'insert'),
+                           (u'series', [u's1'], u'insert'),
+                           (u'teams', [u't1'], u'insert')])
+        # Teams reference people, so they come after them.
+        entities = [c['entity'] for c in changes]
+        self.assertLess(entities.index(u'people'), entities.index(u'teams'))
+        self.assertEquals(changes[entities.index(u'teams')]['data'],
+                          {u'id': u't1', u'name': u'Team 1', u'alias': u'team1',
+                           u'owner_id': p1.id})
+        self.assertEquals(response.json['next'], changes[-1]['token'])
+
+        # Only what changed since the token is returned.
+        since = response.json['next']
+        s1.description = 'renamed'
+        db.session.delete(t1)
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/changes?since={0}'.format(since))
+        changes = response.json['changes']
+        self.assertEquals([(c['entity'], c['key'], c['operation'], c['data']) for c in changes],
+                          [(u'series', [u's1'], u'update',
+                            {u'id': u's1', u'description': u'renamed'}),
+                           (u'teams', [u't1'], u'delete', None)])
+
+        since = response.json['next']
+        response = self.client.get('/api/v1.0/changes?since={0}'.format(since))
+        self.assertEquals(response.json, dict(changes=[], next=since))
+
+        # Pages continue from the token of the previous one.
+        response = self.client.get('/api/v1.0/changes?limit=2')
+        self.assertEquals(len(response.json['changes']), 2)
+        response = self.client.get('/api/v1.0/changes?limit=2&since={0}'.format(
+            response.json['next']))
+        self.assertEquals([c['operation'] for c in response.json['changes']],
+                          [u'insert', u'update'])
+
+
+class IdListTests(BaseTest):
+
+    @classmethod
+    def create_fixtures(cls):
+        create_reference_data(seasons=(2013,), races=2, cars=3)
+
+    def test_no_version(self):
+        '''should return nothing with a bad version'''
+
+        for endpoint in ('people', 'teams', 'vehicles', 'races'):
+            response = self.client.get('/api/v0.0/{0}?ids=1'.format(endpoint))
+            self.assertEqual(response._status_code, 200)
+            self.assertEquals(response.json, {endpoint: []})
+
+    def test_bad_ids(self):
+        '''should reject ids that aren't ids and too many ids'''
+
+        for url in ('/api/v1.0/people', '/api/v1.0/people?ids=1,x',
+                    '/api/v1.0/vehicles?ids=99999999999',
+                    '/api/v1.0/teams?ids=' + ','.join(str(i) for i in range(5001))):
+            response = self.client.get(url)
+            self.assertEqual(response._status_code, 400, url)
+
+    def test_people_by_ids(self):
+        '''should return people in the requested order, once, skipping unknown ids'''
+
+        p1, p2 = Person.query.filter(Person.name.in_(['Driver 1', 'Owner 2'])).\
+            order_by(Person.name).all()
+
+        response = self.client.get('/api/v1.0/people?ids={0},{1},999999,{0}'.format(
+            p2.id, p1.id))
+        expect = {u'people': [{u'id': p2.id, u'name': u'Owner 2', u'country': u'USA'},
+                              {u'id': p1.id, u'name': u'Driver 1', u'country': u'USA'}]}
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, expect)
+
+        response = self.client.get('/api/v1.0/people?ids=')
+        self.assertEquals(response.json, dict(people=[]))
+
+    def test_teams_vehicles_and_races_by_ids(self):
+        '''should return teams, vehicles and races in the formats of their lists'''
+
+        response = self.client.get('/api/v1.0/teams?ids=t2,t0')
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals([t['id'] for t in response.json['teams']], [u't2', u't0'])
+        self.assertEquals(response.json['teams'][0]['owner']['name'], u'Owner 2')
+
+        vehicle = Vehicle.query.filter_by(number=2).one()
+        response = self.client.get('/api/v1.0/vehicles?ids={0}'.format(vehicle.id))
+        self.assertEquals(response.json['vehicles'], [{
+            u'id': vehicle.id, u'number': 2, u'vehicle_metadata': {u'make': u'Chevy'},
+            u'owner': {u'id': vehicle.owner_id, u'name': u'Owner 1', u'country': u'USA'}}])
+
+        response = self.client.get('/api/v1.0/races?ids=s1-2013-2,s1-2013-1')
+        races = response.json['races']
+        self.assertEquals([r['id'] for r in races], [u's1-2013-2', u's1-2013-1'])
+        self.assertEquals(races[0]['race_track']['site'], u'Site 1')
+        self.assertEquals(races[0]['length'], u'2.500')
+
+        response = self.client.get('/api/v1.0/races')
+        self.assertEquals(response.json, dict(races=[]))
+
+
+class IncludedTests(BaseTest):
+
+    @classmethod
+    def create_fixtures(cls):
+        create_reference_data(seasons=(2013,), races=2, cars=3)
+
+    def people(self, *names):
+        return dict((p.name, p) for p in Person.query.filter(Person.name.in_(names)))
+
+    def test_bad_include(self):
+        '''should reject kinds that can't be included'''
+
+        response = self.client.get('/api/v1.0/s1/2013/driverstandings?include=people,races')
+        self.assertEqual(response._status_code, 400)
+
+    def test_race_results(self):
+        '''should refer to included people, teams and vehicles by id'''
+
+        response = self.client.get('/api/v1.0/s1/2013/raceresults/1?include=people,teams,vehicles')
+        self.assertEqual(response._status_code, 200)
+
+        people = self.people('Driver 0', 'Crew Chief 0', 'Owner 0')
+        vehicle = Vehicle.query.filter_by(number=1).one()
+        first = response.json['raceresults'][0]
+        self.assertEquals(first['team'], u't0')
+        self.assertEquals(first['vehicle'], vehicle.id)
+        self.assertEquals(first['driver'], people['Driver 0'].id)
+        self.assertEquals(first['crew-chief'], people['Crew Chief 0'].id)
+        self.assertEquals(first['race'], {u'id': u's1-2013-1', u'name': u'Race 1'})
+
+        included = response.json['included']
+        self.assertEquals(sorted(included), [u'people', u'teams', u'vehicles'])
+        self.assertEquals(len(included['people']), 9)
+        self.assertEquals([t['id'] for t in included['teams']], [u't0', u't1', u't2'])
+        self.assertEquals(included['teams'][0], {
+            u'id': u't0', u'name': u'Team 0', u'alias': u'team0',
+            u'owner': people['Owner 0'].id})
+        self.assertEquals(included['vehicles'][0], {
+            u'id': vehicle.id, u'number': 1, u'vehicle_metadata': {u'make': u'Ford'},
+            u'owner': people['Owner 0'].id})
+
+        owner = [p for p in included['people'] if p['id'] == people['Owner 0'].id]
+        self.assertEquals(owner, [{u'id': people['Owner 0'].id, u'name': u'Owner 0',
+                                   u'country': u'USA'}])
+
+    def test_some_kinds(self):
+        '''should keep the kinds not included nested'''
+
+        response = self.client.get('/api/v1.0/s1/2013/raceentry/official/1?include=teams')
+        self.assertEqual(response._status_code, 200)
+
+        people = self.people('Driver 0', 'Owner 0')
+        first = response.json['raceentry'][0]
+        self.assertEquals(first['team'], u't0')
+        self.assertEquals(first['driver']['name'], u'Driver 0')
+        self.assertEquals(first['vehicle']['owner']['name'], u'Owner 0')
+        self.assertEquals(response.json['included']['teams'][0]['owner'], {
+            u'id': people['Owner 0'].id, u'name': u'Owner 0', u'country': u'USA'})
+
+    def test_standings(self):
+        '''should include the people, teams and vehicles of standings'''
+
+        response = self.client.get('/api/v1.0/s1/2013/driverstandings?include=people,vehicles')
+        standings = response.json['driverstandings']
+        included = response.json['included']
+        self.assertEquals(len(standings), 3)
+        self.assertEquals(sorted(p['name'] for p in included['people']),
+                          [u'Driver 0', u'Driver 1', u'Driver 2',
+                           u'Owner 0', u'Owner 1', u'Owner 2'])
+        self.assertEquals(set(s['vehicle'] for s in standings),
+                          set(v['id'] for v in included['vehicles']))
+
+        response = self.client.get('/api/v1.0/s1/2013/teamstandings?include=teams')
+        self.assertEquals([s['team'] for s in response.json['teamstandings']],
+                          [u't0', u't1', u't2'])
+        self.assertEquals(sorted(response.json['included']), [u'teams'])
+
+        response = self.client.get('/api/v1.0/s1/2013/teamstandings')
+        self.assertNotIn('included', response.json)
+        self.assertEquals(response.json['teamstandings'][0]['team']['name'], u'Team 0')
+
+
+class CoalescingStatsTests(BaseTest):
+
+    def create_app(self):
+        return create_test_app({'DEBUG_ROUTES': 'true'})
+
+    def test_no_version(self):
+        '''should return no statistics with a bad version'''
+
+        response = self.client.get('/api/v0.0/debug/coalescing')
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, dict(coalescing={}))
+
+    def test_stats(self):
+        '''should count the computations of coalesced routes'''
+
+        self.client.get('/api/v1.0/s1/2013/raceentry/official/1')
+        self.client.get('/api/v1.0/s1/2013/qualifyingresults/1')
+
+        response = self.client.get('/api/v1.0/debug/coalescing')
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, {'coalescing': {
+            u'in_flight': 0, u'computations': 2, u'coalesced': 0, u'errors': 0,
+            u'waiting': 0, u'wait_seconds': 0.0}})
+
+    def test_not_served_by_default(self):
+        '''should only serve statistics when DEBUG_ROUTES is set'''
+
+        with create_test_app().test_client() as client:
+            response = client.get('/api/v1.0/debug/coalescing')
+            self.assertEqual(response.status_code, 404)
+
+
+class DriverProgressionTests(BaseTest):
+
+    @classmethod
+    def create_fixtures(cls):
+        create_reference_data(seasons=(2013,), races=3, cars=3)
+
+    def setUp(self):
+        BaseTest.setUp(self)
+        # Progressions are kept until a commit; tests roll theirs back.
+        forget_progressions()
+
+    def test_no_version(self):
+        '''should return no progression with a bad version'''
+
+        response = self.client.get('/api/v0.0/s1/2013/driverstandings/progression')
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json, dict(rounds=[], progression=[]))
+
+    def test_progression(self):
+        '''should return the points, total and position of every driver after every round'''
+
+        response = self.client.get('/api/v1.0/s1/2013/driverstandings/progression')
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json['rounds'], [1, 2, 3])
+
+        progression = response.json['progression']
+        self.assertEquals([d['driver']['name'] for d in progression],
+                          [u'Driver 0', u'Driver 1', u'Driver 2'])
+        self.assertEquals(progression[1]['rounds'], [
+            {u'round': 1, u'points': 42, u'total': 42, u'position': 2},
+            {u'round': 2, u'points': 42, u'total': 84, u'position': 2},
+            {u'round': 3, u'points': 42, u'total': 126, u'position': 2}])
+
+    def test_missed_round(self):
+        '''should keep the total of drivers missing a round, once changes are committed'''
+
+        self.client.get('/api/v1.0/s1/2013/driverstandings/progression')
+
+        # Driver 0 misses round 1 and scores nothing.
+        result = RaceResult.query.join(RaceResult.race).\
+            filter(Race.id == 's1-2013-1', RaceResult.position == 1).one()
+        for person in result.people:
+            db.session.delete(person)
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/s1/2013/driverstandings/progression')
+        progression = response.json['progression']
+        self.assertEquals([d['driver']['name'] for d in progression],
+                          [u'Driver 1', u'Driver 2', u'Driver 0'])
+        self.assertEquals(progression[2]['rounds'], [
+            {u'round': 1, u'points': 0, u'total': 0, u'position': 3},
+            {u'round': 2, u'points': 43, u'total': 43, u'position': 3},
+            {u'round': 3, u'points': 43, u'total': 86, u'position': 3}])
+
+    def test_season_range(self):
+        '''should group the progression of a range or list of seasons by season'''
+
+        response = self.client.get('/api/v1.0/s1/2012-2013/driverstandings/progression')
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json['rounds'], {u'2012': [], u'2013': [1, 2, 3]})
+        self.assertEquals(response.json['progression']['2012'], [])
+        self.assertEquals(len(response.json['progression']['2013']), 3)
+
+        response = self.client.get('/api/v1.0/s1/2013,2014/driverstandings/progression')
+        self.assertEquals(sorted(response.json['rounds']), [u'2013', u'2014'])
+
+    def test_bad_season(self):
+        '''should refuse seasons that aren't years'''
+
+        for season in ('2013-', 'w'):
+            url = '/api/v1.0/s1/{0}/driverstandings/progression'.format(season)
+            self.assertEqual(self.client.get(url)._status_code, 400, season)
+
+    def test_expires(self):
+        '''should compute progressions again once they time out'''
+
+        timeout = app.progression.PROGRESSION_TIMEOUT
+        app.progression.PROGRESSION_TIMEOUT = 0.05
+        try:
+            self.assertEquals(self.progression_total(), 126)
+            # Changed by another process, whose commit hooks don't run here.
+            db.session.execute(RaceResult.__table__.update().values(points=0))
+            self.assertEquals(self.progression_total(), 126)
+            time.sleep(0.06)
+            self.assertEquals(self.progression_total(), 0)
+        finally:
+            app.progression.PROGRESSION_TIMEOUT = timeout
+
+    def progression_total(self):
+        response = self.client.get('/api/v1.0/s1/2013/driverstandings/progression')
+        return response.json['progression'][1]['rounds'][-1]['total']
+
+
+class RescoredStandingsTests(BaseTest):
+
+    @classmethod
+    def create_fixtures(cls):
+        create_reference_data(seasons=(2013,), races=3, cars=3)
+
+    def test_bad_points_system(self):
+        '''should reject unknown points systems and seasons without one'''
+
+        response = self.client.get('/api/v1.0/s1/2013/driverstandings?points_system=nope')
+        self.assertEqual(response._status_code, 400)
+
+        response = self.client.get('/api/v1.0/s1/2013/driverstandings?points_system=era')
+        self.assertEqual(response._status_code, 400)
+
+    def test_rescored(self):
+        '''should rescore every result of the season'''
+
+        # Everyone leads laps, and as many as the others.
+        response = self.client.get('/api/v1.0/s1/2013/driverstandings?points_system=nascar-2011')
+        self.assertEqual(response._status_code, 200)
+
+        standings = response.json['driverstandings']
+        self.assertEquals([(s['driver']['name'], s['position'], s['points']) for s in standings],
+                          [(u'Driver 0', 1, 3 * (43 + 3 + 2)),
+                           (u'Driver 1', 2, 3 * (42 + 2)),
+                           (u'Driver 2', 3, 3 * (41 + 2))])
+        first = dict(standings[0])
+        del first['driver']
+        self.assertEquals(first, {
+            u'series': u's1', u'season': 2013, u'points_system': u'nascar-2011',
+            u'position': 1, u'points': 144, u'wins': 3, u'starts': 3, u'dnfs': 0,
+            u'top5': 3, u'top10': 3, u'laps_led': 30})
+
+    def test_most_laps_led(self):
+        '''should only give the most laps led bonus to the drivers leading the most'''
+
+        for result in RaceResult.query.filter_by(position=3):
+            result.laps_led = 0
+        for result in RaceResult.query.filter_by(position=2):
+            result.laps_led = 50
+        db.session.commit()
+
+        response = self.client.get('/api/v1.0/s1/2013/driverstandings?points_system=latford')
+        points = [s['points'] for s in response.json['driverstandings']]
+        self.assertEquals(points, [3 * (175 + 5), 3 * (170 + 5 + 5), 3 * 165])
+
+
+class SeasonRangeTests(BaseTest):
+
+    @classmethod
+    def create_fixtures(cls):
+        create_reference_data(seasons=range(2000, 2013), races=2, cars=2)
+
+    def test_bad_seasons(self):
+        '''should reject malformed and too long ranges and lists'''
+
+        for season in ('2001-x', '2005-2001', '2001,x', '1-1000', ',', '%20,%20'):
+            response = self.client.get('/api/v1.0/s1/{0}/driverstandings'.format(season))
+            self.assertEqual(response._status_code, 400, season)
+
+        response = self.client.get('/api/v1.0/s1/2001-2002/driverstandings?points_system=latford')
+        self.assertEqual(response._status_code, 400)
+
+    def test_standings_by_season(self):
+        '''should group standings by season'''
+
+        response = self.client.get('/api/v1.0/s1/2003-2005/driverstandings')
+        self.assertEqual(response._status_code, 200)
+        standings = response.json['driverstandings']
+        self.assertEquals(sorted(standings), [u'2003', u'2004', u'2005'])
+        self.assertEquals([s['season'] for s in standings['2004']], [2004, 2004])
+
+        response = self.client.get('/api/v1.0/s1/2001,2012,1990/teamstandings?include=teams')
+        standings = response.json['teamstandings']
+        self.assertEquals(sorted(standings), [u'2001', u'2012'])
+        self.assertEquals(sorted(s['team'] for s in standings['2001']), [u't0', u't1'])
+        self.assertEquals([t['id'] for t in response.json['included']['teams']], [u't0', u't1'])
+
+        response = self.client.get('/api/v1.0/s1/2001,2002/ownerstandings')
+        self.assertEquals(sorted(response.json['ownerstandings']), [u'2001', u'2002'])
+
+    def test_races_by_season(self):
+        '''should group races by season, in order'''
+
+        response = self.client.get('/api/v1.0/s1/2010-2011/races')
+        races = json.loads(response.data, object_pairs_hook=OrderedDict)['races']
+        self.assertEquals(races.keys(), [u'2010', u'2011'])
+        self.assertEquals([r['id'] for r in races['2011']], [u's1-2011-1', u's1-2011-2'])
+
+        response = self.client.get('/api/v1.0/s1/2010-2011/races?expand=summary')
+        self.assertEquals([r['id'] for r in response.json['races']['2010']],
+                          [u's1-2010-1', u's1-2010-2'])
+
+    def test_streamed(self):
+        '''should stream responses covering many seasons'''
+
+        response = self.client.get('/api/v1.0/s1/2000-2012/driverstandings?include=people')
+        self.assertEqual(response._status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'application/json')
+
+        data = json.loads(response.data, object_pairs_hook=OrderedDict)
+        self.assertEquals(data['driverstandings'].keys(),
+                          [unicode(season) for season in range(2000, 2013)])
+        self.assertEquals(len(data['included']['people']), 2)
+
+
+class SeriesListTests(BaseTest):
+
+    @classmethod
+    def create_fixtures(cls):
+        create_reference_data(series=('s1', 's2', 's3'), seasons=(2012, 2013), races=2, cars=2)
+
+    def test_bad_series(self):
+        '''should reject empty and too long lists of series'''
+
+        for series in (',', ','.join('s{0}'.format(i) for i in range(11))):
+            response = self.client.get('/api/v1.0/{0}/2013/driverstandings'.format(series))
+            self.assertEqual(response._status_code, 400, series)
+
+        response = self.client.get('/api/v1.0/s1,s2/2013/driverstandings?points_system=latford')
+        self.assertEqual(response._status_code, 400)
+
+    def test_standings_by_series(self):
+        '''should group standings by series, then season'''
+
+        response = self.client.get('/api/v1.0/s2,s1/2013/driverstandings')
+        self.assertEqual(response._status_code, 200)
+        standings = json.loads(response.data, object_pairs_hook=OrderedDict)['driverstandings']
+        self.assertEquals(standings.keys(), [u's1', u's2'])
+        self.assertEquals([(s['series'], s['season']) for s in standings['s2']],
+                          [(u's2', 2013), (u's2', 2013)])
+
+        response = self.client.get('/api/v1.0/s1,s3/2012-2013/teamstandings?include=teams')
+        standings = response.json['teamstandings']
+        self.assertEquals(sorted(standings), [u's1', u's3'])
+        self.assertEquals(sorted(standings['s3']), [u'2012', u'2013'])
+        self.assertEquals([t['id'] for t in response.json['included']['teams']], [u't0', u't1'])
+
+        response = self.client.get('/api/v1.0/s1,s4/2013/ownerstandings')
+        self.assertEquals(sorted(response.json['ownerstandings']), [u's1'])
+
+    def test_lists_by_series(self):
+        '''should group people, teams, vehicles and races by series'''
+
+        for resource in ('drivers', 'crewchiefs', 'teams', 'vehicles', 'races'):
+            response = self.client.get('/api/v1.0/s1,s2/2013/{0}'.format(resource))
+            self.assertEqual(response._status_code, 200, resource)
+            self.assertEquals(sorted(response.json[resource]), [u's1', u's2'], resource)
+
+        response = self.client.get('/api/v1.0/s1,s2/2013/teams')
+        self.assertEquals([t['id'] for t in response.json['teams']['s2']], [u't0', u't1'])
+
+        response = self.client.get('/api/v1.0/s2,s3/2012/races?expand=summary')
+        self.assertEquals([r['id'] for r in response.json['races']['s3']],
+                          [u's3-2012-1', u's3-2012-2'])
+
+    def test_results_by_series(self):
+        '''should group entries and results by series'''
+
+        for resource in ('raceentry/official', 'raceresults', 'qualifyingresults',
+                         'practiceresults'):
+            response = self.client.get('/api/v1.0/s1,s3/2013/{0}/1'.format(resource))
+            self.assertEqual(response._status_code, 200, resource)
+            results = response.json.values()[0]
+            self.assertEquals(sorted(results), [u's1', u's3'], resource)
+            self.assertEquals([r['race']['id'] for r in results['s3']],
+                              [u's3-2013-1', u's3-2013-1'], resource)
+
+        response = self.client.get('/api/v1.0/s1,s2/2013/raceresults/2?include=people')
+        self.assertEquals(len(response.json['raceresults']['s2']), 2)
+        self.assertEquals(len(response.json['included']['people']), 4)
+
+    def test_progression_by_series(self):
+        '''should group the progression by series'''
+
+        forget_progressions()
+        response = self.client.get('/api/v1.0/s1,s2/2013/driverstandings/progression')
+        self.assertEqual(response._status_code, 200)
+        self.assertEquals(response.json['rounds'], {u's1': [1, 2], u's2': [1, 2]})
+        self.assertEquals(len(response.json['progression']['s2']), 2)
+
 if __name__ == '__main__':
     nose.main()
@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+import nose
+from unittest import TestCase
+
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+
+# Seconds a fresh process may take to import and create the web
+# application, or the management commands. Slow machines can raise it
+# with STARTUP_BUDGET in the environment.
+STARTUP_BUDGET = float(os.environ.get('STARTUP_BUDGET', 1.5))
+
+# Imported by entry points that need them only.
+MIGRATION_MODULES = ('alembic', 'mako', 'flask_migrate')
+SCRIPT_MODULES = ('flask_script', 'argparse')
+API_MODULES = ('controllers', 'flask_restful', 'web')
+
+# Times a startup in a fresh interpreter and reports the modules it loaded.
+STARTUP_SCRIPT = '''
+import json, sys, time
+started = time.time()
+{0}
+print json.dumps({{'seconds': time.time() - started, 'modules': sorted(sys.modules)}})
+'''
+
+CONFIG = "{'DATABASE_URL': 'postgresql://localhost/startup'}"
+
+
+def measure_startup(code):
+    """ Runs code in a new interpreter started in the app directory and
+        returns the seconds it took and the names of the loaded modules.
+    """
+    output = subprocess.check_output([sys.executable, '-c', STARTUP_SCRIPT.format(code)],
+                                     cwd=APP_DIR)
+    result = json.loads(output.splitlines()[-1])
+    return result['seconds'], set(result['modules'])
+
+
+class StartupTests(TestCase):
+
+    def assertStartup(self, code, absent):
+        seconds, modules = measure_startup(code)
+        self.assertLess(seconds, STARTUP_BUDGET, '{0} took {1:.3f}s, budget {2}s'.format(
+            code, seconds, STARTUP_BUDGET))
+        loaded = sorted(set(absent) & modules)
+        self.assertFalse(loaded, '{0} loaded {1}'.format(code, ', '.join(loaded)))
+
+    def test_web(self):
+        '''should create the web application within budget, without management modules'''
+
+        self.assertStartup('from web import create_web_app; create_web_app({0})'.format(CONFIG),
+                           MIGRATION_MODULES + SCRIPT_MODULES)
+
+    def test_wsgi(self):
+        '''should serve routes from the wsgi entry point'''
+
+        modules = measure_startup(
+            "import os; os.environ['DATABASE_URL'] = 'postgresql://localhost/startup'\n"
+            "from wsgi import app; assert app.url_map.bind('localhost').test('/api/v1.0/drivers')")[1]
+        self.assertIn('controllers', modules)
+
+    def test_command(self):
+        '''should create the manager of one-shot commands without the API or migrations'''
+
+        self.assertStartup('from manage import create_manager; '
+                           'create_manager({0}, ["rebuild-projections"])'.format(CONFIG),
+                           MIGRATION_MODULES + API_MODULES)
+
+    def test_database_command(self):
+        '''should add migrations for the database command'''
+
+        modules = measure_startup('from manage import create_manager; '
+                                   'create_manager({0}, ["database"])'.format(CONFIG))[1]
+        self.assertIn('flask_migrate', modules)
+
+if __name__ == '__main__':
+    nose.main()
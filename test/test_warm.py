@@ -0,0 +1,105 @@
+import time
+import nose
+from sqlalchemy import select, func
+from app.models import db
+from app.warm import Warmer, warm_urls, WARM_LOCK
+from base import BaseTest, create_test_app
+from fixtures import create_reference_data
+
+
+class WarmTests(BaseTest):
+
+    @classmethod
+    def create_fixtures(cls):
+        create_reference_data(series=('s1', 's2'), seasons=(2011, 2012, 2013), races=2, cars=2)
+
+    def test_warm_urls(self):
+        '''should list the pages of the latest seasons of every series'''
+
+        urls = warm_urls(seasons=1)
+        self.assertEqual(urls, [
+            '/api/v1.0/s1/2013/driverstandings',
+            '/api/v1.0/s1/2013/teamstandings',
+            '/api/v1.0/s1/2013/ownerstandings',
+            '/api/v1.0/s1/2013/races',
+            '/api/v1.0/s1/2013/raceresults/1',
+            '/api/v1.0/s1/2013/qualifyingresults/1',
+            '/api/v1.0/s1/2013/raceresults/2',
+            '/api/v1.0/s1/2013/qualifyingresults/2',
+            '/api/v1.0/s2/2013/driverstandings',
+            '/api/v1.0/s2/2013/teamstandings',
+            '/api/v1.0/s2/2013/ownerstandings',
+            '/api/v1.0/s2/2013/races',
+            '/api/v1.0/s2/2013/raceresults/1',
+            '/api/v1.0/s2/2013/qualifyingresults/1',
+            '/api/v1.0/s2/2013/raceresults/2',
+            '/api/v1.0/s2/2013/qualifyingresults/2'])
+
+        urls = warm_urls(seasons=2)
+        self.assertEqual(len(urls), 32)
+        self.assertTrue(urls[-1].startswith('/api/v1.0/s2/2012/'))
+
+    def test_run(self):
+        '''should request every page and report when it is done'''
+
+        warmer = Warmer(self.app, seasons=2, workers=1)
+        self.assertFalse(warmer.ready)
+        self.assertIs(self.app.extensions['warmer'], warmer)
+
+        seen = []
+        stats = warmer.run(lambda url, status: seen.append(status))
+
+        self.assertEqual(seen, [200] * 32)
+        self.assertTrue(warmer.ready)
+        self.assertEqual((stats['pages'], stats['done'], stats['failed'], stats['ready'],
+                          stats['error']),
+                         (32, 32, [], True, None))
+        self.assertTrue(stats['seconds'] >= 0)
+
+    def test_failed(self):
+        '''should end a warm-up that raised, so that the application becomes ready'''
+
+        class FailingWarmer(Warmer):
+            def warm(self, progress=None):
+                raise RuntimeError('connection lost')
+
+        warmer = FailingWarmer(self.app, seasons=1, workers=1)
+        warmer.start().join()
+        self.assertTrue(warmer.ready)
+        self.assertEqual(warmer.stats()['error'], 'connection lost')
+
+        response = self.client.get('/readyz')
+        self.assertEqual(response._status_code, 200)
+        self.assertEqual(response.json, {'status': 'ok'})
+
+    def test_started_on_first_request(self):
+        '''should start warming up on the first request, in the process serving it'''
+
+        app = create_test_app({'WARM_SEASONS': '1', 'WARM_WORKERS': '1'})
+        warmer = app.extensions['warmer']
+        self.assertIsNone(warmer.thread)
+
+        app.test_client().get('/healthz')
+        warmer.thread.join()
+        self.assertEqual((warmer.ready, warmer.stats()['pages']), (True, 16))
+
+    def test_wait_for_other_worker(self):
+        '''should wait for another worker warming up instead of warming up too'''
+
+        other = db.get_engine(self.app).connect()
+        try:
+            other.execute(select([func.pg_advisory_lock(WARM_LOCK)]))
+            warmer = Warmer(self.app, seasons=1, workers=1)
+            thread = warmer.start()
+            time.sleep(0.05)
+            self.assertFalse(warmer.ready)
+
+            other.execute(select([func.pg_advisory_unlock(WARM_LOCK)]))
+            thread.join()
+        finally:
+            other.close()
+        self.assertTrue(warmer.ready)
+        self.assertEqual((warmer.stats()['pages'], warmer.done), (0, 0))
+
+if __name__ == '__main__':
+    nose.main()